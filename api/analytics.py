@@ -0,0 +1,169 @@
+"""Spend analytics over many invoices.
+
+The columnar tables of ``api.export`` (built from parsed documents, or read
+back from the Parquet files it writes) are loaded as Arrow tables, and every
+total is a vectorized group-by over them: no per-document Python loop and no
+``float(text)`` per amount. Credit notes count as negative amounts.
+
+    spend = Spend.from_roots(roots)           # or Spend.read_parquet("exports")
+    spend.by_supplier()                       # documents, subtotal, tax, total per supplier NIT and currency
+    top(spend.by_product(), "line_extension_amount", 10)
+
+Results are ``pyarrow.Table``s (``.to_pylist()`` for plain dicts). Like the
+Parquet export, this needs pyarrow: ``pip install pyarrow``.
+
+    python -m api.analytics exports --by supplier --top 10
+"""
+import argparse
+import os
+import sys
+
+import api.export as export
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # only needed here; the rest of the API works without it
+    pa = pc = pq = None
+
+HEADER_AMOUNTS = ("line_extension_amount", "tax_amount", "payable_amount")
+LINE_AMOUNTS = ("quantity", "line_extension_amount", "tax_amount")
+TAX_AMOUNTS = ("taxable_amount", "tax_amount")
+
+GROUPINGS = ("supplier", "customer", "month", "tax_scheme", "product")
+
+
+def _require():
+    if pa is None:
+        raise ImportError("Analytics need pyarrow: pip install pyarrow")
+
+
+def _signed(table: "pa.Table", columns: tuple) -> "pa.Table":
+    # Credit notes take amounts back
+    sign = pc.if_else(pc.equal(table["document_type"], "CreditNote"), -1.0, 1.0)
+    for name in columns:
+        table = table.set_column(
+            table.schema.get_field_index(name), name, pc.multiply(table[name], sign)
+        )
+    return table
+
+
+def _month(table: "pa.Table") -> "pa.Table":
+    return table.append_column("month", pc.strftime(table["issue_date"], format="%Y-%m"))
+
+
+def _group(table: "pa.Table", keys: list[str], sums: tuple, firsts: tuple = ()) -> "pa.Table":
+    """Sum ``sums`` and count the rows per ``keys``, taking the largest
+    value of the ``firsts`` (names, which should not vary within a group)."""
+    result = table.group_by(keys).aggregate(
+        [(name, "sum") for name in sums] + [(name, "max") for name in firsts] + [([], "count_all")]
+    )
+    columns = keys + [name + "_max" for name in firsts] + ["count_all"] + [name + "_sum" for name in sums]
+    names = keys + list(firsts) + ["count"] + list(sums)
+    return result.select(columns).rename_columns(names).sort_by([(key, "ascending") for key in keys])
+
+
+def top(table: "pa.Table", column: str, n: int = 10) -> "pa.Table":
+    """The ``n`` rows with the largest ``column``."""
+    return table.sort_by([(column, "descending")]).slice(0, n)
+
+
+class Spend:
+    """Headers, lines and document-level taxes of a set of documents, with
+    credit note amounts negated."""
+
+    def __init__(self, headers: "pa.Table", lines: "pa.Table", taxes: "pa.Table"):
+        _require()
+        headers = headers.append_column(
+            "tax_amount", pc.subtract(headers["tax_inclusive_amount"], headers["tax_exclusive_amount"])
+        )
+        self.headers = _month(_signed(headers, HEADER_AMOUNTS))
+        self.lines = _month(_signed(lines, LINE_AMOUNTS))
+        # Line taxes are part of the document ones: only keep those
+        taxes = taxes.filter(pc.is_null(taxes["line_id"]))
+        self.taxes = _month(_signed(taxes, TAX_AMOUNTS))
+
+    @classmethod
+    def from_tables(cls, tables: export.Tables) -> "Spend":
+        _require()
+        return cls(
+            export.arrow_table(tables.headers, export.HEADER_COLUMNS),
+            export.arrow_table(tables.lines, export.LINE_COLUMNS),
+            export.arrow_table(tables.taxes, export.TAX_COLUMNS),
+        )
+
+    @classmethod
+    def from_roots(cls, roots) -> "Spend":
+        return cls.from_tables(export.to_tables(roots))
+
+    @classmethod
+    def read_parquet(cls, directory: str) -> "Spend":
+        """Load the tables ``api.export`` wrote to ``directory``."""
+        _require()
+        return cls(*(
+            pq.read_table(os.path.join(directory, name + ".parquet"))
+            for name in ("headers", "lines", "taxes")
+        ))
+
+    def __len__(self) -> int:
+        return self.headers.num_rows
+
+    def by_supplier(self, currency: bool = True) -> "pa.Table":
+        """Totals per supplier NIT, and per currency unless ``currency`` is False."""
+        keys = ["supplier_nit", "currency"] if currency else ["supplier_nit"]
+        return _group(self.headers, keys, HEADER_AMOUNTS, ("supplier_name",))
+
+    def by_customer(self, currency: bool = True) -> "pa.Table":
+        """Totals per customer ID, and per currency unless ``currency`` is False."""
+        keys = ["customer_id", "currency"] if currency else ["customer_id"]
+        return _group(self.headers, keys, HEADER_AMOUNTS, ("customer_name",))
+
+    def by_month(self, currency: bool = True) -> "pa.Table":
+        """Totals per issue month (``YYYY-MM``), and per currency unless
+        ``currency`` is False."""
+        keys = ["month", "currency"] if currency else ["month"]
+        return _group(self.headers, keys, HEADER_AMOUNTS)
+
+    def by_tax_scheme(self) -> "pa.Table":
+        """Taxable base and tax per scheme (IVA, INC, ICA...)."""
+        return _group(self.taxes, ["tax_scheme_id"], TAX_AMOUNTS, ("tax_scheme_name",))
+
+    def by_product(self, key: str = "standard_code") -> "pa.Table":
+        """Quantity, subtotal and tax per product, identified by ``key``:
+        standard_code, seller_code or description."""
+        if key not in ("standard_code", "seller_code", "description"):
+            raise ValueError("Unknown product key: " + key)
+        firsts = () if key == "description" else ("description",)
+        return _group(self.lines, [key], LINE_AMOUNTS, firsts)
+
+    def group(self, by: str) -> "pa.Table":
+        """One of the ``by_*`` reports by name (see ``GROUPINGS``)."""
+        if by not in GROUPINGS:
+            raise ValueError("Unknown grouping: " + by)
+        return getattr(self, "by_" + by)()
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Spend totals over exported invoices")
+    argparser.add_argument("input_dir", help="folder with the api.export Parquet files")
+    argparser.add_argument("--by", choices=GROUPINGS, default="supplier")
+    argparser.add_argument("--top", type=int, default=None, help="only the N largest")
+    argparser.add_argument("--sort", default=None, help="column --top sorts by")
+    args = argparser.parse_args(argv)
+
+    spend = Spend.read_parquet(args.input_dir)
+    result = spend.group(args.by)
+    if args.top:
+        sort = args.sort or ("tax_amount" if args.by == "tax_scheme" else "line_extension_amount")
+        result = top(result, sort, args.top)
+    print("\t".join(result.column_names))
+    for row in result.to_pylist():
+        print("\t".join(
+            "%.2f" % value if isinstance(value, float) else str(value) for value in row.values()
+        ))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
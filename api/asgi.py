@@ -0,0 +1,226 @@
+"""Async (ASGI) version of the invoice API.
+
+Uploads are received on the event loop, so a slow upload only holds a
+coroutine, and the parse and the response rendering run in a bounded
+process pool. When every worker is busy and the queue in front of the
+pool is full, ``/api/invoice`` answers 503 with ``Retry-After`` instead of
+piling up work.
+
+    uvicorn api.asgi:app --port 5328
+
+MISRECIBOS_WORKERS sets the pool size (default: one per CPU) and
+MISRECIBOS_QUEUE the number of uploads allowed to wait for a worker
+(default: two per worker). Each worker keeps its own parse cache; set
+MISRECIBOS_CACHE_PATH to share the on-disk tier between them.
+"""
+import asyncio
+import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import render_template
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+import api.batch as batch
+import api.encode as encode
+import api.index as index
+import api.metrics as metrics
+import api.render as render
+import api.service as service
+from api.workers import default_workers
+
+
+def render_invoice(
+    filename: str, data: bytes, as_json: bool, projection: encode.Projection = True
+) -> tuple[int, str, bytes, list]:
+    """Parse an upload and render the ``/api/invoice`` response.
+
+    Runs in the pool workers; returns (status, mimetype, body, metrics
+    records) so only bytes cross the process boundary. The body is the one
+    the Flask endpoint sends; the records are replayed in the parent.
+    """
+    with metrics.recording() as records, index.app.app_context():
+        try:
+            invoice = service.parse_file_cached(filename, _Upload(data), "F")
+        except ValueError as e:
+            response = index.app.json.response({"errorMessage": str(e)})
+            return 406, response.mimetype, response.get_data(), records
+        metrics.count_document(invoice)
+        if as_json:
+            with metrics.span("json"):
+                body = (encode.dumps(invoice, projection) + "\n").encode()
+            return 200, "application/json", body, records
+        with metrics.span("render"):
+            body = render.invoice_html(invoice.invoice).encode()
+        return 200, "text/html", body, records
+
+
+class _Upload:
+    # The bits of FileStorage that service.parse_file_cached reads
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            data, self.data = self.data, b""
+        else:
+            data, self.data = self.data[:size], self.data[size:]
+        return data
+
+
+class Pool:
+    """Process pool with a bounded number of jobs queued or running."""
+
+    def __init__(self, workers: int, queue: int):
+        self.workers = workers
+        self.limit = workers + queue
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+        # Made on the event loop, in start()
+        self._slots = None
+        self._batch_slots = None
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.limit)
+        self._batch_slots = asyncio.Semaphore(self.workers)
+        # Workers compile the invoice template before taking any upload
+        self._executor = ProcessPoolExecutor(self.workers, initializer=render.template)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def full(self) -> bool:
+        # Batch jobs waiting for a slot count too
+        return self.pending >= self.limit or self._slots.locked()
+
+    async def run(self, function, *args):
+        # Only called from the event loop, so the counter needs no lock
+        async with self._slots:
+            self.pending += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+            finally:
+                self.pending -= 1
+
+    async def run_batched(self, function, *args):
+        """``run`` for one file of a batch: waits for a slot instead of being
+        turned away, and all batches together take at most one job per
+        worker, so single uploads keep getting through."""
+        async with self._batch_slots:
+            return await self.run(function, *args)
+
+
+def _busy() -> JSONResponse:
+    pool.rejected += 1
+    return JSONResponse(
+        {"errorMessage": "Too many invoices in process, try again"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+def _pool_from_environment() -> Pool:
+    workers = int(os.environ.get("MISRECIBOS_WORKERS") or default_workers())
+    queue = int(os.environ.get("MISRECIBOS_QUEUE") or workers * 2)
+    return Pool(workers, queue)
+
+
+pool = _pool_from_environment()
+
+
+def _wants_json(request: Request) -> bool:
+    # Same negotiation as the Flask endpoint (request.accept_mimetypes.best)
+    accept = parse_accept_header(request.headers.get("accept"), MIMEAccept)
+    return accept.best == "application/json"
+
+
+async def hello_world(request: Request):
+    with index.app.test_request_context():
+        return HTMLResponse(render_template("index.html"))
+
+
+async def invoice(request: Request):
+    projection = encode.parse_projection(request.query_params.get("fields"))
+    async with request.form(max_files=1) as form:
+        file = form.get("file")
+        if file is None or isinstance(file, str):
+            return JSONResponse({"errorMessage": "No file sent"}, status_code=400)
+        data = await file.read()
+        # No await between this check and pool.run taking its slot
+        if pool.full():
+            return _busy()
+        status, mimetype, body, records = await pool.run(
+            render_invoice, file.filename or "", data, _wants_json(request), projection
+        )
+    metrics.replay(records)
+    metrics.REQUESTS.inc(endpoint="invoice", status=status)
+    headers = {"Server-Timing": metrics.server_timing(records)} if records else None
+    return Response(body, status_code=status, media_type=mimetype, headers=headers)
+
+
+async def _stream_results(files: list[tuple[str, bytes | Exception]], projection: encode.Projection):
+    tasks = [
+        asyncio.ensure_future(pool.run_batched(batch.result_line, position, filename, data, projection))
+        for position, (filename, data) in enumerate(files)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def invoices(request: Request):
+    projection = encode.parse_projection(request.query_params.get("fields"))
+    async with request.form(max_files=1000) as form:
+        uploads = [
+            (file.filename or "", await file.read())
+            for file in form.getlist("file")
+            if not isinstance(file, str)
+        ]
+    if not uploads:
+        return JSONResponse({"errorMessage": "No file sent"}, status_code=400)
+    if pool.full():
+        return _busy()
+    files = await asyncio.to_thread(batch.expand_all, uploads)
+    return StreamingResponse(_stream_results(files, projection), media_type="application/x-ndjson")
+
+
+async def metrics_text(request: Request):
+    return Response(metrics.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+
+async def pool_stats(request: Request):
+    return JSONResponse(
+        {"workers": pool.workers, "limit": pool.limit, "pending": pool.pending, "rejected": pool.rejected}
+    )
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    pool.start()
+    try:
+        yield
+    finally:
+        pool.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/index", hello_world),
+        Route("/api/invoice", invoice, methods=["POST"]),
+        Route("/api/invoices", invoices, methods=["POST"]),
+        Route("/api/pool", pool_stats),
+        Route("/api/metrics", metrics_text),
+    ],
+    lifespan=lifespan,
+)
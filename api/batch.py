@@ -0,0 +1,154 @@
+"""Batch parsing of many uploads at once.
+
+Uploads are expanded into single invoice files (a zip whose members are
+zips or XML files is a batch of its own, at any depth), parsed in parallel
+in a process pool, and reported one NDJSON line per file as soon as each
+one is ready:
+
+    {"file": "marzo.zip/FE-1.zip", "index": 0, "document_type": "Invoice", "invoice": {...}}
+    {"file": "marzo.zip/notas.txt", "index": 1, "errorMessage": "Invalid file type"}
+
+``index`` is the position of the file in the batch, since lines arrive in
+completion order. A member that can't be read out of its zip, nests deeper
+than ``MAX_DEPTH`` or would inflate the batch past ``MAX_BATCH_BYTES`` gets
+an error line of its own; the rest of the batch goes on.
+"""
+import io
+import os
+import threading
+import zipfile
+import zlib
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator
+
+import api.encode as encode
+import api.service as service
+from api.workers import default_workers
+
+# Zips inside zips are expanded this many levels down
+MAX_DEPTH = 4
+# Bytes all the members of one batch may inflate to
+MAX_BATCH_BYTES = int(float(os.environ.get("MISRECIBOS_BATCH_MB", "256")) * 1024 * 1024)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> Executor:
+    """The process pool shared by batch requests, started on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                int(os.environ.get("MISRECIBOS_WORKERS") or default_workers())
+            )
+        return _executor
+
+
+def _is_batch(data: bytes) -> bool:
+    # A zip of zips; an AttachedDocument zip only holds XML (and maybe a PDF)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return any(
+            info.filename.lower().endswith(".zip")
+            for info in archive.infolist()
+            if not info.is_dir()
+        )
+
+
+class _Budget:
+    # What is left of MAX_BATCH_BYTES for the members still to be read
+    def __init__(self, size: int):
+        self.left = size
+
+    def take(self, size: int):
+        if size > self.left:
+            raise ValueError("Batch too large: more than %d bytes once unzipped" % MAX_BATCH_BYTES)
+        self.left -= size
+
+
+def expand(
+    filename: str, data: bytes, depth: int = 0, budget: _Budget | None = None
+) -> Iterator[tuple[str, bytes | Exception]]:
+    """Yield (name, data) for every invoice file in an upload; data is the
+    error instead for a member that could not be read."""
+    if not filename.lower().endswith(".zip"):
+        yield filename, data
+        return
+    try:
+        batch = _is_batch(data)
+    except zipfile.BadZipFile:
+        batch = False  # reported when the file is parsed
+    if not batch:
+        yield filename, data
+        return
+    if depth >= MAX_DEPTH:
+        yield filename, ValueError("Zip nested more than %d levels deep" % MAX_DEPTH)
+        return
+    budget = budget or _Budget(MAX_BATCH_BYTES)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            name = filename + "/" + info.filename
+            try:
+                # A member never inflates past its declared size
+                budget.take(info.file_size)
+                member = archive.read(info)
+            except (zipfile.BadZipFile, zlib.error) as e:
+                yield name, ValueError("Not a valid zip file: %s" % e)
+                continue
+            except ValueError as e:
+                yield name, e
+                continue
+            if info.filename.lower().endswith(".zip"):
+                yield from expand(name, member, depth + 1, budget)
+            else:
+                yield name, member
+
+
+def result_line(
+    index: int, filename: str, data: bytes | Exception, projection: encode.Projection = True
+) -> bytes:
+    """Parse one file and encode its result as an NDJSON line.
+
+    Runs in the pool workers, so only bytes cross the process boundary.
+    Errors are reported in the line, never raised.
+    """
+    result = {"file": filename, "index": index}
+    try:
+        if isinstance(data, Exception):
+            raise data
+        root = service.parse_file_cached(filename.lower(), io.BytesIO(data), "F")
+    except Exception as e:
+        result["errorMessage"] = str(e)
+        return encode.dumps(result).encode() + b"\n"
+    result["document_type"] = root.document_type
+    result["invoice"] = root.invoice
+    if projection is not True:
+        projection = {**projection, "file": True, "index": True}
+    return encode.dumps(result, projection).encode() + b"\n"
+
+
+def expand_all(uploads: Iterable[tuple[str, bytes]]) -> list[tuple[str, bytes | Exception]]:
+    return [item for filename, data in uploads for item in expand(filename, data)]
+
+
+def iter_results(
+    uploads: Iterable[tuple[str, bytes]],
+    pool: Executor | None = None,
+    projection: encode.Projection = True,
+) -> Iterator[bytes]:
+    """Yield the NDJSON line of every file in ``uploads`` as it completes."""
+    pool = pool or executor()
+    files = expand_all(uploads)
+    futures = [
+        pool.submit(result_line, index, filename, data, projection)
+        for index, (filename, data) in enumerate(files)
+    ]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # The client went away: drop what has not started yet
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,175 @@
+"""Parse-result cache.
+
+Parsed ``Root`` models are cached under the sha256 of the uploaded bytes and,
+as an alias, under the document's CUFE (``cbc:UUID``), so the same invoice
+is found again whether it comes back as the same file or in another wrapper
+(raw XML vs AttachedDocument zip).
+
+There are two tiers: an in-process LRU bounded by memory, and an optional
+SQLite file shared between processes and restarts, holding the models in
+the ``api.serialize`` binary format. Cached models are shared
+between callers and must not be mutated.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import api.models as models
+import api.serialize as serialize
+
+
+# Memory a parsed document takes: its header, plus this much per line
+# (measured with tracemalloc on the benchmark fixtures)
+DOCUMENT_BYTES = 24 * 1024
+LINE_BYTES = 3200
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimated_size(root: models.Root) -> int:
+    """Memory taken by a parsed document, estimated from its line count."""
+    document = root.invoice
+    lines = getattr(document, "invoice_line", None) or getattr(document, "credit_note_line", None)
+    return DOCUMENT_BYTES + LINE_BYTES * len(lines or ())
+
+
+class ParseCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, path: str | None = None):
+        """``max_bytes`` bounds the memory tier: the models held, as
+        ``estimated_size`` puts them.
+
+        ``path`` enables the on-disk tier, an SQLite database created on
+        first use.
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()  # digest -> (root, cufe, estimated bytes, aliases)
+        self._cufes = {}  # cufe -> digest
+        # digest -> digest of the entry holding the same document (found
+        # by its CUFE), so it is held and counted once
+        self._aliases = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS documents "
+                "(digest TEXT PRIMARY KEY, cufe TEXT, data BLOB NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS documents_cufe ON documents (cufe)")
+            self._db.commit()
+
+    def _remember(self, digest: str, root: models.Root, cufe: str | None):
+        primary = self._aliases.get(digest, digest)
+        if primary in self._entries:
+            self._entries.move_to_end(primary)
+            return
+        if cufe:
+            primary = self._cufes.get(cufe)
+            entry = self._entries.get(primary)
+            if entry is not None and entry[0] is root:
+                entry[3].append(digest)
+                self._aliases[digest] = primary
+                self._entries.move_to_end(primary)
+                return
+        size = estimated_size(root)
+        self._entries[digest] = (root, cufe, size, [])
+        self._size += size
+        if cufe:
+            self._cufes[cufe] = digest
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            _, (_, old_cufe, old_size, aliases) = self._entries.popitem(last=False)
+            self._size -= old_size
+            for alias in aliases:
+                del self._aliases[alias]
+            if old_cufe and self._cufes.get(old_cufe) not in self._entries:
+                del self._cufes[old_cufe]
+
+    def _load(self, column: str, key: str) -> tuple | None:
+        row = self._db.execute(
+            "SELECT digest, cufe, data FROM documents WHERE %s = ?" % column, (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], serialize.loads(row[2])
+
+    def _lookup(self, column: str, key: str | None, count_miss: bool) -> models.Root | None:
+        with self._lock:
+            digest = self._aliases.get(key, key) if column == "digest" else self._cufes.get(key)
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[0]
+            if self._db is not None and key is not None:
+                row = self._load(column, key)
+                if row is not None:
+                    digest, cufe, root = row
+                    self._remember(digest, root, cufe)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return root
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def get(self, digest: str, count_miss: bool = True) -> models.Root | None:
+        """The document parsed from the upload with this hash. Pass
+        ``count_miss=False`` when a miss is followed by ``get_by_cufe``, so a
+        request counts as one lookup."""
+        return self._lookup("digest", digest, count_miss)
+
+    def get_by_cufe(self, cufe: str | None) -> models.Root | None:
+        """The document with this CUFE; a None ``cufe`` is a miss."""
+        return self._lookup("cufe", cufe, True)
+
+    def put(self, digest: str, root: models.Root, cufe: str | None = None):
+        """Cache ``root`` under ``digest`` (and ``cufe``). A document that
+        came from ``get_by_cufe`` is kept once, under both digests."""
+        # Only the disk tier needs the binary form
+        data = serialize.dumps(root) if self._db is not None else None
+        with self._lock:
+            self._remember(digest, root, cufe)
+            if data is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO documents (digest, cufe, data) VALUES (?, ?, ?)",
+                    (digest, cufe, data),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cufes.clear()
+            self._aliases.clear()
+            self._size = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM documents")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def from_environment() -> ParseCache:
+    """Cache configured by MISRECIBOS_CACHE_MB and MISRECIBOS_CACHE_PATH."""
+    return ParseCache(
+        max_bytes=int(float(os.environ.get("MISRECIBOS_CACHE_MB", "64")) * 1024 * 1024),
+        path=os.environ.get("MISRECIBOS_CACHE_PATH") or None,
+    )
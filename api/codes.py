@@ -0,0 +1,57 @@
+"""DIAN code lists, shared with the frontend in ``public/params.json``.
+
+The lists (IDScheme, TaxScheme, AdditionalAccountID, TaxLevel,
+PaymentMeansID, PaymentMeansCode) are read once, on first use, into a dict
+per list keyed by code, so resolving a code is one lookup:
+
+    codes.name("PaymentMeansCode", "10")  # "Efectivo"
+
+MISRECIBOS_PARAMS points to another copy of the file. When it can't be
+read every code resolves to None.
+"""
+import json
+import logging
+import os
+
+PARAMS_PATH = os.environ.get("MISRECIBOS_PARAMS") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "public", "params.json"
+)
+
+_lists = None
+
+
+def code_lists() -> dict[str, dict[str, dict]]:
+    """Every list as ``{code: entry}``, loaded on the first call."""
+    global _lists
+    if _lists is None:
+        try:
+            with open(PARAMS_PATH, encoding="utf-8") as source:
+                params = json.load(source)
+        except (OSError, ValueError) as e:
+            logging.getLogger(__name__).warning("Code lists not loaded: %s", e)
+            params = {}
+        _lists = {
+            list_name: {entry["code"]: entry for entry in entries}
+            for list_name, entries in params.items()
+        }
+    return _lists
+
+
+def entry(list_name: str, code: str | None) -> dict | None:
+    return code_lists().get(list_name, {}).get(code)
+
+
+def name(list_name: str, code: str | None) -> str | None:
+    """The name of ``code`` in ``list_name``, None when it is not listed."""
+    found = entry(list_name, code)
+    return found["name"] if found else None
+
+
+def names(list_name: str, codes: str | None, separator: str = ";") -> str | None:
+    """Names of a ``separator``-separated list of codes (a TaxLevelCode such
+    as ``O-13;O-15``), joined with ``, ``; None when none is listed."""
+    if not codes:
+        return None
+    found = [name(list_name, code.strip()) for code in codes.split(separator)]
+    found = [value for value in found if value]
+    return ", ".join(found) or None
@@ -0,0 +1,130 @@
+"""Duplicate detection across a corpus of documents.
+
+The same invoice arrives as a raw XML, inside an AttachedDocument zip, or
+under another file name. Documents are fingerprinted by their CUFE/CUDE
+(``cbc:UUID``), or, when they carry none, by supplier NIT, ``cbc:ID``,
+issue date and payable amount, read from the XML without building any
+model; a document with none of those has no fingerprint and is never taken
+for a duplicate. ``DedupIndex`` keeps the fingerprints seen so far as 64-bit ints in
+a set; an optional ``BloomFilter`` in front of it can live in shared
+memory, so worker processes can tell a new document apart before doing
+any work on it:
+
+    index = DedupIndex(BloomFilter.shared(capacity=1_000_000))
+    key = fingerprint(document)
+    if key is None or index.add(key):
+        ...  # first time seen
+"""
+import ctypes
+import hashlib
+import math
+import multiprocessing
+from decimal import Decimal
+
+from lxml import etree
+
+import api.models as models
+import api.parser as parser
+
+
+def document_key(document: etree._Element) -> str | None:
+    """What identifies a document: its CUFE, or the fallback fields; None
+    when it carries none of them."""
+    cufe = parser.document_uuid(document)
+    if cufe:
+        return "cufe:" + cufe.lower()
+    payable = models.decimal(parser.find_text(document, "cac:LegalMonetaryTotal/cbc:PayableAmount"))
+    fields = (
+        parser.party(document, "AccountingSupplierParty")[0] or "",
+        parser.find_text(document, "cbc:ID") or "",
+        parser.find_text(document, "cbc:IssueDate") or "",
+        _amount(payable),
+    )
+    if not any(fields):
+        return None
+    return "|".join(("key",) + fields)
+
+
+def _amount(value: Decimal | None) -> str:
+    # 100, 100.0 and 100.00 are the same amount
+    if value is None or not value.is_finite():
+        return ""
+    return format(value.normalize(), "f")
+
+
+def fingerprint_key(key: str) -> bytes:
+    return hashlib.blake2b(key.encode(), digest_size=16).digest()
+
+
+def fingerprint(document: etree._Element) -> bytes | None:
+    """16-byte fingerprint of a document element; None when it has no
+    ``document_key``."""
+    key = document_key(document)
+    return fingerprint_key(key) if key is not None else None
+
+
+class BloomFilter:
+    """Bloom filter over fingerprints, in a bytearray or a shared buffer.
+
+    Bits are set without a lock: in a shared filter, two processes setting
+    bits of the same byte at once may lose one, which only ever turns a
+    "maybe seen" into "not seen".
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001, buffer=None):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = buffer if buffer is not None else bytearray((self.size + 7) // 8)
+
+    @classmethod
+    def shared(cls, capacity: int, error_rate: float = 0.001) -> "BloomFilter":
+        """A filter in shared memory, to hand to pool workers (initargs)."""
+        empty = cls(capacity, error_rate, buffer=b"")
+        return cls(capacity, error_rate, multiprocessing.RawArray(ctypes.c_ubyte, (empty.size + 7) // 8))
+
+    def _positions(self, fingerprint: bytes):
+        # Double hashing over the two halves of the fingerprint
+        first = int.from_bytes(fingerprint[:8], "little")
+        step = int.from_bytes(fingerprint[8:16], "little") | 1
+        size = self.size
+        return [(first + index * step) % size for index in range(self.hashes)]
+
+    def add(self, fingerprint: bytes):
+        bits = self.bits
+        for position in self._positions(fingerprint):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+
+class DedupIndex:
+    """Fingerprints seen so far.
+
+    Only the first 8 bytes of each fingerprint are kept, as an int: with a
+    64-bit key, a false match takes billions of documents.
+    """
+
+    def __init__(self, bloom: BloomFilter | None = None):
+        self.bloom = bloom
+        self._seen = set()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return int.from_bytes(fingerprint[:8], "little") in self._seen
+
+    def add(self, fingerprint: bytes) -> bool:
+        """Record ``fingerprint``; True when it had not been seen before."""
+        key = int.from_bytes(fingerprint[:8], "little")
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        if self.bloom is not None:
+            self.bloom.add(fingerprint)
+        return True
@@ -0,0 +1,231 @@
+"""Streaming JSON encoding of the parsed models.
+
+``iter_json`` walks the model objects directly and yields the document in
+chunks, instead of copying the whole tree with ``dataclasses.asdict`` and
+encoding it in one go. The output is what Flask sends for the ``asdict``
+dict: compact, keys sorted, Decimals as strings.
+
+A projection limits the output to some fields. It is the name of one of
+``PROJECTIONS`` or a list of dotted field paths, relative to ``Root`` and
+applied to every element of a list; paths starting with ``-`` are left out:
+
+    iter_json(root, "summary")
+    iter_json(root, ["invoice.issue_date", "invoice.invoice_line.item.description"])
+    iter_json(root, ["-invoice.ext_ubl_extensions"])  # everything but the signature
+"""
+import dataclasses
+import decimal
+import functools
+import json
+from collections.abc import Mapping
+from json.encoder import encode_basestring_ascii
+from typing import Iterable, Iterator
+
+import api.models as models
+
+CHUNK_SIZE = 64 * 1024
+
+# True: the whole value; False: left out; dict: only the listed fields, "*"
+# standing for the ones not listed
+Projection = bool | dict
+
+_PARTY_PATHS = [
+    "additional_account_name",
+    "party.party_name",
+    "party.party_tax_scheme.registration_name",
+    "party.party_tax_scheme.company_id",
+    "party.physical_location.address",
+]
+
+PROJECTIONS = {
+    "full": [],
+    "nosignature": ["-invoice.ext_ubl_extensions"],
+    "summary": [
+        "document_type",
+        "invoice.id",
+        "invoice.UUID",
+        "invoice.issue_date",
+        "invoice.issue_time",
+        "invoice.document_currency_code",
+        "invoice.tax_total",
+        "invoice.legal_monetary_total",
+    ]
+    + ["invoice.accounting_supplier_party." + path for path in _PARTY_PATHS]
+    + ["invoice.accounting_customer_party." + path for path in _PARTY_PATHS],
+}
+PROJECTIONS["lines"] = PROJECTIONS["summary"] + ["invoice.invoice_line", "invoice.credit_note_line"]
+
+
+def _include(tree: dict, parts: list[str]):
+    node = tree
+    for part in parts[:-1]:
+        child = node.get(part)
+        if child is True or (child is None and node.get("*") is True):
+            return
+        if not isinstance(child, dict):
+            child = node[part] = {}
+        node = child
+    node[parts[-1]] = True
+
+
+def _exclude(tree: dict, parts: list[str]):
+    node = tree
+    for part in parts[:-1]:
+        child = node.get(part, node.get("*", False))
+        if child is False:
+            return
+        if child is True:
+            child = {"*": True}
+        node[part] = child
+        node = child
+    node[parts[-1]] = False
+
+
+def compile_projection(projection: str | Iterable[str] | None) -> Projection:
+    """Turn a projection name or a list of field paths into a tree."""
+    if projection is None:
+        return True
+    if isinstance(projection, str):
+        if projection not in PROJECTIONS:
+            raise ValueError("Unknown projection: " + projection)
+        projection = PROJECTIONS[projection]
+    paths = [path for path in projection if path]
+    if not paths:
+        return True
+    includes = [path.split(".") for path in paths if not path.startswith("-")]
+    excludes = [path[1:].split(".") for path in paths if path.startswith("-")]
+    tree = {} if includes else {"*": True}
+    for parts in includes:
+        _include(tree, parts)
+    for parts in excludes:
+        _exclude(tree, parts)
+    return tree
+
+
+def parse_projection(value: str | None) -> Projection:
+    """Projection from a request parameter: a name or comma-separated paths."""
+    if not value:
+        return True
+    if value in PROJECTIONS:
+        return compile_projection(value)
+    return compile_projection(path.strip() for path in value.split(","))
+
+
+@functools.lru_cache(maxsize=None)
+def _fields(cls: type) -> tuple[tuple[str, str], ...]:
+    # (field name, encoded key) in the sorted order Flask writes them
+    return tuple(
+        (name, encode_basestring_ascii(name) + ":")
+        for name in sorted(field.name for field in dataclasses.fields(cls))
+    )
+
+
+def _child(node: Projection, name: str) -> Projection:
+    if node is True:
+        return True
+    return node.get(name, node.get("*", False))
+
+
+def selected(node: Projection, names: Iterable[str]) -> set | None:
+    """The ``names`` a projection keeps (even partly), None for all of them."""
+    if node is True:
+        return None
+    return {name for name in names if _child(node, name) is not False}
+
+
+def _items(obj, node: Projection) -> list[tuple[str, object, Projection]]:
+    if isinstance(obj, Mapping):
+        keys = sorted(obj)
+        items = [(key, encode_basestring_ascii(str(key)) + ":", obj[key]) for key in keys]
+    else:
+        items = [(name, key, getattr(obj, name)) for name, key in _fields(type(obj))]
+    if node is True:
+        return [(key, value, True) for _, key, value in items]
+    selected = []
+    for name, key, value in items:
+        child = _child(node, name)
+        if child is not False:
+            selected.append((key, value, child))
+    return selected
+
+
+def _encode(obj, node: Projection, out: list):
+    cls = type(obj)
+    if cls is str:
+        out.append(encode_basestring_ascii(obj))
+    elif obj is None:
+        out.append("null")
+    elif cls is list or cls is tuple:
+        out.append("[")
+        for index, item in enumerate(obj):
+            if index:
+                out.append(",")
+            _encode(item, node, out)
+        out.append("]")
+    elif cls is decimal.Decimal:
+        out.append('"%s"' % obj)
+    elif dataclasses.is_dataclass(obj) or isinstance(obj, Mapping):
+        out.append("{")
+        for index, (key, value, child) in enumerate(_items(obj, node)):
+            if index:
+                out.append(",")
+            out.append(key)
+            _encode(value, child, out)
+        out.append("}")
+    else:
+        out.append(json.dumps(obj))
+
+
+def _iter(obj, node: Projection, out: list) -> Iterator[None]:
+    # Like _encode, but yields between the lines of a document and between
+    # its header fields, so the caller can flush what is in ``out``
+    if type(obj) is list:
+        out.append("[")
+        for index, item in enumerate(obj):
+            if index:
+                out.append(",")
+            _encode(item, node, out)
+            yield
+        out.append("]")
+    elif isinstance(obj, (models.Root, models.Document, Mapping)):
+        out.append("{")
+        for index, (key, value, child) in enumerate(_items(obj, node)):
+            if index:
+                out.append(",")
+            out.append(key)
+            yield from _iter(value, child, out)
+            yield
+        out.append("}")
+    else:
+        _encode(obj, node, out)
+
+
+def iter_json(
+    obj, projection: Projection | str | Iterable[str] = True, chunk_size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Yield ``obj`` (a model, or a dict of models) as JSON, in chunks of
+    about ``chunk_size`` characters."""
+    if projection is not True and not isinstance(projection, dict):
+        projection = compile_projection(projection)
+    out = []
+    size = 0
+    flushed = 0
+    for _ in _iter(obj, projection, out):
+        # Only measure what was added since the last check
+        size += sum(len(piece) for piece in out[flushed:])
+        flushed = len(out)
+        if size >= chunk_size:
+            yield "".join(out)
+            out.clear()
+            size = flushed = 0
+    if out:
+        yield "".join(out)
+
+
+def dumps(obj, projection: Projection | str | Iterable[str] = True) -> str:
+    if projection is not True and not isinstance(projection, dict):
+        projection = compile_projection(projection)
+    out = []
+    for _ in _iter(obj, projection, out):
+        pass
+    return "".join(out)
@@ -0,0 +1,319 @@
+"""Columnar export of parsed invoices for analytics.
+
+A batch of ``Root`` documents is flattened, column by column, into three
+tables: ``headers`` (one row per document), ``lines`` (one row per invoice
+or credit note line) and ``taxes`` (one row per tax subtotal, document and
+line level). Amounts and quantities are float64 columns taken from the
+models' parsed Decimals, missing values are nulls. Tables are written as
+Parquet with pyarrow, which is only needed for writing: ``pip install pyarrow``.
+
+    python -m api.export xmls exports
+"""
+import argparse
+import math
+import multiprocessing
+import os
+import sys
+import time
+
+import api.models as models
+import api.serialize as serialize
+import api.service as service
+from api.workers import default_workers
+
+HEADER_COLUMNS = {
+    "cufe": "string",
+    "document_id": "string",
+    "document_type": "string",
+    "issue_date": "date",
+    "currency": "string",
+    "supplier_nit": "string",
+    "supplier_name": "string",
+    "customer_id": "string",
+    "customer_name": "string",
+    "line_count": "int",
+    "line_extension_amount": "float",
+    "tax_exclusive_amount": "float",
+    "tax_inclusive_amount": "float",
+    "allowance_total_amount": "float",
+    "charge_total_amount": "float",
+    "payable_amount": "float",
+}
+
+LINE_COLUMNS = {
+    "cufe": "string",
+    "document_id": "string",
+    "document_type": "string",
+    "issue_date": "date",
+    "supplier_nit": "string",
+    "line_id": "string",
+    "description": "string",
+    "standard_code": "string",
+    "seller_code": "string",
+    "quantity": "float",
+    "unit_code": "string",
+    "price": "float",
+    "allowance": "float",
+    "line_extension_amount": "float",
+    "tax_amount": "float",
+    "currency": "string",
+}
+
+TAX_COLUMNS = {
+    "cufe": "string",
+    "document_id": "string",
+    "document_type": "string",
+    "issue_date": "date",
+    "line_id": "string",
+    "tax_scheme_id": "string",
+    "tax_scheme_name": "string",
+    "percent": "float",
+    "taxable_amount": "float",
+    "tax_amount": "float",
+}
+
+
+def clean_text(value: str | None) -> str | None:
+    """A model text field, None when missing (the models turn missing
+    elements into "None")."""
+    if value is None or value == "None":
+        return None
+    return value
+
+
+def _number(value) -> float | None:
+    # Amounts and quantities carry their parsed Decimal; plain strings
+    # (TaxCategory.percent) are converted here
+    if value is None:
+        return None
+    if type(value) is not str:
+        value = value.value
+        return None if value is None or value.is_nan() else float(value)
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def _tax_amount(tax_totals: list | None) -> float | None:
+    # Of every tax scheme of a line
+    amounts = [_number(tax_total.tax_amount) for tax_total in tax_totals or () if tax_total]
+    amounts = [amount for amount in amounts if amount is not None]
+    return sum(amounts) if amounts else None
+
+
+def lines_of(document: models.Document) -> list:
+    if isinstance(document, models.CreditNote):
+        return document.credit_note_line
+    return document.invoice_line
+
+
+def quantity_of(line: models.InvoiceLine):
+    """InvoicedQuantity of an invoice line, CreditedQuantity of a credit note one."""
+    return line.invoiced_quantity if line.invoiced_quantity is not None else line.credited_quantity
+
+
+def company_id(party) -> str | None:
+    """NIT (or other ID) of an AccountingSupplierParty/CustomerParty."""
+    scheme = party.party.party_tax_scheme if party and party.party else None
+    if scheme is None or scheme.company_id is None:
+        return None
+    return clean_text(scheme.company_id.text)
+
+
+def party_name(party) -> str | None:
+    """Name of an AccountingSupplierParty/CustomerParty."""
+    if party is None or party.party is None or party.party.party_name is None:
+        return None
+    return clean_text(party.party.party_name.name)
+
+
+class Tables:
+    """Column-oriented tables, filled one document at a time."""
+
+    def __init__(self):
+        self.headers = {name: [] for name in HEADER_COLUMNS}
+        self.lines = {name: [] for name in LINE_COLUMNS}
+        self.taxes = {name: [] for name in TAX_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.headers["cufe"])
+
+    def _tax(self, keys: tuple, line_id: str | None, tax_totals: list | None):
+        # One row per subtotal, of every tax scheme
+        taxes = self.taxes
+        subtotals = [
+            subtotal
+            for tax_total in tax_totals or () if tax_total
+            for subtotal in tax_total.tax_subtotal or () if subtotal
+        ]
+        for subtotal in subtotals:
+            category = subtotal.tax_category
+            scheme = category.tax_scheme if category else None
+            for name, value in zip(("cufe", "document_id", "document_type", "issue_date"), keys):
+                taxes[name].append(value)
+            taxes["line_id"].append(line_id)
+            taxes["tax_scheme_id"].append(clean_text(scheme.id) if scheme else None)
+            taxes["tax_scheme_name"].append(clean_text(scheme.name) if scheme else None)
+            taxes["percent"].append(_number(category.percent) if category else None)
+            taxes["taxable_amount"].append(_number(subtotal.taxable_amount))
+            taxes["tax_amount"].append(_number(subtotal.tax_amount))
+
+    def add(self, root: models.Root):
+        document = root.invoice
+        cufe = clean_text(document.UUID.text) if document.UUID else None
+        document_id = clean_text(document.id.text) if document.id else None
+        issue_date = clean_text(document.issue_date)
+        supplier_nit = company_id(document.accounting_supplier_party)
+        currency = clean_text(document.document_currency_code)
+        lines = [line for line in lines_of(document) or [] if line is not None]
+
+        headers = self.headers
+        totals = document.legal_monetary_total
+        headers["cufe"].append(cufe)
+        headers["document_id"].append(document_id)
+        headers["document_type"].append(root.document_type)
+        headers["issue_date"].append(issue_date)
+        headers["currency"].append(currency)
+        headers["supplier_nit"].append(supplier_nit)
+        headers["supplier_name"].append(party_name(document.accounting_supplier_party))
+        headers["customer_id"].append(company_id(document.accounting_customer_party))
+        headers["customer_name"].append(party_name(document.accounting_customer_party))
+        headers["line_count"].append(len(lines))
+        for name in (
+            "line_extension_amount", "tax_exclusive_amount", "tax_inclusive_amount",
+            "allowance_total_amount", "charge_total_amount", "payable_amount",
+        ):
+            headers[name].append(_number(getattr(totals, name)) if totals else None)
+
+        keys = (cufe, document_id, root.document_type, issue_date)
+        self._tax(keys, None, document.tax_total)
+
+        # Column lists are bound once (in LINE_COLUMNS order); the per-line
+        # loop only appends
+        (
+            l_cufe, l_document_id, l_document_type, l_issue_date, l_supplier_nit, l_line_id,
+            l_description, l_standard_code, l_seller_code, l_quantity, l_unit_code, l_price,
+            l_allowance, l_line_extension_amount, l_tax_amount, l_currency,
+        ) = self.lines.values()
+        for line in lines:
+            item = line.item
+            quantity = quantity_of(line)
+            price = line.price
+            tax_totals = line.tax_total
+            l_cufe.append(cufe)
+            l_document_id.append(document_id)
+            l_document_type.append(root.document_type)
+            l_issue_date.append(issue_date)
+            l_supplier_nit.append(supplier_nit)
+            l_line_id.append(clean_text(line.id))
+            l_description.append(clean_text(item.description) if item else None)
+            l_standard_code.append(
+                clean_text(item.standard_item_identification.id.text)
+                if item and item.standard_item_identification and item.standard_item_identification.id
+                else None
+            )
+            l_seller_code.append(
+                clean_text(item.sellers_item_identification.id.text)
+                if item and item.sellers_item_identification and item.sellers_item_identification.id
+                else None
+            )
+            l_quantity.append(_number(quantity))
+            l_unit_code.append(clean_text(quantity.unit_code) if quantity else None)
+            l_price.append(_number(price.price_amount) if price else None)
+            l_allowance.append(_number(line.allowance_charge.amount) if line.allowance_charge else None)
+            l_line_extension_amount.append(_number(line.line_extension_amount))
+            l_tax_amount.append(_tax_amount(tax_totals))
+            l_currency.append(currency)
+            self._tax(keys, clean_text(line.id), tax_totals)
+
+    def extend(self, roots):
+        for root in roots:
+            self.add(root)
+        return self
+
+    def columns(self) -> dict:
+        return {"headers": self.headers, "lines": self.lines, "taxes": self.taxes}
+
+
+def to_tables(roots) -> Tables:
+    return Tables().extend(roots)
+
+
+def arrow_table(columns: dict, types: dict):
+    """A ``Tables`` column dict as a ``pyarrow.Table`` with the types of
+    ``HEADER_COLUMNS``, ``LINE_COLUMNS`` or ``TAX_COLUMNS``."""
+    import pyarrow as pa
+
+    arrow_types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64(), "date": pa.string()}
+    table = pa.table({name: pa.array(columns[name], arrow_types[kind]) for name, kind in types.items()})
+    for index, (name, kind) in enumerate(types.items()):
+        if kind == "date":
+            # ISO dates; anything unparseable becomes null rather than failing the export
+            dates = pa.compute.strptime(table[name], format="%Y-%m-%d", unit="s", error_is_null=True)
+            table = table.set_column(index, name, pa.compute.cast(dates, pa.date32()))
+    return table
+
+
+def write_parquet(tables: Tables, output_dir: str) -> dict:
+    """Write the three tables as ``<name>.parquet``, returning their paths."""
+    try:
+        import pyarrow.compute  # noqa: F401
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    schemas = {"headers": HEADER_COLUMNS, "lines": LINE_COLUMNS, "taxes": TAX_COLUMNS}
+    for name, columns in tables.columns().items():
+        paths[name] = os.path.join(output_dir, name + ".parquet")
+        pq.write_table(arrow_table(columns, schemas[name]), paths[name], compression="zstd")
+    return paths
+
+
+def load_serialized(file_path: str) -> list[bytes] | str:
+    """The documents of an xml/zip/mrb file in the ``api.serialize`` format,
+    or the error as a string; meant for pool workers, so models travel back
+    as bytes and one bad file can't stop a run."""
+    try:
+        if file_path.endswith(".mrb"):
+            with open(file_path, "rb") as source:
+                return [source.read()]
+        return [serialize.dumps(root) for root in service.iter_parse_file(file_path)]
+    except Exception as e:
+        return "%s: %s" % (type(e).__name__, e)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Export invoices to Parquet tables")
+    argparser.add_argument("input_dir", help="folder with .xml, .zip or .mrb files")
+    argparser.add_argument("output_dir")
+    argparser.add_argument("-w", "--workers", type=int, default=None)
+    args = argparser.parse_args(argv)
+
+    files = sorted(
+        os.path.join(args.input_dir, name)
+        for name in os.listdir(args.input_dir)
+        if name.endswith((".xml", ".zip", ".mrb"))
+    )
+    tables = Tables()
+    failed = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(min(args.workers or default_workers(), max(len(files), 1))) as pool:
+        for result in pool.imap_unordered(load_serialized, files, chunksize=16):
+            if isinstance(result, str):
+                failed += 1
+                continue
+            for data in result:
+                tables.add(serialize.loads(data))
+    write_parquet(tables, args.output_dir)
+    print(
+        "%d documents, %d lines, %d failed files in %.1fs"
+        % (len(tables), len(tables.lines["cufe"]), failed, time.perf_counter() - start)
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,37 @@
-import dataclasses
+import functools
 import logging
 from flask import Flask, render_template, request
+import api.batch as batch
+import api.encode as encode
+import api.metrics as metrics
 import api.models as models
+import api.render as render
 import api.service as service
-import xmltodict
 
 app = Flask(__name__)
+app.jinja_env.filters["money"] = render.money
+
+
+def _json_lines(chunks):
+    # Flask ends its JSON responses with a newline
+    yield from metrics.timed(chunks, "json")
+    yield "\n"
+
+
+def instrumented(view):
+    """Count the requests of a view and send its stage timings back in a
+    Server-Timing header."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with metrics.recording() as records:
+            response = app.make_response(view(*args, **kwargs))
+        timing = metrics.server_timing(records)
+        if timing:
+            response.headers["Server-Timing"] = timing
+        metrics.REQUESTS.inc(endpoint=request.endpoint, status=response.status_code)
+        return response
+
+    return wrapper
 
 
 @app.route("/api/index")
@@ -14,18 +40,46 @@ def hello_world():
 
 
 @app.route("/api/invoice", methods=["POST"])
+@instrumented
 def invoice():
     # Get the sent file
     file = request.files["file"]
+    # ?fields=summary|lines|nosignature or comma-separated field paths
+    projection = encode.parse_projection(request.args.get("fields"))
     # Parse the file
     try:
-        ddict = xmltodict.parse(service.open_file_storage(file))
+        invoice: models.Root = service.parse_file_storage_cached(file)
     except ValueError as e:
         return {'errorMessage': str(e)}, 406
-
-    invoice: models.Root = models.Root.from_dict(ddict)
+    metrics.count_document(invoice)
 
     if request.accept_mimetypes.best == "application/json":
-        return dataclasses.asdict(invoice)
+        return app.response_class(
+            _json_lines(encode.iter_json(invoice, projection)), mimetype="application/json"
+        )
+
+    with metrics.span("render"):
+        return render.invoice_html(invoice.invoice)
+
+
+@app.route("/api/invoices", methods=["POST"])
+@instrumented
+def invoices():
+    # Many files, or zips of zips, in one request; one NDJSON line per file
+    uploads = [(file.filename or "", file.read()) for file in request.files.getlist("file")]
+    if not uploads:
+        return {'errorMessage': "No file sent"}, 400
+    projection = encode.parse_projection(request.args.get("fields"))
+    return app.response_class(
+        batch.iter_results(uploads, projection=projection), mimetype="application/x-ndjson"
+    )
+
+
+@app.route("/api/cache")
+def cache_stats():
+    return service.parse_cache.stats()
+
 
-    return render_template("invoice.html", invoice=invoice.invoice)
+@app.route("/api/metrics")
+def metrics_text():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
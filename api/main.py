@@ -1,14 +1,11 @@
 # Main file for standalone execution
 import api.models as models
-import xmltodict
 import api.service as service
 
 filename = input("Enter the filename: ")
 
-file = service.open_file(filename)
-ddict = xmltodict.parse(file)
-
-root: models.Root = models.Root.from_dict(ddict)
+# Only the parties, date, currency, totals and lines printed below are built
+root: models.Root = service.parse_file(filename, projection="lines")
 invoice: models.Invoice = root.invoice
 
 print(
@@ -19,17 +16,23 @@ print(
     "Cliente: "
     + invoice.accounting_customer_party.party.party_name.name
 )
-print("Direccion: " + invoice.accounting_customer_party.party.physical_location.address.address_line.line)
+print(
+    "Direccion: "
+    + " ".join(
+        line.line
+        for line in invoice.accounting_customer_party.party.physical_location.address.address_line
+    )
+)
 print("Fecha: " + invoice.issue_date)
 print("Moneda: " + invoice.document_currency_code)
-print("Total: " + str(invoice.legal_monetary_total.tax_inclusive_amount))
+print("Total: " + str(invoice.legal_monetary_total.tax_inclusive_amount.value))
 
 for prod in invoice.invoice_line:
     print("Descripcion: " + prod.item.description)
-    print("Cantidad: " + str(prod.invoiced_quantity))
-    print("Precio: " + str(prod.price.price_amount))
-    print("Descuento: " + str(prod.allowance_charge.amount if prod.allowance_charge else 0))
-    print("Total: " + str(prod.line_extension_amount))
+    print("Cantidad: " + str(prod.invoiced_quantity.value))
+    print("Precio: " + str(prod.price.price_amount.value))
+    print("Descuento: " + str(prod.allowance_charge.amount.value if prod.allowance_charge else 0))
+    print("Total: " + str(prod.line_extension_amount.value))
     print("---------------------------------")
 
     print("")
@@ -0,0 +1,216 @@
+"""In-process metrics, exported in the Prometheus text format.
+
+Stages of an upload are timed with ``span``, which feeds the
+``misrecibos_stage_seconds`` histogram::
+
+    with metrics.span("parse"):
+        ...
+
+``recording`` also collects every observation made inside it, so a request
+can report its own stage timings (``server_timing``) and a worker process
+can send its observations back for the parent to ``replay``.
+"""
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Iterator
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_records = contextvars.ContextVar("metrics_records", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = ['%s="%s"' % (name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _record(self, key: tuple, value: float):
+        records = _records.get()
+        if records is not None:
+            records.append((self.name, key, value))
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        self.add(self._key(labels), amount)
+
+    def add(self, key: tuple, amount: float):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._record(key, amount)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield "%s%s %s" % (self.name, _labels(self.label_names, key), repr(float(value)))
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        self.add(self._key(labels), value)
+
+    def add(self, key: tuple, value: float):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+        self._record(key, value)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield "%s_bucket%s %d" % (self.name, _labels(self.label_names, key, 'le="%s"' % le), cumulative)
+            yield "%s_sum%s %s" % (self.name, _labels(self.label_names, key), repr(total))
+            yield "%s_count%s %d" % (self.name, _labels(self.label_names, key), count)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "misrecibos_stage_seconds", "Time spent in each stage of handling a document", ("stage",)
+)
+REQUESTS = REGISTRY.counter(
+    "misrecibos_requests_total", "Requests handled", ("endpoint", "status")
+)
+UPLOAD_BYTES = REGISTRY.counter("misrecibos_upload_bytes_total", "Bytes of uploaded files read")
+DOCUMENTS = REGISTRY.counter(
+    "misrecibos_documents_total", "Documents returned", ("document_type",)
+)
+LINES = REGISTRY.counter(
+    "misrecibos_lines_total", "Lines of the documents returned", ("document_type",)
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@contextlib.contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def timed(chunks: Iterator, stage: str) -> Iterator:
+    """Pass ``chunks`` through, timing only the time spent producing them
+    (not what the consumer does in between, e.g. writing to a socket)."""
+    elapsed = 0.0
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        elapsed += time.perf_counter() - start
+        if chunk is None:
+            break
+        yield chunk
+    STAGE_SECONDS.observe(elapsed, stage=stage)
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[list]:
+    """Collect the (metric, labels, value) observations made inside."""
+    records = []
+    token = _records.set(records)
+    try:
+        yield records
+    finally:
+        _records.reset(token)
+
+
+def replay(records: list, registry: Registry = REGISTRY):
+    """Apply observations recorded elsewhere (another process) here."""
+    for name, key, value in records:
+        metric = registry.metrics.get(name)
+        if metric is not None:
+            metric.add(tuple(key), value)
+
+
+def server_timing(records: list) -> str:
+    """Stage timings of a recording, as a ``Server-Timing`` header value."""
+    return ", ".join(
+        "%s;dur=%.1f" % (key[0], value * 1e3)
+        for name, key, value in records
+        if name == STAGE_SECONDS.name
+    )
+
+
+def count_document(root):
+    """Count a returned document and its lines."""
+    invoice = root.invoice
+    lines = getattr(invoice, "invoice_line", None) or getattr(invoice, "credit_note_line", None) or []
+    DOCUMENTS.inc(document_type=root.document_type)
+    LINES.inc(len(lines), document_type=root.document_type)
+
+
+def render() -> str:
+    return REGISTRY.render()
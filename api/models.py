@@ -1,18 +1,51 @@
-import dataclasses
+from collections.abc import Mapping
+from decimal import Decimal, InvalidOperation
+from sys import intern
 from typing import List, Optional
 from dataclasses import dataclass
 
+import api.codes as codes
+
+
+# Amounts past 10^30 (or below 10^-30) are no invoice's: an exponent like
+# 1E+10000000 would otherwise make a 10-million-digit string when formatted
+MAX_EXPONENT = 30
+
+
+def decimal(text: str | None) -> Optional[Decimal]:
+    """Parse a numeric element once; None when it is missing, not a number,
+    not finite (NaN, Infinity) or out of the ``MAX_EXPONENT`` range."""
+    if text is None:
+        return None
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not value.is_finite() or abs(value.adjusted()) > MAX_EXPONENT:
+        return None
+    return value
+
+
+def each(value, build) -> list:
+    """``build`` applied to a repeatable element: xmltodict gives a list
+    when it repeats, the element itself otherwise and None when missing."""
+    if value is None:
+        return []
+    if type(value) is list:
+        return [build(item) for item in value]
+    return [build(value)]
+
 
 def nullable(func):
-    def wrapper(obj):
+    def wrapper(obj, *args):
         if obj is None:
             return None
-        return func(obj)
+        return func(obj, *args)
 
     return wrapper
 
 
-@dataclass
+@dataclass(slots=True)
 class ID:
     scheme_id: Optional[str]
     scheme_name: Optional[str]
@@ -21,7 +54,7 @@ class ID:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "ID":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return ID(None, None, obj)
         _scheme_id = str(obj.get("@schemeID"))
         _scheme_name = str(obj.get("@schemeName"))
@@ -29,41 +62,51 @@ class ID:
         return ID(_scheme_id, _scheme_name, _text)
 
 
-@dataclass
+@dataclass(slots=True)
 class PartyIdentification:
     id: ID | str
+    id_scheme_name: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "PartyIdentification":
         _id = ID.from_dict(obj.get("cbc:ID"))
-        return PartyIdentification(_id)
+        _id_scheme_name = codes.name("IDScheme", _id.scheme_name) if _id else None
+        return PartyIdentification(_id, _id_scheme_name)
 
 
-@dataclass
+@dataclass(slots=True)
 class CompanyID:
     scheme_id: Optional[str]
     scheme_name: Optional[str]
     scheme_agency_id: Optional[str]
     scheme_agency_name: Optional[str]
     text: str
+    # Name of the identification type in scheme_name ("31": "NIT")
+    id_scheme_name: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "CompanyID":
-        if type(obj) is not dict:
-            return CompanyID(None, None, None, None, obj)
+        if not isinstance(obj, Mapping):
+            return CompanyID(None, None, None, None, obj, None)
         _scheme_id = str(obj.get("@schemeID"))
         _scheme_name = str(obj.get("@schemeName"))
         _scheme_agency_id = str(obj.get("@schemeAgencyID"))
         _scheme_agency_name = str(obj.get("@schemeAgencyName"))
         _text = str(obj.get("#text"))
+        _id_scheme_name = codes.name("IDScheme", _scheme_name)
         return CompanyID(
-            _scheme_id, _scheme_name, _scheme_agency_id, _scheme_agency_name, _text
+            _scheme_id,
+            _scheme_name,
+            _scheme_agency_id,
+            _scheme_agency_name,
+            _text,
+            _id_scheme_name,
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class CorporateRegistrationScheme:
     id: str
     name: str
@@ -76,7 +119,7 @@ class CorporateRegistrationScheme:
         return CorporateRegistrationScheme(_id, _name)
 
 
-@dataclass
+@dataclass(slots=True)
 class PartyLegalEntity:
     registration_name: str
     company_id: CompanyID
@@ -95,7 +138,7 @@ class PartyLegalEntity:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PartyName:
     name: str
 
@@ -106,35 +149,42 @@ class PartyName:
         return PartyName(_name)
 
 
-@dataclass
+@dataclass(slots=True)
 class TaxScheme:
     id: str
     name: str
+    # From the TaxScheme code list
+    description: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "TaxScheme":
         _id = str(obj.get("cbc:ID"))
         _name = str(obj.get("cbc:Name"))
-        return TaxScheme(_id, _name)
+        _entry = codes.entry("TaxScheme", _id)
+        _description = _entry.get("description") if _entry else None
+        return TaxScheme(_id, _name, _description)
 
 
-@dataclass
+@dataclass(slots=True)
 class TaxLevelCode:
     list_name: Optional[str]
     text: str
+    # Names of the ";"-separated codes in text
+    name: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "TaxLevelCode":
-        if type(obj) is not dict:
-            return TaxLevelCode(None, obj)
+        if not isinstance(obj, Mapping):
+            return TaxLevelCode(None, obj, codes.names("TaxLevel", obj))
         _list_name = str(obj.get("@listName"))
         _text = str(obj.get("#text"))
-        return TaxLevelCode(_list_name, _text)
+        _name = codes.names("TaxLevel", _text)
+        return TaxLevelCode(_list_name, _text, _name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Name:
     language_id: Optional[str]
     text: str
@@ -142,14 +192,14 @@ class Name:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "Name":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return Name(None, obj)
         _language_id = str(obj.get("@languageID"))
         _text = str(obj.get("#text"))
         return Name(_language_id, _text)
 
 
-@dataclass
+@dataclass(slots=True)
 class Country:
     identification_code: str
     name: Name
@@ -162,7 +212,7 @@ class Country:
         return Country(_identification_code, _name)
 
 
-@dataclass
+@dataclass(slots=True)
 class AddressLine:
     line: str
 
@@ -173,7 +223,7 @@ class AddressLine:
         return AddressLine(_line)
 
 
-@dataclass
+@dataclass(slots=True)
 class Address:
     id: str
     city_name: str
@@ -208,7 +258,7 @@ class Address:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PartyTaxScheme:
     registration_name: str
     company_id: CompanyID
@@ -233,7 +283,7 @@ class PartyTaxScheme:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PhysicalLocation:
     name: str
     address: Address
@@ -246,7 +296,7 @@ class PhysicalLocation:
         return PhysicalLocation(_name, _address)
 
 
-@dataclass
+@dataclass(slots=True)
 class Contact:
     telephone: str
     electronic_mail: str
@@ -261,7 +311,7 @@ class Contact:
         return Contact(_telephone, _electronic_mail, _name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Person:
     first_name: str
     family_name: str
@@ -274,7 +324,7 @@ class Person:
         return Person(_first_name, _family_name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Party:
     party_name: PartyName
     person: Person
@@ -312,63 +362,73 @@ class Party:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AccountingCustomerParty:
     additional_account_id: str
     party: Party
+    additional_account_name: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "AccountingCustomerParty":
         _additional_account_id = str(obj.get("cbc:AdditionalAccountID"))
         _party = Party.from_dict(obj.get("cac:Party"))
-        return AccountingCustomerParty(_additional_account_id, _party)
+        _additional_account_name = codes.name("AdditionalAccountID", _additional_account_id)
+        return AccountingCustomerParty(_additional_account_id, _party, _additional_account_name)
 
 
-@dataclass
+@dataclass(slots=True)
 class AccountingSupplierParty:
     additional_account_id: str
     party: Party
+    additional_account_name: Optional[str]
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "AccountingSupplierParty":
         _additional_account_id = str(obj.get("cbc:AdditionalAccountID"))
         _party = Party.from_dict(obj.get("cac:Party"))
-        return AccountingSupplierParty(_additional_account_id, _party)
+        _additional_account_name = codes.name("AdditionalAccountID", _additional_account_id)
+        return AccountingSupplierParty(_additional_account_id, _party, _additional_account_name)
 
 
-@dataclass
+@dataclass(slots=True)
 class Amount:
+    """Monetary value shared by every (currencyID, text) amount element.
+
+    ``value`` is the text parsed as a Decimal at build time, so totals are
+    exact and nothing downstream has to convert the string again.
+    """
+
     currency_id: Optional[str]
     text: str
+    value: Optional[Decimal] = None
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "Amount":
-        if type(obj) is not dict:
-            return Amount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
+        if not isinstance(obj, Mapping):
+            return Amount(None, obj, decimal(obj))
+        _currency_id = intern(str(obj.get("@currencyID")))
         _text = str(obj.get("#text"))
-        return Amount(_currency_id, _text)
+        return Amount(_currency_id, _text, decimal(_text))
 
 
-@dataclass
-class BaseAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "BaseAmount":
-        if type(obj) is not dict:
-            return BaseAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return BaseAmount(_currency_id, _text)
+# The UBL amount elements only differ by tag name
+BaseAmount = Amount
+LineExtensionAmount = Amount
+TaxAmount = Amount
+TaxableAmount = Amount
+PriceAmount = Amount
+AllowanceTotalAmount = Amount
+ChargeTotalAmount = Amount
+PayableAmount = Amount
+PayableRoundingAmount = Amount
+TaxExclusiveAmount = Amount
+TaxInclusiveAmount = Amount
 
 
-@dataclass
+@dataclass(slots=True)
 class AllowanceCharge:
     id: str
     charge_indicator: str
@@ -389,65 +449,42 @@ class AllowanceCharge:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Note:
     text: str
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "Note":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return Note(obj)
         _text = str(obj.get("#text"))
         return Note(_text)
 
 
-@dataclass
-class InvoicedQuantity:
-    unit_code: Optional[str]
-    text: str
+@dataclass(slots=True)
+class Quantity:
+    """Quantity shared by every (unitCode, text) quantity element."""
 
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "InvoicedQuantity":
-        if type(obj) is not dict:
-            return InvoicedQuantity(None, obj)
-        _unit_code = str(obj.get("@unitCode"))
-        _text = str(obj.get("#text"))
-        return InvoicedQuantity(_unit_code, _text)
-
-
-@dataclass
-class LineExtensionAmount:
-    currency_id: Optional[str]
+    unit_code: Optional[str]
     text: str
+    value: Optional[Decimal] = None
 
     @nullable
     @staticmethod
-    def from_dict(obj: dict | str | None) -> "LineExtensionAmount":
-        if type(obj) is not dict:
-            return LineExtensionAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
+    def from_dict(obj: dict | str | None) -> "Quantity":
+        if not isinstance(obj, Mapping):
+            return Quantity(None, obj, decimal(obj))
+        _unit_code = intern(str(obj.get("@unitCode")))
         _text = str(obj.get("#text"))
-        return LineExtensionAmount(_currency_id, _text)
+        return Quantity(_unit_code, _text, decimal(_text))
 
 
-@dataclass
-class TaxAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "TaxAmount":
-        if type(obj) is not dict:
-            return TaxAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return TaxAmount(_currency_id, _text)
+InvoicedQuantity = Quantity
+BaseQuantity = Quantity
 
 
-@dataclass
+@dataclass(slots=True)
 class TaxCategory:
     percent: str
     tax_scheme: TaxScheme
@@ -460,22 +497,7 @@ class TaxCategory:
         return TaxCategory(_percent, _tax_scheme)
 
 
-@dataclass
-class TaxableAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "TaxableAmount":
-        if type(obj) is not dict:
-            return TaxableAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return TaxableAmount(_currency_id, _text)
-
-
-@dataclass
+@dataclass(slots=True)
 class TaxSubtotal:
     taxable_amount: TaxableAmount
     tax_amount: TaxAmount
@@ -490,22 +512,23 @@ class TaxSubtotal:
         return TaxSubtotal(_taxable_amount, _tax_amount, _tax_category)
 
 
-@dataclass
+@dataclass(slots=True)
 class TaxTotal:
     tax_amount: TaxAmount
-    tax_subtotal: TaxSubtotal
+    # One per rate of the scheme
+    tax_subtotal: List[TaxSubtotal]
     tax_rounding_amount: TaxAmount  # It's the same implementation as TaxAmount
 
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "TaxTotal":
         _tax_amount = TaxAmount.from_dict(obj.get("cbc:TaxAmount"))
-        _tax_subtotal = TaxSubtotal.from_dict(obj.get("cac:TaxSubtotal"))
+        _tax_subtotal = each(obj.get("cac:TaxSubtotal"), TaxSubtotal.from_dict)
         _tax_rounding_amount = TaxAmount.from_dict(obj.get("cbc:TaxAmount"))
         return TaxTotal(_tax_amount, _tax_subtotal, _tax_rounding_amount)
 
 
-@dataclass
+@dataclass(slots=True)
 class StandardItemIdentification:
     id: ID
 
@@ -516,7 +539,7 @@ class StandardItemIdentification:
         return StandardItemIdentification(_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class Item:
     description: str
     standard_item_identification: StandardItemIdentification
@@ -546,37 +569,7 @@ class Item:
         )
 
 
-@dataclass
-class PriceAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "PriceAmount":
-        if type(obj) is not dict:
-            return PriceAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return PriceAmount(_currency_id, _text)
-
-
-@dataclass
-class BaseQuantity:
-    unit_code: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "BaseQuantity":
-        if type(obj) is not dict:
-            return BaseQuantity(None, obj)
-        _unit_code = str(obj.get("@unitCode"))
-        _text = str(obj.get("#text"))
-        return BaseQuantity(_unit_code, _text)
-
-
-@dataclass
+@dataclass(slots=True)
 class Price:
     price_amount: PriceAmount
     base_quantity: BaseQuantity
@@ -589,14 +582,17 @@ class Price:
         return Price(_price_amount, _base_quantity)
 
 
-@dataclass
+@dataclass(slots=True)
 class InvoiceLine:
     id: str
     note: List[Note]
     invoiced_quantity: InvoicedQuantity
+    # CreditNote lines carry their quantity here instead
+    credited_quantity: Optional[InvoicedQuantity]
     line_extension_amount: LineExtensionAmount
     allowance_charge: AllowanceCharge
-    tax_total: TaxTotal
+    # One per tax scheme (IVA, INC, ICA...)
+    tax_total: List[TaxTotal]
     item: Item
     price: Price
 
@@ -610,17 +606,19 @@ class InvoiceLine:
             else [Note.from_dict(obj.get("cbc:Note"))]
         )
         _invoiced_quantity = InvoicedQuantity.from_dict(obj.get("cbc:InvoicedQuantity"))
+        _credited_quantity = InvoicedQuantity.from_dict(obj.get("cbc:CreditedQuantity"))
         _line_extension_amount = LineExtensionAmount.from_dict(
             obj.get("cbc:LineExtensionAmount")
         )
         _allowance_charge = AllowanceCharge.from_dict(obj.get("cac:AllowanceCharge"))
-        _tax_total = TaxTotal.from_dict(obj.get("cac:TaxTotal"))
+        _tax_total = each(obj.get("cac:TaxTotal"), TaxTotal.from_dict)
         _item = Item.from_dict(obj.get("cac:Item"))
         _price = Price.from_dict(obj.get("cac:Price"))
         return InvoiceLine(
             _id,
             _note,
             _invoiced_quantity,
+            _credited_quantity,
             _line_extension_amount,
             _allowance_charge,
             _tax_total,
@@ -629,12 +627,15 @@ class InvoiceLine:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class PaymentMeans:
     id: ID
     payment_means_code: str
     payment_due_date: str
     payment_id: str
+    # Payment method (cash or credit) and means, from the code lists
+    id_name: Optional[str]
+    payment_means_name: Optional[str]
 
     @nullable
     @staticmethod
@@ -643,41 +644,20 @@ class PaymentMeans:
         _payment_means_code = str(obj.get("cbc:PaymentMeansCode"))
         _payment_due_date = str(obj.get("cbc:PaymentDueDate"))
         _payment_id = str(obj.get("cbc:PaymentID"))
+        _id_name = codes.name("PaymentMeansID", _id.text) if _id else None
+        _payment_means_name = codes.name("PaymentMeansCode", _payment_means_code)
 
-        return PaymentMeans(_id, _payment_means_code, _payment_due_date, _payment_id)
-
-
-@dataclass
-class AllowanceTotalAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "AllowanceTotalAmount":
-        if type(obj) is not dict:
-            return AllowanceTotalAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return AllowanceTotalAmount(_currency_id, _text)
-
-
-@dataclass
-class ChargeTotalAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "ChargeTotalAmount":
-        if type(obj) is not dict:
-            return ChargeTotalAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return ChargeTotalAmount(_currency_id, _text)
+        return PaymentMeans(
+            _id,
+            _payment_means_code,
+            _payment_due_date,
+            _payment_id,
+            _id_name,
+            _payment_means_name,
+        )
 
 
-@dataclass
+@dataclass(slots=True)
 class IdentificationCode:
     list_agency_id: Optional[str]
     list_agency_name: Optional[str]
@@ -687,7 +667,7 @@ class IdentificationCode:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "IdentificationCode":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return IdentificationCode(None, None, None, obj)
         _list_agency_id = str(obj.get("@listAgencyID"))
         _list_agency_name = str(obj.get("@listAgencyName"))
@@ -698,67 +678,7 @@ class IdentificationCode:
         )
 
 
-@dataclass
-class PayableAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "PayableAmount":
-        if type(obj) is not dict:
-            return PayableAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return PayableAmount(_currency_id, _text)
-
-
-@dataclass
-class PayableRoundingAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "PayableRoundingAmount":
-        if type(obj) is not dict:
-            return PayableRoundingAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return PayableRoundingAmount(_currency_id, _text)
-
-
-@dataclass
-class TaxExclusiveAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "TaxExclusiveAmount":
-        if type(obj) is not dict:
-            return TaxExclusiveAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return TaxExclusiveAmount(_currency_id, _text)
-
-
-@dataclass
-class TaxInclusiveAmount:
-    currency_id: Optional[str]
-    text: str
-
-    @nullable
-    @staticmethod
-    def from_dict(obj: dict | str | None) -> "TaxInclusiveAmount":
-        if type(obj) is not dict:
-            return TaxInclusiveAmount(None, obj)
-        _currency_id = str(obj.get("@currencyID"))
-        _text = str(obj.get("#text"))
-        return TaxInclusiveAmount(_currency_id, _text)
-
-
-@dataclass
+@dataclass(slots=True)
 class UUID:
     scheme_id: Optional[str]
     scheme_name: Optional[str]
@@ -767,7 +687,7 @@ class UUID:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "UUID":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return UUID(None, None, obj)
         _scheme_id = str(obj.get("@schemeID"))
         _scheme_name = str(obj.get("@schemeName"))
@@ -775,7 +695,7 @@ class UUID:
         return UUID(_scheme_id, _scheme_name, _text)
 
 
-@dataclass
+@dataclass(slots=True)
 class LegalMonetaryTotal:
     line_extension_amount: LineExtensionAmount
     tax_exclusive_amount: TaxExclusiveAmount
@@ -818,7 +738,7 @@ class LegalMonetaryTotal:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class DsCanonicalizationMethod:
     algorithm: str
 
@@ -829,7 +749,7 @@ class DsCanonicalizationMethod:
         return DsCanonicalizationMethod(_algorithm)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsDigestMethod:
     algorithm: str
 
@@ -840,7 +760,7 @@ class DsDigestMethod:
         return DsDigestMethod(_algorithm)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsRSAKeyValue:
     modulus: str
     exponent: str
@@ -853,7 +773,7 @@ class DsRSAKeyValue:
         return DsRSAKeyValue(_modulus, _exponent)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsKeyValue:
     rsa_key_value: DsRSAKeyValue
 
@@ -864,7 +784,7 @@ class DsKeyValue:
         return DsKeyValue(_rsa_key_value)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsX509Data:
     x509_certificate: str
 
@@ -875,7 +795,7 @@ class DsX509Data:
         return DsX509Data(_x509_certificate)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsKeyInfo:
     id: str
     x509_data: DsX509Data
@@ -890,7 +810,7 @@ class DsKeyInfo:
         return DsKeyInfo(_id, _x509_data, _key_value)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSigPolicyId:
     xades_identifier: str
     xades_description: str
@@ -903,7 +823,7 @@ class XadesSigPolicyId:
         return XadesSigPolicyId(_xades_identifier, _xades_description)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSigPolicyHash:
     digest_method: DsDigestMethod
     digest_value: str
@@ -916,7 +836,7 @@ class XadesSigPolicyHash:
         return XadesSigPolicyHash(_digest_method, _digest_value)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSignaturePolicyId:
     xades_sig_policy_id: XadesSigPolicyId
     xades_sig_policy_hash: XadesSigPolicyHash
@@ -931,7 +851,7 @@ class XadesSignaturePolicyId:
         return XadesSignaturePolicyId(_xades_sig_policy_id, _xades_sig_policy_hash)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSignaturePolicyIdentifier:
     xades_signature_policy_id: XadesSignaturePolicyId
 
@@ -944,7 +864,7 @@ class XadesSignaturePolicyIdentifier:
         return XadesSignaturePolicyIdentifier(_xades_signature_policy_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesClaimedRoles:
     xades_claimed_role: str
 
@@ -955,7 +875,7 @@ class XadesClaimedRoles:
         return XadesClaimedRoles(_xades_claimed_role)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSignerRole:
     xades_claimed_roles: XadesClaimedRoles
 
@@ -968,7 +888,7 @@ class XadesSignerRole:
         return XadesSignerRole(_xades_claimed_roles)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesCertDigest:
     digest_method: DsDigestMethod
     digest_value: str
@@ -981,7 +901,7 @@ class XadesCertDigest:
         return XadesCertDigest(_digest_method, _digest_value)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesIssuerSerial:
     x509_issuer_name: str
     x509_serial_number: str
@@ -994,7 +914,7 @@ class XadesIssuerSerial:
         return XadesIssuerSerial(_x509_issuer_name, _x509_serial_number)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesCert:
     xades_cert_digest: XadesCertDigest
     xades_issuer_serial: XadesIssuerSerial
@@ -1011,7 +931,7 @@ class XadesCert:
         return XadesCert(_xades_cert_digest, _xades_issuer_serial)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSigningCertificate:
     xades_cert: XadesCert
 
@@ -1022,7 +942,7 @@ class XadesSigningCertificate:
         return XadesSigningCertificate(_xades_cert)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSignedSignatureProperties:
     xades_signing_time: str
     xades_signing_certificate: XadesSigningCertificate
@@ -1048,7 +968,7 @@ class XadesSignedSignatureProperties:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesSignedProperties:
     id: str
     xades_signed_signature_properties: XadesSignedSignatureProperties
@@ -1063,7 +983,7 @@ class XadesSignedProperties:
         return XadesSignedProperties(_id, _xades_signed_signature_properties)
 
 
-@dataclass
+@dataclass(slots=True)
 class XadesQualifyingProperties:
     xmlnsxades: str
     target: str
@@ -1084,7 +1004,7 @@ class XadesQualifyingProperties:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class DsObject:
     xades_qualifying_properties: XadesQualifyingProperties
 
@@ -1097,7 +1017,7 @@ class DsObject:
         return DsObject(_xades_qualifying_properties)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsTransform:
     algorithm: str
 
@@ -1108,7 +1028,7 @@ class DsTransform:
         return DsTransform(_algorithm)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsTransforms:
     transform: DsTransform
 
@@ -1119,7 +1039,7 @@ class DsTransforms:
         return DsTransforms(_transform)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsReference:
     id: str
     URI: str
@@ -1138,7 +1058,7 @@ class DsReference:
         return DsReference(_id, _URI, _transforms, _digest_method, _digest_value)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsSignatureMethod:
     algorithm: str
 
@@ -1149,7 +1069,7 @@ class DsSignatureMethod:
         return DsSignatureMethod(_algorithm)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsSignedInfo:
     canonicalization_method: DsCanonicalizationMethod
     signature_method: DsSignatureMethod
@@ -1166,7 +1086,7 @@ class DsSignedInfo:
         return DsSignedInfo(_canonicalization_method, _signature_method, _reference)
 
 
-@dataclass
+@dataclass(slots=True)
 class DsSignature:
     xmlnsds: str
     id: str
@@ -1189,7 +1109,7 @@ class DsSignature:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StsAuthorizationPeriod:
     start_date: str
     end_date: str
@@ -1202,7 +1122,7 @@ class StsAuthorizationPeriod:
         return StsAuthorizationPeriod(_start_date, _end_date)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsAuthorizationProviderID:
     scheme_agency_id: Optional[str]
     scheme_agency_name: Optional[str]
@@ -1213,7 +1133,7 @@ class StsAuthorizationProviderID:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "StsAuthorizationProviderID":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return StsAuthorizationProviderID(None, None, None, None, obj)
         _scheme_agency_id = str(obj.get("@schemeAgencyID"))
         _scheme_agency_name = str(obj.get("@schemeAgencyName"))
@@ -1225,7 +1145,7 @@ class StsAuthorizationProviderID:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StsAuthorizationProvider:
     authorization_provider_id: StsAuthorizationProviderID
 
@@ -1238,7 +1158,7 @@ class StsAuthorizationProvider:
         return StsAuthorizationProvider(_sts_authorization_provider_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsAuthorizedInvoices:
     prefix: str
     stsfrom: str
@@ -1253,7 +1173,7 @@ class StsAuthorizedInvoices:
         return StsAuthorizedInvoices(_sts_prefix, _sts_from, _sts_to)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsInvoiceControl:
     invoice_authorization: str
     authorization_period: StsAuthorizationPeriod
@@ -1276,7 +1196,7 @@ class StsInvoiceControl:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StsInvoiceSource:
     identification_code: IdentificationCode
 
@@ -1289,7 +1209,7 @@ class StsInvoiceSource:
         return StsInvoiceSource(_identification_code)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsProviderID:
     scheme_agency_id: Optional[str]
     scheme_agency_name: Optional[str]
@@ -1300,7 +1220,7 @@ class StsProviderID:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "StsProviderID":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return StsProviderID(None, None, None, None, obj)
         _scheme_agency_id = str(obj.get("@schemeAgencyID"))
         _scheme_agency_name = str(obj.get("@schemeAgencyName"))
@@ -1312,7 +1232,7 @@ class StsProviderID:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class StsSoftwareID:
     scheme_agency_id: Optional[str]
     scheme_agency_name: Optional[str]
@@ -1321,7 +1241,7 @@ class StsSoftwareID:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "StsSoftwareID":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return StsSoftwareID(None, None, obj)
         _scheme_agency_id = str(obj.get("@schemeAgencyID"))
         _scheme_agency_name = str(obj.get("@schemeAgencyName"))
@@ -1329,7 +1249,7 @@ class StsSoftwareID:
         return StsSoftwareID(_scheme_agency_id, _scheme_agency_name, _text)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsSoftwareProvider:
     provider_id: StsProviderID
     software_id: StsSoftwareID
@@ -1342,7 +1262,7 @@ class StsSoftwareProvider:
         return StsSoftwareProvider(_sts_provider_id, _sts_software_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsSoftwareSecurityCode:
     scheme_agency_id: Optional[str]
     scheme_agency_name: Optional[str]
@@ -1351,7 +1271,7 @@ class StsSoftwareSecurityCode:
     @nullable
     @staticmethod
     def from_dict(obj: dict | str | None) -> "StsSoftwareSecurityCode":
-        if type(obj) is not dict:
+        if not isinstance(obj, Mapping):
             return StsSoftwareSecurityCode(None, None, obj)
         _scheme_agency_id = str(obj.get("@schemeAgencyID"))
         _scheme_agency_name = str(obj.get("@schemeAgencyName"))
@@ -1359,7 +1279,7 @@ class StsSoftwareSecurityCode:
         return StsSoftwareSecurityCode(_scheme_agency_id, _scheme_agency_name, _text)
 
 
-@dataclass
+@dataclass(slots=True)
 class StsDianExtensions:
     invoice_control: StsInvoiceControl
     invoice_source: StsInvoiceSource
@@ -1397,18 +1317,38 @@ class StsDianExtensions:
 
 @dataclass
 class ExtExtensionContent:
+    """Signature and DIAN extensions, decoded on first attribute access.
+
+    Nothing in the app reads them, so the subtree is kept as it came from the
+    parser (the dict, or a detached raw fragment from ``api.parser``) until
+    someone asks for ``dian_extensions`` or ``signature``. Not slotted: the
+    decoded fields are filled in lazily.
+    """
+
     dian_extensions: StsDianExtensions
     signature: DsSignature
 
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name: str):
+        if name not in ("dian_extensions", "signature"):
+            raise AttributeError(name)
+        obj = self._raw
+        if hasattr(obj, "view"):
+            obj = obj.view()
+        self.dian_extensions = StsDianExtensions.from_dict(obj.get("sts:DianExtensions"))
+        self.signature = DsSignature.from_dict(obj.get("ds:Signature"))
+        self._raw = None
+        return getattr(self, name)
+
     @nullable
     @staticmethod
     def from_dict(obj: dict | None) -> "ExtExtensionContent":
-        _dian_extensions = StsDianExtensions.from_dict(obj.get("sts:DianExtensions"))
-        _signature = DsSignature.from_dict(obj.get("ds:Signature"))
-        return ExtExtensionContent(_dian_extensions, _signature)
+        return ExtExtensionContent(obj.detach() if hasattr(obj, "detach") else obj)
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtUBLExtension:
     ext_extension_content: ExtExtensionContent
 
@@ -1421,7 +1361,7 @@ class ExtUBLExtension:
         return ExtUBLExtension(_ext_extension_content)
 
 
-@dataclass
+@dataclass(slots=True)
 class ExtUBLExtensions:
     ext_ubl_extension: List[ExtUBLExtension]
 
@@ -1434,7 +1374,7 @@ class ExtUBLExtensions:
         return ExtUBLExtensions(_ext_ubl_extension)
 
 
-@dataclass
+@dataclass(slots=True)
 class Delivery:
     actual_delivery_date: str
     actual_delivery_time: str
@@ -1449,7 +1389,7 @@ class Delivery:
         return Delivery(_actual_delivery_date, _actual_delivery_time, _delivery_address)
 
 
-@dataclass
+@dataclass(slots=True)
 class OrderReference:
     id: str
     issue_date: str
@@ -1462,7 +1402,7 @@ class OrderReference:
         return OrderReference(_id, _issue_date)
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     ext_ubl_extensions: ExtUBLExtensions
     ubl_version_id: str
@@ -1482,125 +1422,125 @@ class Document:
     accounting_customer_party: AccountingCustomerParty
     order_reference: OrderReference
     payment_means: PaymentMeans
-    tax_total: TaxTotal
+    # One per tax scheme (IVA, INC, ICA...)
+    tax_total: List[TaxTotal]
     legal_monetary_total: LegalMonetaryTotal
 
-    @nullable
     @staticmethod
-    def from_dict(obj: dict | None) -> "Document":
-        print(type(obj))
-        _ext_ubl_extensions = ExtUBLExtensions.from_dict(obj.get("ext:UBLExtensions"))
-        _ubl_version_id = str(obj.get("cbc:UBLVersionID"))
-        _customization_id = str(obj.get("cbc:CustomizationID"))
-        _profile_id = str(obj.get("cbc:ProfileID"))
-        _profile_execution_id = str(obj.get("cbc:ProfileExecutionID"))
-        _id = ID.from_dict(obj.get("cbc:ID"))
-        _UUID = UUID.from_dict(obj.get("cbc:UUID"))
-        _issue_date = str(obj.get("cbc:IssueDate"))
-        _issue_time = str(obj.get("cbc:IssueTime"))
-        _invoice_type_code = str(obj.get("cbc:InvoiceTypeCode"))
-        _note = (
-            [Note.from_dict(y) for y in obj.get("cbc:Note", {})]
-            if type(obj.get("cbc:Note")) is list
-            else [Note.from_dict(obj.get("cbc:Note"))]
-        )
-        _document_currency_code = str(obj.get("cbc:DocumentCurrencyCode"))
-        _delivery = Delivery.from_dict(obj.get("cac:Delivery"))
-        _line_count_numeric = str(obj.get("cbc:LineCountNumeric"))
-        _accounting_supplier_party = AccountingSupplierParty.from_dict(
-            obj.get("cac:AccountingSupplierParty")
-        )
-        _accounting_customer_party = AccountingCustomerParty.from_dict(
-            obj.get("cac:AccountingCustomerParty")
-        )
-        _order_reference = OrderReference.from_dict(obj.get("cac:OrderReference"))
-        _payment_means = PaymentMeans.from_dict(obj.get("cac:PaymentMeans"))
-        _tax_total = TaxTotal.from_dict(obj.get("cac:TaxTotal"))
-        _legal_monetary_total = LegalMonetaryTotal.from_dict(
-            obj.get("cac:LegalMonetaryTotal")
-        )
-        return Document(
-            _ext_ubl_extensions,
-            _ubl_version_id,
-            _customization_id,
-            _profile_id,
-            _profile_execution_id,
-            _id,
-            _UUID,
-            _issue_date,
-            _issue_time,
-            _invoice_type_code,
-            _note,
-            _document_currency_code,
-            _delivery,
-            _line_count_numeric,
-            _accounting_supplier_party,
-            _accounting_customer_party,
-            _order_reference,
-            _payment_means,
-            _tax_total,
-            _legal_monetary_total,
-        )
-
-
-@dataclass
+    def header_from_dict(obj: dict, fields: Optional[set] = None) -> dict:
+        """Build the header fields shared by every document type, as kwargs.
+
+        With ``fields``, only those are built; the rest are None.
+        """
+        return {
+            name: build(obj) if fields is None or name in fields else None
+            for name, build in _HEADER_FIELDS.items()
+        }
+
+    @nullable
+    @staticmethod
+    def from_dict(obj: dict | None, fields: Optional[set] = None) -> "Document":
+        return Document(**Document.header_from_dict(obj, fields))
+
+
+def _notes(obj: dict) -> List[Note]:
+    if type(obj.get("cbc:Note")) is list:
+        return [Note.from_dict(y) for y in obj.get("cbc:Note", {})]
+    return [Note.from_dict(obj.get("cbc:Note"))]
+
+
+# Document field -> builder, in field order
+_HEADER_FIELDS = {
+    "ext_ubl_extensions": lambda obj: ExtUBLExtensions.from_dict(obj.get("ext:UBLExtensions")),
+    "ubl_version_id": lambda obj: str(obj.get("cbc:UBLVersionID")),
+    "customization_id": lambda obj: str(obj.get("cbc:CustomizationID")),
+    "profile_id": lambda obj: str(obj.get("cbc:ProfileID")),
+    "profile_execution_id": lambda obj: str(obj.get("cbc:ProfileExecutionID")),
+    "id": lambda obj: ID.from_dict(obj.get("cbc:ID")),
+    "UUID": lambda obj: UUID.from_dict(obj.get("cbc:UUID")),
+    "issue_date": lambda obj: str(obj.get("cbc:IssueDate")),
+    "issue_time": lambda obj: str(obj.get("cbc:IssueTime")),
+    "invoice_type_code": lambda obj: str(obj.get("cbc:InvoiceTypeCode")),
+    "note": _notes,
+    "document_currency_code": lambda obj: str(obj.get("cbc:DocumentCurrencyCode")),
+    "delivery": lambda obj: Delivery.from_dict(obj.get("cac:Delivery")),
+    "line_count_numeric": lambda obj: str(obj.get("cbc:LineCountNumeric")),
+    "accounting_supplier_party": lambda obj: AccountingSupplierParty.from_dict(
+        obj.get("cac:AccountingSupplierParty")
+    ),
+    "accounting_customer_party": lambda obj: AccountingCustomerParty.from_dict(
+        obj.get("cac:AccountingCustomerParty")
+    ),
+    "order_reference": lambda obj: OrderReference.from_dict(obj.get("cac:OrderReference")),
+    "payment_means": lambda obj: PaymentMeans.from_dict(obj.get("cac:PaymentMeans")),
+    "tax_total": lambda obj: each(obj.get("cac:TaxTotal"), TaxTotal.from_dict),
+    "legal_monetary_total": lambda obj: LegalMonetaryTotal.from_dict(
+        obj.get("cac:LegalMonetaryTotal")
+    ),
+}
+
+
+@dataclass(slots=True)
 class Invoice(Document):
     invoice_line: List[InvoiceLine]
 
     def __init__(self, invoice_line, **kwargs):
-        super().__init__(**kwargs)
+        Document.__init__(self, **kwargs)
         self.invoice_line = invoice_line
 
     @nullable
     @staticmethod
-    def from_dict(obj: dict | None) -> "Invoice":
-        _invoice_line = (
-            [InvoiceLine.from_dict(y) for y in obj.get("cac:InvoiceLine", {})]
-            if type(obj.get("cac:InvoiceLine")) is list
-            else [InvoiceLine.from_dict(obj.get("cac:InvoiceLine"))]
-        )
-        return Invoice(
-            invoice_line=_invoice_line, **dataclasses.asdict(Document.from_dict(obj))
-        )
+    def from_dict(obj: dict | None, fields: Optional[set] = None) -> "Invoice":
+        _invoice_line = None
+        if fields is None or "invoice_line" in fields:
+            _invoice_line = (
+                [InvoiceLine.from_dict(y) for y in obj.get("cac:InvoiceLine", {})]
+                if type(obj.get("cac:InvoiceLine")) is list
+                else [InvoiceLine.from_dict(obj.get("cac:InvoiceLine"))]
+            )
+        return Invoice(invoice_line=_invoice_line, **Document.header_from_dict(obj, fields))
 
 
-@dataclass
+@dataclass(slots=True)
 class CreditNote(Document):
     credit_note_line: List[InvoiceLine]
 
     def __init__(self, credit_note_line, **kwargs):
-        super().__init__(**kwargs)
+        Document.__init__(self, **kwargs)
         self.credit_note_line = credit_note_line
 
     @nullable
     @staticmethod
-    def from_dict(obj: dict | None) -> "Invoice":
-        _credit_note_line = (
-            [InvoiceLine.from_dict(y) for y in obj.get("cac:CreditNoteLine", {})]
-            if type(obj.get("cac:CreditNoteLine")) is list
-            else [InvoiceLine.from_dict(obj.get("cac:CreditNoteLine"))]
-        )
+    def from_dict(obj: dict | None, fields: Optional[set] = None) -> "CreditNote":
+        _credit_note_line = None
+        if fields is None or "credit_note_line" in fields:
+            _credit_note_line = (
+                [InvoiceLine.from_dict(y) for y in obj.get("cac:CreditNoteLine", {})]
+                if type(obj.get("cac:CreditNoteLine")) is list
+                else [InvoiceLine.from_dict(obj.get("cac:CreditNoteLine"))]
+            )
         return CreditNote(
-            credit_note_line=_credit_note_line,
-            **dataclasses.asdict(Document.from_dict(obj))
+            credit_note_line=_credit_note_line, **Document.header_from_dict(obj, fields)
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Root:
     invoice: Document
     document_type: str
 
     @nullable
     @staticmethod
-    def from_dict(obj: dict | None) -> "Root":
+    def from_dict(obj: dict | None, fields: Optional[set] = None) -> "Root":
+        """``fields`` limits the document fields that are built (see
+        ``Document.header_from_dict``); the lines count as one field."""
         _invoice = None
         _document_type = None
 
         if obj.get("Invoice"):
-            _invoice = Invoice.from_dict(obj.get("Invoice"))
+            _invoice = Invoice.from_dict(obj.get("Invoice"), fields)
             _document_type = "Invoice"
         elif obj.get("CreditNote"):
-            _invoice = CreditNote.from_dict(obj.get("CreditNote"))
+            _invoice = CreditNote.from_dict(obj.get("CreditNote"), fields)
             _document_type = "CreditNote"
         return Root(_invoice, _document_type)
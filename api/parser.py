@@ -0,0 +1,313 @@
+"""lxml parsing engine.
+
+The document is parsed once with lxml and the models are built straight from
+the element tree: ``ElementView`` exposes an element with the same shape
+``xmltodict`` produces (``"cbc:ID"``, ``"@schemeID"``, ``"#text"``), so every
+``from_dict`` in ``api.models`` works on it without an intermediate dict.
+"""
+import dataclasses
+from collections.abc import Mapping
+from decimal import Decimal
+
+from lxml import etree
+
+import api.encode as encode
+import api.models as models
+
+DOCUMENT_TYPES = ("Invoice", "CreditNote")
+
+NS_CAC = "urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2"
+NS_CBC = "urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2"
+
+
+class NotADocument(ValueError):
+    """Well-formed XML that holds no Invoice or CreditNote."""
+
+
+# Every lxml parser here: no entity expansion or network access, no comments
+# or processing instructions in the tree, no size limit on text nodes
+PARSER_OPTIONS = dict(
+    resolve_entities=False, remove_comments=True, remove_pis=True, huge_tree=True
+)
+_parser = etree.XMLParser(**PARSER_OPTIONS)
+
+
+def local_name(element: etree._Element) -> str:
+    tag = element.tag
+    return tag[tag.rfind("}") + 1:]
+
+
+_names: dict = {}
+
+
+def qualified_name(element: etree._Element) -> str:
+    # Same key xmltodict uses: the prefix as written in the document
+    key = (element.tag, element.prefix)
+    name = _names.get(key)
+    if name is None:
+        name = _names[key] = (key[1] + ":" if key[1] else "") + local_name(element)
+    return name
+
+
+def _strip(text: str | None) -> str | None:
+    if text is None:
+        return None
+    return text.strip() or None
+
+
+def _value(element: etree._Element):
+    if len(element) == 0 and not element.attrib:
+        return _strip(element.text)
+    return ElementView(element)
+
+
+class ElementView(Mapping):
+    """Read-only, xmltodict-shaped mapping over an lxml element.
+
+    Children are indexed on first access, so subtrees the models never look
+    at are never visited.
+    """
+
+    __slots__ = ("element", "_children")
+
+    def __init__(self, element: etree._Element):
+        self.element = element
+        self._children = None
+
+    def _index(self) -> dict:
+        children = {}
+        names = _names
+        for child in self.element:
+            key = names.get((child.tag, child.prefix))
+            if key is None:
+                if type(child.tag) is not str:
+                    continue
+                key = qualified_name(child)
+            if key in children:
+                children[key].append(child)
+            else:
+                children[key] = [child]
+        self._children = children
+        return children
+
+    def _attribute(self, name: str):
+        if ":" not in name:
+            return self.element.get(name)
+        prefix, local = name.split(":", 1)
+        if prefix == "xmlns":
+            return self.element.nsmap.get(local)
+        namespace = self.element.nsmap.get(prefix)
+        if namespace is None:
+            return None
+        return self.element.get("{%s}%s" % (namespace, local))
+
+    def get(self, key: str, default=None):
+        if key[0] == "@":
+            value = self._attribute(key[1:])
+            return default if value is None else value
+        if key == "#text":
+            value = _strip(self.element.text)
+            return default if value is None else value
+        children = self._children
+        if children is None:
+            children = self._index()
+        elements = children.get(key)
+        if elements is None:
+            return default
+        if len(elements) == 1:
+            return _value(elements[0])
+        return [_value(element) for element in elements]
+
+    def __getitem__(self, key: str):
+        value = self.get(key, KeyError)
+        if value is KeyError:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for name in self.element.attrib:
+            yield "@" + name
+        children = self._children
+        if children is None:
+            children = self._index()
+        yield from children
+        if _strip(self.element.text) is not None:
+            yield "#text"
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return "ElementView(%s)" % qualified_name(self.element)
+
+    def detach(self) -> "RawFragment":
+        """Serialize the subtree so it no longer keeps the document alive."""
+        return RawFragment(etree.tostring(self.element))
+
+
+class RawFragment:
+    """An unparsed XML subtree, parsed again only when ``view`` is called."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def view(self) -> ElementView:
+        return ElementView(etree.fromstring(self.data, _parser))
+
+    def __repr__(self) -> str:
+        return "RawFragment(%d bytes)" % len(self.data)
+
+
+def parse_xml(data: bytes | str) -> etree._Element:
+    if isinstance(data, str) and data.lstrip().startswith("<?xml"):
+        # lxml refuses str input that still carries an encoding declaration
+        data = data[data.index("?>") + 2:]
+    try:
+        return etree.fromstring(data, _parser)
+    except etree.XMLSyntaxError as e:
+        raise ValueError("Not a valid invoice: %s" % e) from e
+
+
+def parse_xml_stream(stream) -> etree._Element:
+    """Parse a binary file object, reading it in chunks instead of all at once."""
+    try:
+        return etree.parse(stream, _parser).getroot()
+    except etree.XMLSyntaxError as e:
+        raise ValueError("Not a valid invoice: %s" % e) from e
+
+
+def embedded_text(root: etree._Element) -> str | None:
+    """The XML text an AttachedDocument carries in its first Attachment."""
+    for attachment in root.iter("{%s}Attachment" % NS_CAC):
+        for description in attachment.iter("{%s}Description" % NS_CBC):
+            if description.text and description.text.strip():
+                return description.text.strip()
+        break
+    return None
+
+
+def find_document(root: etree._Element) -> etree._Element:
+    """Return the Invoice/CreditNote element, unwrapping AttachedDocuments."""
+    if local_name(root) in DOCUMENT_TYPES:
+        return root
+    for element in root.iter("{*}Invoice", "{*}CreditNote"):
+        return element
+    text = embedded_text(root)
+    if text is not None:
+        return find_document(parse_xml(text))
+    raise NotADocument("Not a valid invoice file")
+
+
+def document_uuid(document: etree._Element) -> str | None:
+    """The CUFE/CUDE of a document, read without building any model."""
+    uuid = document.find("{%s}UUID" % NS_CBC)
+    if uuid is None:
+        return None
+    return _strip(uuid.text)
+
+
+_DOCUMENT_FIELDS = tuple(
+    {field.name for cls in (models.Invoice, models.CreditNote) for field in dataclasses.fields(cls)}
+)
+
+
+def document_fields(projection) -> set | None:
+    """The document fields to build for a projection (see ``api.encode``).
+
+    Projections select down to any depth, but models are skipped a whole
+    document field at a time: what is kept of a field is built entirely.
+    """
+    if projection is not True and not isinstance(projection, dict):
+        projection = encode.compile_projection(projection)
+    if projection is True:
+        return None
+    invoice = projection.get("invoice", projection.get("*", False))
+    if invoice is False:
+        return set()
+    return encode.selected(invoice, _DOCUMENT_FIELDS)
+
+
+def build_root(document: etree._Element, projection=None) -> models.Root:
+    """``projection`` is a projection name, a list of field paths or a
+    compiled projection; fields outside it are left as None."""
+    return models.Root.from_dict(
+        {local_name(document): ElementView(document)}, document_fields(projection)
+    )
+
+
+def parse(data: bytes | str, projection=None) -> models.Root:
+    return build_root(find_document(parse_xml(data)), projection)
+
+
+def parse_stream(stream, projection=None) -> models.Root:
+    return build_root(find_document(parse_xml_stream(stream)), projection)
+
+
+_NAMESPACES = {"cac": NS_CAC, "cbc": NS_CBC}
+
+_SUMMARY_AMOUNTS = (
+    "line_extension_amount", "tax_exclusive_amount", "tax_inclusive_amount",
+    "allowance_total_amount", "charge_total_amount", "payable_amount",
+)
+
+
+def find_text(element: etree._Element, path: str) -> str | None:
+    """Stripped text at ``path`` ("cac:"/"cbc:" prefixed) under ``element``."""
+    return _strip(element.findtext(path, namespaces=_NAMESPACES))
+
+
+def party(document: etree._Element, role: str) -> tuple[str | None, str | None]:
+    """(NIT, name) of the ``role`` party, e.g. "AccountingSupplierParty"."""
+    element = document.find("cac:%s/cac:Party" % role, _NAMESPACES)
+    if element is None:
+        return None, None
+    name = find_text(element, "cac:PartyName/cbc:Name") or find_text(
+        element, "cac:PartyTaxScheme/cbc:RegistrationName"
+    )
+    return find_text(element, "cac:PartyTaxScheme/cbc:CompanyID"), name
+
+
+def summary(document: etree._Element) -> dict:
+    """Header fields and totals of a document, read without building models.
+
+    Keys follow the ``headers`` table of ``api.export``, plus the document
+    ``tax_amount`` (of all its tax schemes); amounts are Decimals.
+    """
+    document_type = local_name(document)
+    supplier_nit, supplier_name = party(document, "AccountingSupplierParty")
+    customer_id, customer_name = party(document, "AccountingCustomerParty")
+    totals = document.find("cac:LegalMonetaryTotal", _NAMESPACES)
+    result = {
+        "cufe": find_text(document, "cbc:UUID"),
+        "document_id": find_text(document, "cbc:ID"),
+        "document_type": document_type,
+        "issue_date": find_text(document, "cbc:IssueDate"),
+        "currency": find_text(document, "cbc:DocumentCurrencyCode"),
+        "supplier_nit": supplier_nit,
+        "supplier_name": supplier_name,
+        "customer_id": customer_id,
+        "customer_name": customer_name,
+        "line_count": sum(
+            1 for _ in document.iterchildren("{%s}%sLine" % (NS_CAC, document_type))
+        ),
+        "tax_amount": _sum(document.iterfind("cac:TaxTotal/cbc:TaxAmount", _NAMESPACES)),
+    }
+    for name in _SUMMARY_AMOUNTS:
+        tag = "".join(part.capitalize() for part in name.split("_"))
+        result[name] = models.decimal(
+            find_text(totals, "cbc:" + tag) if totals is not None else None
+        )
+    return result
+
+
+def _sum(elements) -> Decimal | None:
+    # Of the amounts that parse; None when there are none
+    amounts = [models.decimal(_strip(element.text)) for element in elements]
+    amounts = [amount for amount in amounts if amount is not None]
+    return sum(amounts) if amounts else None
+
+
+def parse_summary(data: bytes | str) -> dict:
+    return summary(find_document(parse_xml(data)))
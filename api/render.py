@@ -0,0 +1,73 @@
+"""HTML rendering of parsed documents.
+
+``invoice.html`` is put together with its partials (the ``{% include %}``
+tags are replaced by the partial sources) and compiled once per process
+into a single template, so a render makes no template lookups. Amounts go
+through the ``money`` filter, which formats a Decimal as ``$1,234.50`` and
+remembers the strings of the values it has seen (prices and tax amounts
+repeat a lot across lines).
+
+The HTML is the same ``render_template("invoice.html", ...)`` gives.
+"""
+import functools
+import gc
+import os
+import re
+from decimal import Decimal
+
+import jinja2
+
+import api.models as models
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+_INCLUDE = re.compile(r"""{%-?\s*include\s+['"]([^'"]+)['"]\s*-?%}""")
+_MONEY = "${:,.2f}".format
+
+
+def money(value) -> str:
+    """``value`` (a Decimal; None, an undefined field or any other empty
+    value for 0) as ``$1,234.50``."""
+    if not value:
+        value = 0
+    elif isinstance(value, Decimal) and not value.is_finite():
+        # A signaling NaN can't be hashed, so it can't be cached either
+        return _MONEY(value)
+    return _cached_money(value)
+
+
+@functools.lru_cache(maxsize=4096)
+def _cached_money(value) -> str:
+    return _MONEY(value)
+
+
+def _source(name: str) -> str:
+    with open(os.path.join(TEMPLATES, name), encoding="utf-8") as source:
+        text = source.read()
+    return _INCLUDE.sub(lambda match: _partial(match.group(1)), text)
+
+
+def _partial(name: str) -> str:
+    # An included template loses its trailing newline, like any other
+    text = _source(name)
+    return text[:-1] if text.endswith("\n") else text
+
+
+@functools.lru_cache(maxsize=None)
+def template(name: str = "invoice.html") -> jinja2.Template:
+    """``name`` with its includes inlined, compiled on first use."""
+    environment = jinja2.Environment(autoescape=True, auto_reload=False)
+    environment.filters["money"] = money
+    return environment.from_string(_source(name))
+
+
+def invoice_html(invoice: models.Document) -> str:
+    # Rendering allocates a lot and frees it all, and every collection run
+    # on the way walks the whole document: leave the collector out of it
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return template().render(invoice=invoice)
+    finally:
+        if enabled:
+            gc.enable()
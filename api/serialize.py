@@ -0,0 +1,159 @@
+"""Compact binary serialization of parsed ``Root`` models.
+
+The model tree is flattened into msgpack arrays: every model becomes
+``[class index, field values...]``, with the class names and field names
+written once in a header. Loading calls the model constructors directly,
+which is much faster than parsing the XML or the xmltodict json again.
+
+A lazily decoded ``ExtExtensionContent`` that was never touched is stored
+as its raw fragment, so signatures stay undecoded through a round-trip.
+Decimal amounts travel as a msgpack extension type holding their string
+form, so they come back exact.
+
+Data written before tax totals and subtotals became lists (``MRB1``) still
+loads: a list field holding a single model gets it wrapped in a list.
+"""
+import dataclasses
+import decimal
+import functools
+import gc
+import inspect
+import typing
+
+import msgpack
+
+import api.models as models
+import api.parser as parser
+
+MAGIC = b"MRB2"
+_MAGIC_V1 = b"MRB1"
+
+_RAW = -1  # class index of an undecoded ExtExtensionContent
+_DECIMAL = 1  # msgpack extension type code for Decimal values
+
+
+def _default(obj):
+    if type(obj) is decimal.Decimal:
+        return msgpack.ExtType(_DECIMAL, str(obj).encode())
+    raise TypeError("Cannot serialize %r" % obj)
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == _DECIMAL:
+        return decimal.Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+class _Packer:
+    def __init__(self):
+        self.classes = {}
+        self.schema = []
+
+    def index(self, cls: type) -> tuple[int, tuple[str, ...]]:
+        # (class index, field names), looked up once per class
+        entry = self.classes.get(cls)
+        if entry is None:
+            names = tuple(field.name for field in dataclasses.fields(cls))
+            entry = self.classes[cls] = (len(self.schema), names)
+            self.schema.append([cls.__name__, list(names)])
+        return entry
+
+    def pack(self, obj):
+        cls = type(obj)
+        if cls is str or obj is None or cls is decimal.Decimal:
+            return obj
+        if cls is list:
+            return [self.pack(item) for item in obj]
+        if cls is models.ExtExtensionContent:
+            raw = vars(obj).get("_raw")
+            if isinstance(raw, parser.RawFragment):
+                return [_RAW, raw.data]
+        entry = self.classes.get(cls)
+        if entry is None and dataclasses.is_dataclass(obj):
+            entry = self.index(cls)
+        if entry is not None:
+            index, names = entry
+            node = [index]
+            for name in names:
+                node.append(self.pack(getattr(obj, name)))
+            return node
+        # Anything else (plain dicts left by the xmltodict path) goes as is
+        return obj
+
+
+def dumps(root: models.Root) -> bytes:
+    packer = _Packer()
+    body = packer.pack(root)
+    return MAGIC + msgpack.packb([packer.schema, body], use_bin_type=True, default=_default)
+
+
+@functools.lru_cache(maxsize=None)
+def _constructor(name: str, fields: tuple[str, ...]):
+    cls = getattr(models, name)
+    current = tuple(field.name for field in dataclasses.fields(cls))
+    parameters = tuple(inspect.signature(cls).parameters)
+    if fields == current and parameters == current:
+        return cls, None
+    # Custom __init__ (Invoice, CreditNote, ExtExtensionContent) or a schema
+    # written by an older version of the models: set the fields one by one,
+    # missing ones as None
+    return cls, fields
+
+
+@functools.lru_cache(maxsize=None)
+def _list_fields(cls: type) -> tuple[str, ...]:
+    return tuple(field.name for field in dataclasses.fields(cls) if typing.get_origin(field.type) is list)
+
+
+def loads(data: bytes) -> models.Root:
+    if data[:4] not in (MAGIC, _MAGIC_V1):
+        raise ValueError("Not a serialized invoice")
+    legacy = data[:4] == _MAGIC_V1
+    # Rebuilding allocates tens of thousands of small objects in one go, and
+    # the cyclic GC would otherwise keep rescanning them; nothing in here
+    # creates cycles, so it is paused until the tree is built.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        schema, body = msgpack.unpackb(data[4:], raw=False, use_list=False, ext_hook=_ext_hook)
+        constructors = [_constructor(name, fields) for name, fields in schema]
+        if legacy:
+            # Every model goes through the field by field path below
+            constructors = [(cls, fields) for (cls, _), (name, fields) in zip(constructors, schema)]
+
+        def build(node):
+            # Only called on arrays: leaves (str/None) are passed through inline
+            head = node[0] if node else None
+            if type(head) is not int:
+                return [item if type(item) is not tuple else build(item) for item in node]
+            if head == _RAW:
+                return models.ExtExtensionContent(parser.RawFragment(node[1]))
+            cls, fields = constructors[head]
+            values = [value if type(value) is not tuple else build(value) for value in node[1:]]
+            if fields is None:
+                return cls(*values)
+            values = dict(zip(fields, values))
+            if legacy:
+                for name in _list_fields(cls):
+                    value = values.get(name)
+                    if value is not None and type(value) is not list:
+                        values[name] = [value]
+            obj = cls.__new__(cls)
+            for field in dataclasses.fields(cls):
+                setattr(obj, field.name, values.get(field.name))
+            return obj
+
+        return build(body) if type(body) is tuple else body
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def dump(root: models.Root, file_path: str):
+    with open(file_path, "wb") as output:
+        output.write(dumps(root))
+
+
+def load(file_path: str) -> models.Root:
+    with open(file_path, "rb") as source:
+        return loads(source.read())
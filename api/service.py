@@ -1,62 +1,274 @@
-import logging
+import io
+import os
 import zipfile
-from bs4 import BeautifulSoup
+import zlib
+from typing import IO, Iterator
+from lxml import etree
 import werkzeug
 import werkzeug.datastructures
+import api.cache
+import api.metrics as metrics
+import api.stream
+import api.models as models
+import api.parser as parser
+import api.sniff as sniff
 
+parse_cache = api.cache.from_environment()
 
-def safe_find(element: BeautifulSoup, tag: str):
-    try:
-        return element.find(tag)
-    except AttributeError:
-        return None
+# Documents this big (the XML, unzipped) are built with the streaming parser
+STREAM_BYTES = int(float(os.environ.get("MISRECIBOS_STREAM_MB", "16")) * 1024 * 1024)
 
 
-def open_file(
+def open_members(
     file_path: str, file=None, type="S"
-) -> str:  # S for standalone, F for flask
-    def xml_filter(y): return filter(lambda x: x.endswith(".xml"), y)
+) -> Iterator[IO[bytes]]:  # S for standalone, F for flask
+    """Yield a binary stream for every XML document in the file.
 
+    Zip members are streamed with ``ZipFile.open``, never read whole. A
+    corrupt zip raises ValueError, like any other invalid upload.
+    """
     if type == "S":
         file = file_path
     if file_path.endswith(".zip"):
-        with zipfile.ZipFile(file, "r") as zip_ref:
-            # read the only one xml file in the zip with functional proggramming
-            if len(list(xml_filter(zip_ref.namelist()))) == 0:
-                raise ValueError("No XML file found in the zip")
-            file = BeautifulSoup(
-                zip_ref.read(
-                    list(xml_filter(zip_ref.namelist()))[0]
-                ),
-                "xml",
-            )
+        try:
+            with zipfile.ZipFile(file, "r") as zip_ref:
+                members = [
+                    info for info in zip_ref.infolist()
+                    if not info.is_dir() and info.filename.lower().endswith(".xml")
+                ]
+                for info in members:
+                    with zip_ref.open(info) as member:
+                        yield member
+        except (zipfile.BadZipFile, zlib.error, ValueError) as e:
+            # ValueError: an offset past either end of the data, which an
+            # mmap or a BytesIO refuses to seek to
+            raise ValueError("Not a valid zip file: %s" % e) from e
+        if not members:
+            raise ValueError("No XML file found in the zip")
     elif file_path.endswith(".xml"):
         if type == "S":
-            file = BeautifulSoup(open(file, "r", encoding="utf8"), "xml")
+            with open(file, "rb") as xml_file:
+                yield xml_file
         else:
-            file = BeautifulSoup(file.read(), "xml")
+            yield file
     else:
         raise ValueError("Invalid file type")
 
+
+def iter_documents(
+    file_path: str, file=None, type="S"
+) -> Iterator[etree._Element]:  # S for standalone, F for flask
+    """Yield the Invoice/CreditNote element of every document in the file.
+
+    Zips may carry more than one document (an invoice and its
+    ApplicationResponse, or a whole batch); members that are not invoices
+    are skipped, those whose root element says so without being parsed. A
+    member whose root element lies past the sniffed head is parsed whole.
+    """
+    for member in open_members(file_path, file, type):
+        try:
+            with metrics.span("sniff"):
+                head, member = sniff.sniff_stream(member)
+            if head.document_type is not None and not head.is_document:
+                continue
+            if head.document_type == sniff.WRAPPER:
+                # Parse the embedded invoice from the wrapper's bytes, in place
+                data = member.buffer()
+                with metrics.span("parse"):
+                    root = api.stream.parse_embedded(data)
+                    if root is None:
+                        root = parser.parse_xml(data)
+            else:
+                # Zip members are inflated as they are parsed, so "parse" includes it
+                with metrics.span("parse"):
+                    root = parser.parse_xml_stream(member)
+        except (zipfile.BadZipFile, zlib.error) as e:
+            # A member that fails its CRC check or doesn't inflate
+            raise ValueError("Not a valid zip file: %s" % e) from e
+        try:
+            with metrics.span("locate"):
+                document = parser.find_document(root)
+        except parser.NotADocument:
+            continue
+        yield document
+
+
+def first_document(
+    file_path: str, file=None, type="S"
+) -> etree._Element:  # S for standalone, F for flask
+    """The Invoice/CreditNote element of the first document in the file;
+    ValueError when it holds none."""
+    documents = iter_documents(file_path, file, type)
     try:
-        if file.find("Invoice") is not None:
-            invoice_xml = file.find("Invoice")
-        elif file.find("CreditNote") is not None:
-            invoice_xml = file.find("CreditNote")
-        elif (
-            file.find("cac:Attachment") is not None
-            and file.find("cac:Attachment").find("cbc:Description") is not None
-        ):
-            invoice_xml = file.find("cac:Attachment").find("cbc:Description")
-        else:
-            raise ValueError("Not a valid invoice file")
-    except AttributeError:
-        raise ValueError("Not a valid invoice")
+        return next(documents)
+    except StopIteration:
+        raise ValueError("Not a valid invoice file") from None
+    finally:
+        documents.close()
+
 
-    return invoice_xml.text
+def open_file(
+    file_path: str, file=None, type="S"
+) -> str:  # S for standalone, F for flask
+    document = first_document(file_path, file, type)
+    return etree.tostring(document, encoding="unicode")
 
 
 def open_file_storage(
     file: werkzeug.datastructures.FileStorage,
 ) -> str:  # comming from flask
     return open_file(file.filename, file, "F")
+
+
+def iter_parse_file(
+    file_path: str, file=None, type="S", projection=None
+) -> Iterator[models.Root]:  # S for standalone, F for flask
+    for document in iter_documents(file_path, file, type):
+        yield parser.build_root(document, projection)
+
+
+def parse_file(
+    file_path: str, file=None, type="S", projection=None
+) -> models.Root:  # S for standalone, F for flask
+    """``projection`` ("summary", "lines", "full" or field paths) leaves the
+    document fields outside it unbuilt; see ``parser.build_root``."""
+    return parser.build_root(first_document(file_path, file, type), projection)
+
+
+def stream_file(
+    file_path: str, file=None, type="S"
+) -> tuple[models.Root, Iterator[models.InvoiceLine]]:  # S for standalone, F for flask
+    """Low-memory parse of the first document: its header ``Root`` (lines
+    set to None) and a generator of its lines, built one at a time.
+
+    The file stays open until the generator is exhausted or closed.
+    """
+    members = open_members(file_path, file, type)
+    try:
+        for member in members:
+            items = api.stream.iter_document(member)
+            try:
+                root = next(items)
+            except parser.NotADocument:
+                continue
+            return root, _close_after(items, members)
+    except BaseException:
+        members.close()
+        raise
+    members.close()
+    raise ValueError("Not a valid invoice file")
+
+
+def _close_after(items: Iterator, members: Iterator) -> Iterator:
+    try:
+        yield from items
+    finally:
+        items.close()
+        members.close()
+
+
+def summarize_file(
+    file_path: str, file=None, type="S"
+) -> dict:  # S for standalone, F for flask
+    """Header and totals of the first document, without building models."""
+    return parser.summary(first_document(file_path, file, type))
+
+
+def parse_file_storage(
+    file: werkzeug.datastructures.FileStorage,
+) -> models.Root:  # comming from flask
+    return parse_file(file.filename, file, "F")
+
+
+def parse_file_cached(
+    file_path: str, file=None, type="S", cache: api.cache.ParseCache | None = None
+) -> models.Root:  # S for standalone, F for flask
+    """``parse_file`` through the parse cache.
+
+    A repeated upload is answered from its content hash without parsing; a
+    known CUFE in a different file only costs the XML parse, not the model
+    build. An upload whose first bytes are neither a zip nor an invoice is
+    rejected before the rest is read or hashed.
+    """
+    cache = cache or parse_cache
+    source = open(file_path, "rb") if type == "S" else file
+    try:
+        with metrics.span("read"):
+            head = source.read(sniff.SNIFF_SIZE)
+        with metrics.span("sniff"):
+            _check_head(file_path, head)
+        with metrics.span("read"):
+            data = head + source.read()
+    finally:
+        if type == "S":
+            source.close()
+    metrics.UPLOAD_BYTES.inc(len(data))
+    with metrics.span("cache"):
+        digest = api.cache.content_hash(data)
+        root = cache.get(digest, count_miss=False)
+    if root is not None:
+        return root
+    if _document_size(file_path, data) >= STREAM_BYTES:
+        return _parse_streamed(file_path, data, digest, cache)
+    document = first_document(file_path, io.BytesIO(data), "F")
+    cufe = parser.document_uuid(document)
+    root = cache.get_by_cufe(cufe)
+    if root is None:
+        with metrics.span("build"):
+            root = parser.build_root(document)
+    cache.put(digest, root, cufe)
+    return root
+
+
+def _check_head(file_path: str, head: bytes):
+    # Raises ValueError when the start of an upload already rules it out
+    if file_path.endswith(".zip"):
+        if not head.startswith(b"PK"):
+            raise ValueError("Not a valid zip file")
+    elif file_path.endswith(".xml"):
+        result = sniff.sniff(head)
+        if result.document_type is not None and not result.is_document:
+            raise ValueError("Not a valid invoice file")
+    else:
+        raise ValueError("Invalid file type")
+
+
+def _document_size(file_path: str, data: bytes) -> int:
+    # The upload, or the biggest XML in it when it is a zip
+    if not file_path.endswith(".zip"):
+        return len(data)
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return max(
+                (info.file_size for info in archive.infolist() if info.filename.lower().endswith(".xml")),
+                default=0,
+            )
+    except zipfile.BadZipFile:
+        return 0  # reported by the parse
+
+
+def _parse_streamed(
+    file_path: str, data: bytes, digest: str, cache: api.cache.ParseCache
+) -> models.Root:
+    # parse_file_cached for big documents: the header and then every line
+    # are built as they are read, without holding the whole element tree
+    with metrics.span("build"):
+        root, lines = stream_file(file_path, io.BytesIO(data), "F")
+        uuid = root.invoice.UUID
+        cufe = uuid.text if uuid and uuid.text not in (None, "None") else None
+        cached = cache.get_by_cufe(cufe)
+        if cached is not None:
+            lines.close()
+            root = cached
+        elif root.document_type == "Invoice":
+            root.invoice.invoice_line = list(lines)
+        else:
+            root.invoice.credit_note_line = list(lines)
+    cache.put(digest, root, cufe)
+    return root
+
+
+def parse_file_storage_cached(
+    file: werkzeug.datastructures.FileStorage,
+) -> models.Root:  # comming from flask
+    return parse_file_cached(file.filename, file, "F")
@@ -0,0 +1,128 @@
+"""Classify a document from its first few KB.
+
+``sniff`` pull-parses only the head of a file or zip member: the root
+element tells an Invoice or CreditNote from an AttachedDocument wrapper
+(or from anything else, such as the ApplicationResponse that travels in the
+same zips), the namespace declarations come with it, and in a wrapper the
+``cac:Attachment/cbc:Description`` carrying the invoice is looked for. A
+head that is not XML is rejected right away, with the same message a full
+parse gives.
+
+``sniff_stream`` hands back a stream that still starts at the beginning, so
+the parse that follows never seeks, and, for a file on disk or an upload
+already in memory, the whole document without copying it (``buffer``).
+"""
+import io
+import mmap
+from dataclasses import dataclass, field
+from typing import Optional
+
+from lxml import etree
+
+from api.parser import DOCUMENT_TYPES, NS_CAC, NS_CBC, PARSER_OPTIONS, local_name
+from api.stream import declared_encoding
+
+SNIFF_SIZE = 8 * 1024
+
+WRAPPER = "AttachedDocument"
+
+_ATTACHMENT = "{%s}Attachment" % NS_CAC
+_DESCRIPTION = "{%s}Description" % NS_CBC
+
+
+@dataclass(slots=True)
+class Sniff:
+    # Local name of the root element, None if the head holds none
+    document_type: Optional[str]
+    # prefix -> URI declared on the root ("" for the default namespace)
+    namespaces: dict = field(default_factory=dict)
+    # AttachedDocument: whether the embedded document's Description starts
+    # in the head; None when the head ends before telling (or no wrapper)
+    embedded: Optional[bool] = None
+    # As declared in the XML declaration
+    encoding: Optional[str] = None
+
+    @property
+    def is_document(self) -> bool:
+        """An Invoice, a CreditNote, or a wrapper that may hold one."""
+        return self.document_type in DOCUMENT_TYPES or self.document_type == WRAPPER
+
+
+def sniff(head: bytes) -> Sniff:
+    """Classify a document from its first bytes.
+
+    Raises ValueError when the head is not well-formed XML.
+    """
+    parser = etree.XMLPullParser(events=("start-ns", "start", "end"), **PARSER_OPTIONS)
+    result = Sniff(None)
+    stack = []
+    try:
+        parser.feed(head)
+        for event, value in parser.read_events():
+            if event == "start-ns":
+                if result.document_type is None:
+                    prefix, uri = value
+                    result.namespaces[prefix] = uri
+            elif event == "start":
+                if result.document_type is None:
+                    result.document_type = local_name(value)
+                    if result.document_type != WRAPPER:
+                        break
+                    result.embedded = False
+                stack.append(value.tag)
+                if value.tag == _DESCRIPTION and _ATTACHMENT in stack:
+                    result.embedded = True
+                    break
+            else:
+                stack.pop()
+    except etree.XMLSyntaxError as e:
+        raise ValueError("Not a valid invoice: %s" % e) from e
+    result.encoding = declared_encoding(head)
+    if result.embedded is False and stack:
+        # The wrapper goes on past the head
+        result.embedded = None
+    return result
+
+
+class _Prefixed:
+    # A stream whose first bytes were already read into ``head``
+    def __init__(self, head: bytes, stream):
+        self.head = head
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.head:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            data, self.head = self.head + self.stream.read(), b""
+            return data
+        data, self.head = self.head[:size], self.head[size:]
+        return data
+
+    def buffer(self):
+        """The whole document, as the upload's own bytes or a read-only mmap
+        of the file when the stream started at its beginning; read into
+        memory otherwise. Call it instead of ``read``, not after."""
+        stream = self.stream
+        try:
+            at_start = stream.tell() == len(self.head)
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            at_start = False
+        if at_start:
+            if isinstance(stream, mmap.mmap):
+                return stream
+            if isinstance(stream, io.BytesIO):
+                # Shares the bytes it was created from
+                return stream.getvalue()
+            try:
+                return mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+                pass
+        return self.read()
+
+
+def sniff_stream(stream, size: int = SNIFF_SIZE) -> tuple[Sniff, "_Prefixed"]:
+    """Sniff the first ``size`` bytes of a binary stream; returns the result
+    and a stream to read the whole document from."""
+    head = stream.read(size)
+    return sniff(head), _Prefixed(head, stream)
@@ -0,0 +1,243 @@
+"""Persistent local store of parsed invoices.
+
+Documents are kept in an SQLite file, in the ``api.serialize`` binary
+format, next to the header fields they are searched by: CUFE (unique),
+supplier NIT, customer ID, issue date and currency, each indexed, the
+person ones together with the date so a period of one party is a single
+index range::
+
+    with InvoiceStore("invoices.db") as store:
+        store.add_many(roots)
+        march = store.find(supplier_nit="900123456", date_from="2024-03-01", date_to="2024-03-31")
+
+Adding a document whose CUFE is already stored replaces it. Bulk-load a
+folder of xml/zip/mrb files with::
+
+    python -m api.store invoices.db xmls
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Iterable, Iterator
+
+import api.export as export
+import api.models as models
+import api.serialize as serialize
+from api.workers import default_workers
+
+HEADER_FIELDS = (
+    "cufe",
+    "document_type",
+    "document_id",
+    "supplier_nit",
+    "supplier_name",
+    "customer_id",
+    "customer_name",
+    "issue_date",
+    "currency",
+    "line_count",
+    "payable_amount",
+)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS invoices ("
+    "rowid INTEGER PRIMARY KEY, cufe TEXT UNIQUE, document_type TEXT, document_id TEXT, "
+    "supplier_nit TEXT, supplier_name TEXT, customer_id TEXT, customer_name TEXT, "
+    "issue_date TEXT, currency TEXT, line_count INTEGER, payable_amount TEXT, "
+    "data BLOB NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS invoices_supplier ON invoices (supplier_nit, issue_date)",
+    "CREATE INDEX IF NOT EXISTS invoices_customer ON invoices (customer_id, issue_date)",
+    "CREATE INDEX IF NOT EXISTS invoices_date ON invoices (issue_date)",
+    "CREATE INDEX IF NOT EXISTS invoices_currency ON invoices (currency, issue_date)",
+)
+
+_INSERT = "INSERT OR REPLACE INTO invoices (%s, data) VALUES (%s)" % (
+    ", ".join(HEADER_FIELDS),
+    ", ".join("?" * (len(HEADER_FIELDS) + 1)),
+)
+
+# find() filters: keyword -> SQL condition
+_FILTERS = {
+    "supplier_nit": "supplier_nit = ?",
+    "customer_id": "customer_id = ?",
+    "currency": "currency = ?",
+    "document_type": "document_type = ?",
+    "date_from": "issue_date >= ?",
+    "date_to": "issue_date <= ?",
+}
+
+
+def header(root: models.Root) -> tuple:
+    """The indexed header fields of ``root``, in ``HEADER_FIELDS`` order."""
+    document = root.invoice
+    totals = document.legal_monetary_total
+    payable = totals.payable_amount.value if totals and totals.payable_amount else None
+    return (
+        export.clean_text(document.UUID.text) if document.UUID else None,
+        root.document_type,
+        export.clean_text(document.id.text) if document.id else None,
+        export.company_id(document.accounting_supplier_party),
+        export.party_name(document.accounting_supplier_party),
+        export.company_id(document.accounting_customer_party),
+        export.party_name(document.accounting_customer_party),
+        export.clean_text(document.issue_date),
+        export.clean_text(document.document_currency_code),
+        len([line for line in export.lines_of(document) or () if line is not None]),
+        # Kept exact, as text
+        None if payable is None else str(payable),
+    )
+
+
+def _where(filters: dict) -> tuple[str, list]:
+    unknown = set(filters) - set(_FILTERS)
+    if unknown:
+        raise TypeError("Unknown filters: " + ", ".join(sorted(unknown)))
+    conditions = [_FILTERS[name] for name, value in filters.items() if value is not None]
+    values = [value for value in filters.values() if value is not None]
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", values
+
+
+class InvoiceStore:
+    def __init__(self, path: str):
+        """Open (or create) the store in the SQLite file at ``path``."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Readers don't block the writer, and a bulk load only syncs at
+        # checkpoints
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._db.commit()
+
+    def __enter__(self) -> "InvoiceStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, root: models.Root):
+        self.add_many([root])
+
+    def add_many(self, roots: Iterable[models.Root], batch_size: int = 5000) -> int:
+        """Store ``roots``, committing every ``batch_size`` documents; returns
+        how many were stored."""
+        return self._add(((root, serialize.dumps(root)) for root in roots), batch_size)
+
+    def add_serialized(self, data: Iterable[bytes], batch_size: int = 5000) -> int:
+        """``add_many`` for documents already in the ``api.serialize`` format,
+        stored as they are."""
+        return self._add(((serialize.loads(item), item) for item in data), batch_size)
+
+    def _add(self, documents: Iterable[tuple[models.Root, bytes]], batch_size: int) -> int:
+        added = 0
+        rows = []
+        with self._lock:
+            for root, data in documents:
+                rows.append(header(root) + (data,))
+                if len(rows) >= batch_size:
+                    added += self._insert(rows)
+                    rows = []
+            if rows:
+                added += self._insert(rows)
+        return added
+
+    def _insert(self, rows: list) -> int:
+        with self._db:
+            self._db.executemany(_INSERT, rows)
+        return len(rows)
+
+    def get(self, cufe: str) -> models.Root | None:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM invoices WHERE cufe = ?", (cufe,)).fetchone()
+        return serialize.loads(row[0]) if row else None
+
+    def __contains__(self, cufe: str) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM invoices WHERE cufe = ?", (cufe,)).fetchone() is not None
+
+    def _select(self, columns: str, filters: dict, limit: int | None) -> list:
+        where, values = _where(filters)
+        query = "SELECT %s FROM invoices%s ORDER BY issue_date, rowid" % (columns, where)
+        if limit is not None:
+            query += " LIMIT ?"
+            values.append(limit)
+        with self._lock:
+            return self._db.execute(query, values).fetchall()
+
+    def find(self, limit: int | None = None, **filters) -> Iterator[models.Root]:
+        """Documents matching every filter given, by issue date.
+
+        Filters: supplier_nit, customer_id, currency, document_type, and
+        date_from / date_to (ISO dates, both included).
+        """
+        for (data,) in self._select("data", filters, limit):
+            yield serialize.loads(data)
+
+    def headers(self, limit: int | None = None, **filters) -> list[dict]:
+        """Like ``find``, but only the header fields, without loading the documents."""
+        return [
+            dict(zip(HEADER_FIELDS, row))
+            for row in self._select(", ".join(HEADER_FIELDS), filters, limit)
+        ]
+
+    def count(self, **filters) -> int:
+        where, values = _where(filters)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM invoices" + where, values).fetchone()[0]
+
+    def delete(self, cufe: str) -> bool:
+        with self._lock, self._db:
+            return self._db.execute("DELETE FROM invoices WHERE cufe = ?", (cufe,)).rowcount > 0
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Load invoice files into a local store")
+    argparser.add_argument("store", help="SQLite file, created if missing")
+    argparser.add_argument("input_dir", help="folder with .xml, .zip or .mrb files")
+    argparser.add_argument("-w", "--workers", type=int, default=None)
+    args = argparser.parse_args(argv)
+
+    files = sorted(
+        os.path.join(args.input_dir, name)
+        for name in os.listdir(args.input_dir)
+        if name.endswith((".xml", ".zip", ".mrb"))
+    )
+    failed = added = 0
+    start = time.perf_counter()
+    with InvoiceStore(args.store) as store, multiprocessing.Pool(
+        min(args.workers or default_workers(), max(len(files), 1))
+    ) as pool:
+        results = pool.imap_unordered(export.load_serialized, files, chunksize=16)
+
+        def documents():
+            nonlocal failed
+            for result in results:
+                if isinstance(result, str):
+                    failed += 1
+                    continue
+                yield from result
+
+        added = store.add_serialized(documents())
+        total = len(store)
+    print(
+        "%d documents stored (%d in the store), %d failed files in %.1fs"
+        % (added, total, failed, time.perf_counter() - start)
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
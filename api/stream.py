@@ -0,0 +1,308 @@
+"""Low-memory incremental parsing for very large documents.
+
+``iter_document`` reads the file in chunks with a pull parser and gives back
+the header first, then one ``InvoiceLine`` at a time, freeing every line
+element once it is built. An AttachedDocument is not parsed as a whole
+either: the bytes of the CDATA section carrying the invoice are fed to the
+inner parser as they are read. Memory stays bounded by the header, one line
+and one read chunk, whatever the line count.
+"""
+import html
+import re
+from itertools import chain
+from typing import Iterable, Iterator
+
+from lxml import etree
+
+import api.models as models
+from api.parser import (
+    DOCUMENT_TYPES,
+    NS_CAC,
+    NS_CBC,
+    ElementView,
+    PARSER_OPTIONS,
+    NotADocument,
+    find_document,
+    local_name,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+_ATTACHMENT = "{%s}Attachment" % NS_CAC
+_DESCRIPTION = "{%s}Description" % NS_CBC
+_CDATA_START = b"<![CDATA["
+_CDATA_END = b"]]>"
+# What may follow the CDATA when it holds the whole of the Description
+_DESCRIPTION_END = re.compile(rb"\s*</(?:[A-Za-z_][\w.-]*:)?Description\s*>")
+_ENCODING = re.compile(rb"""^\s*<\?xml[^>]*encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+
+
+def declared_encoding(head: bytes) -> str | None:
+    """The encoding named in the XML declaration at the start of ``head``."""
+    match = _ENCODING.match(head)
+    return match.group(1).decode() if match else None
+
+
+def _chunks(stream, chunk_size: int) -> Iterator[bytes]:
+    return iter(lambda: stream.read(chunk_size), b"")
+
+
+def _header(document: etree._Element) -> models.Root:
+    # The lines are built apart, so the document is left without them
+    document_type = local_name(document)
+    header = models.Document.header_from_dict(ElementView(document))
+    if document_type == "Invoice":
+        return models.Root(models.Invoice(invoice_line=None, **header), document_type)
+    return models.Root(models.CreditNote(credit_note_line=None, **header), document_type)
+
+
+def _pull(parser: etree.XMLPullParser, chunk: bytes) -> list:
+    try:
+        parser.feed(chunk)
+    except etree.XMLSyntaxError as e:
+        raise ValueError("Not a valid invoice: %s" % e) from e
+    return list(parser.read_events())
+
+
+def _close(parser: etree.XMLPullParser) -> list:
+    try:
+        parser.close()
+    except etree.XMLSyntaxError as e:
+        raise ValueError("Not a valid invoice: %s" % e) from e
+    return list(parser.read_events())
+
+
+def _embedded(chunks: Iterator[bytes], tree: list, encoding: str = "UTF-8") -> Iterator[bytes]:
+    """Yield the bytes of the document carried as CDATA in an Attachment.
+
+    Everything before the CDATA goes through a pull parser, to know which
+    element it belongs to; the CDATA content itself is only scanned for its
+    end. A Description split over several CDATA sections is put back
+    together, with the text between them, up to its closing tag. Raises
+    NotADocument when the attachment is not in a CDATA section, after
+    appending the parsed wrapper to ``tree`` for the caller to fall back on.
+    """
+    parser = etree.XMLPullParser(events=("start", "end"), **PARSER_OPTIONS)
+    stack = []
+    buffer = b""
+    copying = False
+    # Past a CDATA section of the Description, before whatever comes next
+    between = False
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if copying:
+                end = buffer.find(_CDATA_END)
+                if end >= 0:
+                    if end:
+                        yield buffer[:end]
+                    copying, between = False, True
+                    buffer = buffer[end + len(_CDATA_END):]
+                    continue
+                # Keep what could be the start of a split "]]>"
+                keep = len(_CDATA_END) - 1
+                if len(buffer) > keep:
+                    yield buffer[:-keep]
+                    buffer = buffer[-keep:]
+                break
+            if between:
+                markup = buffer.find(b"<")
+                if markup < 0:
+                    break
+                if markup:
+                    yield _unescape(buffer[:markup], encoding)
+                    buffer = buffer[markup:]
+                if buffer.startswith(_CDATA_START):
+                    copying, between = True, False
+                    buffer = buffer[len(_CDATA_START):]
+                    continue
+                if len(buffer) < len(_CDATA_START) and _CDATA_START.startswith(buffer):
+                    break
+                # The closing tag: the Description is over
+                return
+            start = buffer.find(_CDATA_START)
+            if start < 0:
+                # Feed all but what could be the start of a split marker
+                cut = max(len(buffer) - len(_CDATA_START) + 1, 0)
+                _track(stack, _pull(parser, buffer[:cut]))
+                buffer = buffer[cut:]
+                break
+            _track(stack, _pull(parser, buffer[:start]))
+            buffer = buffer[start:]
+            if stack and stack[-1] == _DESCRIPTION and _ATTACHMENT in stack:
+                copying = True
+                buffer = buffer[len(_CDATA_START):]
+                continue
+            # Some other CDATA: let the parser have it whole
+            end = buffer.find(_CDATA_END)
+            if end < 0:
+                break
+            _track(stack, _pull(parser, buffer[: end + len(_CDATA_END)]))
+            buffer = buffer[end + len(_CDATA_END):]
+    if copying or between:
+        # Cut short: the inner parser tells what is missing
+        if copying and buffer:
+            yield buffer
+        return
+    _pull(parser, buffer)
+    tree.append(parser.close())
+    raise NotADocument("No CDATA attachment")
+
+
+def _unescape(text: bytes, encoding: str) -> bytes:
+    # Character data between CDATA sections, as the bytes it stands for
+    if b"&" not in text:
+        return text
+    return html.unescape(text.decode(encoding)).encode(encoding, "xmlcharrefreplace")
+
+
+def _track(stack: list, events: list):
+    for event, element in events:
+        if event == "start":
+            stack.append(element.tag)
+        else:
+            stack.pop()
+
+
+_embedded_parsers: dict = {}
+
+
+def embedded_range(data) -> tuple[int, int] | None:
+    """Byte offsets of the document an AttachedDocument carries as CDATA in
+    its Attachment, within the whole wrapper ``data`` (bytes or an mmap).
+
+    Only the wrapper before the CDATA is parsed, to know which element it
+    belongs to; None when the attachment is not in a CDATA section, or not
+    in a single one (the Description then has to be read as text).
+    """
+    parser = etree.XMLPullParser(events=("start", "end"), **PARSER_OPTIONS)
+    stack = []
+    position = 0
+    while True:
+        start = data.find(_CDATA_START, position)
+        if start < 0:
+            return None
+        _track(stack, _pull(parser, data[position:start]))
+        end = data.find(_CDATA_END, start)
+        if end < 0:
+            return None
+        if stack and stack[-1] == _DESCRIPTION and _ATTACHMENT in stack:
+            if not _DESCRIPTION_END.match(data, end + len(_CDATA_END)):
+                return None
+            start += len(_CDATA_START)
+            # The inner XML declaration has to come first
+            while start < end and data[start] in b" \t\r\n":
+                start += 1
+            return start, end
+        # Some other CDATA: let the parser have it whole
+        _track(stack, _pull(parser, data[start: end + len(_CDATA_END)]))
+        position = end + len(_CDATA_END)
+
+
+def parse_embedded(data, found: tuple[int, int] | None = None) -> etree._Element | None:
+    """Parse the document embedded as CDATA in the AttachedDocument ``data``
+    straight from its bytes: a memoryview slice goes to lxml, so the
+    invoice is neither copied nor decoded on the way. None when it is not
+    embedded as a single CDATA section.
+
+    ``found`` is the ``embedded_range`` of ``data``, when already known.
+    """
+    if found is None:
+        found = embedded_range(data)
+    if found is None:
+        return None
+    # CDATA bytes are in the wrapper's encoding, whatever the inner
+    # declaration says
+    encoding = (declared_encoding(data[:256]) or "UTF-8").upper()
+    parser = _embedded_parsers.get(encoding)
+    if parser is None:
+        parser = _embedded_parsers[encoding] = etree.XMLParser(encoding=encoding, **PARSER_OPTIONS)
+    start, end = found
+    with memoryview(data) as view, view[start:end] as embedded:
+        try:
+            return etree.fromstring(embedded, parser)
+        except etree.XMLSyntaxError as e:
+            raise ValueError("Not a valid invoice: %s" % e) from e
+
+
+def _iter_pull(chunks: Iterable[bytes], encoding: str | None = None) -> Iterator:
+    parser = etree.XMLPullParser(events=("start", "end"), encoding=encoding, **PARSER_OPTIONS)
+    document = None
+    line_tag = None
+    header_sent = False
+    for events in chain((_pull(parser, chunk) for chunk in chunks), [None]):
+        if events is None:
+            events = _close(parser)
+        for event, element in events:
+            if document is None:
+                if event == "start" and local_name(element) in DOCUMENT_TYPES:
+                    document = element
+                    line_tag = "{%s}%sLine" % (NS_CAC, local_name(element))
+                continue
+            if element.tag == line_tag and element.getparent() is document:
+                if event == "start":
+                    if not header_sent:
+                        header_sent = True
+                        yield _header(document)
+                    continue
+                line = models.InvoiceLine.from_dict(ElementView(element))
+                # Drop this line and everything before it (header included,
+                # it is built already)
+                element.clear()
+                while element.getprevious() is not None:
+                    del document[0]
+                yield line
+            elif element is document and event == "end":
+                if not header_sent:
+                    yield _header(document)
+                return
+    raise NotADocument("Not a valid invoice file")
+
+
+def iter_document(stream, chunk_size: int = CHUNK_SIZE) -> Iterator:
+    """Yield the header ``Root`` of the document in ``stream``, then its lines.
+
+    The ``Root`` has its line list set to None. Raises NotADocument (on the
+    first ``next``) when the XML holds no Invoice or CreditNote.
+    """
+    chunks = _chunks(stream, chunk_size)
+    # Peek at the root element to tell an AttachedDocument from the rest
+    sniffer = etree.XMLPullParser(events=("start",), **PARSER_OPTIONS)
+    head = []
+    root = None
+    for chunk in chunks:
+        head.append(chunk)
+        events = _pull(sniffer, chunk)
+        if events:
+            root = events[0][1]
+            break
+    if root is None or local_name(root) != "AttachedDocument":
+        yield from _iter_pull(chain(head, chunks))
+        return
+
+    encoding = declared_encoding(head[0]) or "UTF-8"
+    tree = []
+    embedded = _embedded(chain(head, chunks), tree, encoding)
+    try:
+        first = next(embedded)
+    except NotADocument:
+        # Embedded as escaped text: it was parsed along with the wrapper
+        document = find_document(tree[0])
+        yield _header(document)
+        line_tag = "{%s}%sLine" % (NS_CAC, local_name(document))
+        for element in document.iterchildren(line_tag):
+            yield models.InvoiceLine.from_dict(ElementView(element))
+        return
+    except StopIteration:
+        raise NotADocument("Not a valid invoice file") from None
+    # The CDATA bytes are in the wrapper's encoding, whatever the embedded
+    # declaration says
+    yield from _iter_pull(chain([first], embedded), encoding)
+
+
+def stream_document(
+    stream, chunk_size: int = CHUNK_SIZE
+) -> tuple[models.Root, Iterator[models.InvoiceLine]]:
+    """The header ``Root`` and a generator of its lines; see ``iter_document``."""
+    items = iter_document(stream, chunk_size)
+    return next(items), items
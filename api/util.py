@@ -1,22 +1,347 @@
-# Main file for standalone execution
+# Bulk conversion of invoice files (xml/zip) to json, spread over a process pool.
+#
+#   python -m api.util xmls jsons --workers 8
+#
+# Input files are memory-mapped and handed to the parser as raw bytes; a
+# journal in the output folder lets an interrupted run --resume.
+import argparse
+import contextlib
+import fnmatch
+import hashlib
+import io
 import json
-import xmltodict
+import mmap
+import multiprocessing
 import os
+import sys
+import time
+from typing import Iterator
+import xmltodict
+from lxml import etree
+
+import api.dedup as dedup
+import api.parser as parser
+import api.serialize as serialize
+import api.service as service
+from api.workers import default_workers
+
+FAILURES_REPORT = "failures.json"
+DUPLICATES_REPORT = "duplicates.json"
+# One "<fingerprint or ->\t<file>" line per file done, appended as they finish
+JOURNAL = "progress.journal"
+
+PATTERNS = ("*.xml", "*.zip")
+
+# Shared Bloom filter of the documents converted so far, in the workers of
+# a --dedup run
+_bloom = None
+
+
+def scan_files(input_dir: str, patterns=PATTERNS, recursive: bool = False) -> Iterator[str]:
+    """Yield the files in ``input_dir`` whose name matches any of the glob
+    ``patterns``, in name order; with ``recursive``, those in its subfolders
+    too, each folder after the files next to it."""
+    with os.scandir(input_dir) as scan:
+        entries = sorted(scan, key=lambda entry: entry.name)
+    folders = []
+    for entry in entries:
+        if entry.is_dir():
+            folders.append(entry.path)
+        elif entry.is_file() and any(fnmatch.fnmatch(entry.name, pattern) for pattern in patterns):
+            yield entry.path
+    if recursive:
+        for folder in folders:
+            yield from scan_files(folder, patterns, recursive)
+
+
+def list_files(input_dir: str, patterns=PATTERNS, recursive: bool = False) -> list[str]:
+    return list(scan_files(input_dir, patterns, recursive))
+
 
-import service as service
+def output_path(file_path: str, output_dir: str, extension: str = ".json") -> str:
+    return os.path.join(
+        output_dir, os.path.splitext(os.path.basename(file_path))[0] + extension
+    )
 
-# Read all files in a directory
-files = os.listdir("xmls")
 
+class _Mapped(mmap.mmap):
+    # zipfile checks seekable(), which mmap only has from Python 3.13
+    def seekable(self) -> bool:
+        return True
 
-def xml_to_json(filename):
-    file = service.open_file("xmls/" + filename)
-    ddict = xmltodict.parse(file)
-    with open(
-        "jsons/" + filename.replace("xml", "json").replace("zip", "json"), "w"
-    ) as json_file:
+
+@contextlib.contextmanager
+def mapped(file_path: str):
+    """A read-only mmap of the file, closed on exit.
+
+    Pages are read ahead as the kernel sees fit and dropped from the
+    process once it is closed, so a run's memory doesn't grow with the
+    files it goes through.
+    """
+    with open(file_path, "rb") as source:
+        try:
+            data = _Mapped(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            yield io.BytesIO(b"")
+            return
+        with data:
+            if hasattr(data, "madvise"):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            yield data
+
+
+def read_document(file_path: str) -> etree._Element:
+    """The first document of an xml/zip file, parsed from an mmap of it:
+    lxml gets the raw bytes and reads the encoding from them."""
+    with mapped(file_path) as data:
+        return service.first_document(file_path, data, "F")
+
+
+def xml_to_json(
+    file_path: str, output_dir: str, document: etree._Element | None = None, output: str | None = None
+):
+    # ``output`` overrides the file written, which is otherwise in output_dir
+    if document is None:
+        document = read_document(file_path)
+    ddict = xmltodict.parse(etree.tostring(document, encoding="unicode"))
+    with open(output or output_path(file_path, output_dir), "w") as json_file:
         json.dump(ddict, json_file, indent=4)
 
 
-for filename in files:
-    xml_to_json(filename)
+def xml_to_binary(
+    file_path: str, output_dir: str, document: etree._Element | None = None, output: str | None = None
+):
+    # Parsed models, reloadable with api.serialize.load without re-parsing
+    root = parser.build_root(read_document(file_path) if document is None else document)
+    serialize.dump(root, output or output_path(file_path, output_dir, ".mrb"))
+
+
+CONVERTERS = {"json": xml_to_json, "mrb": xml_to_binary}
+EXTENSIONS = {"json": ".json", "mrb": ".mrb"}
+
+
+def _staging(output: str, file_path: str) -> str:
+    # Where a --dedup worker writes ``file_path``'s output until the parent
+    # keeps it: another input with the same name may own ``output``
+    return "%s.%s.tmp" % (output, hashlib.blake2b(file_path.encode(), digest_size=8).hexdigest())
+
+
+def _init_worker(bloom: dedup.BloomFilter | None):
+    global _bloom
+    _bloom = bloom
+
+
+def _convert(task: tuple[str, str, str, bool]) -> tuple[str, int, str | None, bytes | None, bool]:
+    # Runs in the workers; errors are returned, never raised, so one bad file
+    # can't take the whole run down. Returns (file, size, error, fingerprint,
+    # converted); with a Bloom filter, a document it may have seen is left
+    # for the parent to decide on, unless ``force``d, and the output is
+    # written to its ``_staging`` name. One without a fingerprint is never
+    # a duplicate: it is written where it goes.
+    file_path, output_dir, output_format, force = task
+    try:
+        size = os.path.getsize(file_path)
+        if _bloom is None:
+            CONVERTERS[output_format](file_path, output_dir)
+            return file_path, size, None, None, True
+        document = read_document(file_path)
+        fingerprint = dedup.fingerprint(document)
+        if fingerprint is None:
+            CONVERTERS[output_format](file_path, output_dir, document)
+            return file_path, size, None, None, True
+        if not force and fingerprint in _bloom:
+            return file_path, size, None, fingerprint, False
+        _bloom.add(fingerprint)
+        output = _staging(output_path(file_path, output_dir, EXTENSIONS[output_format]), file_path)
+        CONVERTERS[output_format](file_path, output_dir, document, output)
+        return file_path, size, None, fingerprint, True
+    except Exception as e:
+        return file_path, 0, "%s: %s" % (type(e).__name__, e), None, False
+
+
+def _read_journal(path: str) -> dict[str, bytes | None]:
+    # file -> fingerprint of the files a previous run got done with; a line
+    # cut short by a crash is left out
+    done = {}
+    try:
+        with open(path, encoding="utf8") as journal:
+            for line in journal:
+                if not line.endswith("\n") or "\t" not in line:
+                    continue
+                fingerprint, file_path = line[:-1].split("\t", 1)
+                done[file_path] = None if fingerprint == "-" else bytes.fromhex(fingerprint)
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def convert_all(
+    files: list[str],
+    output_dir: str,
+    workers: int | None = None,
+    progress=sys.stderr,
+    output_format: str = "json",
+    deduplicate: bool = False,
+    input_dir: str | None = None,
+    resume: bool = False,
+) -> dict:
+    """Convert ``files`` into ``output_dir``, returning the run statistics.
+
+    With ``deduplicate``, a document already converted from another file
+    (same CUFE, see ``api.dedup``) is skipped and listed in the duplicates
+    report instead. Given the ``input_dir`` the files were found in, their
+    subfolders are mirrored in ``output_dir``. Every file done is written
+    to the journal there; with ``resume``, the files it lists are skipped
+    (failed ones are tried again), and the reports only cover this run.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    journal_path = os.path.join(output_dir, JOURNAL)
+    finished = _read_journal(journal_path) if resume else {}
+    pending = [file_path for file_path in files if file_path not in finished]
+    workers = min(workers or default_workers(), max(len(pending), 1))
+    # Bigger chunks for big batches keep the IPC overhead per file low
+    chunksize = max(1, min(64, len(pending) // (workers * 8)))
+
+    targets = {}
+
+    def target(file_path: str) -> str:
+        if input_dir is None:
+            return output_dir
+        folder = os.path.dirname(file_path)
+        if folder not in targets:
+            targets[folder] = os.path.normpath(os.path.join(output_dir, os.path.relpath(folder, input_dir)))
+            os.makedirs(targets[folder], exist_ok=True)
+        return targets[folder]
+
+    tasks = [(file_path, target(file_path), output_format, False) for file_path in pending]
+    # The workers check the shared Bloom filter; the exact index here decides
+    index = dedup.DedupIndex(dedup.BloomFilter.shared(len(files))) if deduplicate else None
+    if index is not None:
+        for fingerprint in finished.values():
+            if fingerprint is not None:
+                index.add(fingerprint)
+
+    done = converted_bytes = 0
+    failures = []
+    duplicates = []
+    retries = []
+    start = last_report = time.perf_counter()
+    with open(journal_path, "a" if resume else "w", encoding="utf8") as journal, multiprocessing.Pool(
+        workers, _init_worker, (index.bloom if index is not None else None,)
+    ) as pool:
+
+        def finish(file_path: str, fingerprint: bytes | None):
+            journal.write("%s\t%s\n" % (fingerprint.hex() if fingerprint else "-", file_path))
+
+        while tasks:
+            for file_path, size, error, fingerprint, converted in pool.imap_unordered(
+                _convert, tasks, chunksize
+            ):
+                if error is not None:
+                    failures.append({"file": file_path, "error": error})
+                elif fingerprint is not None:
+                    if converted:
+                        output = output_path(file_path, target(file_path), EXTENSIONS[output_format])
+                        if index.add(fingerprint):
+                            os.replace(_staging(output, file_path), output)
+                        else:
+                            # Converted at the same time as another copy
+                            os.remove(_staging(output, file_path))
+                            duplicates.append(file_path)
+                    else:
+                        # Another copy was converted, or is being converted,
+                        # or the Bloom filter is wrong: decided after this pass
+                        retries.append((file_path, fingerprint))
+                        continue
+                if error is None:
+                    finish(file_path, fingerprint)
+                done += 1
+                converted_bytes += size
+                now = time.perf_counter()
+                if now - last_report >= 1 or done == len(pending):
+                    last_report = now
+                    # A crash loses at most a second of the journal
+                    journal.flush()
+                    if progress is not None:
+                        elapsed = now - start
+                        progress.write(
+                            "\r%d/%d files, %d failed, %.1f files/s, %.2f MB/s"
+                            % (done, len(pending), len(failures), done / elapsed, converted_bytes / elapsed / 1e6)
+                        )
+            # Every first copy is in the index now: what is not there was a
+            # Bloom false positive, converted for good this time
+            tasks = []
+            for file_path, fingerprint in retries:
+                if fingerprint in index:
+                    duplicates.append(file_path)
+                    finish(file_path, fingerprint)
+                    done += 1
+                else:
+                    tasks.append((file_path, target(file_path), output_format, True))
+            retries = []
+    if progress is not None and pending:
+        progress.write("\n")
+
+    with open(os.path.join(output_dir, FAILURES_REPORT), "w") as report:
+        json.dump(failures, report, indent=4)
+    if index is not None:
+        with open(os.path.join(output_dir, DUPLICATES_REPORT), "w") as report:
+            json.dump(sorted(duplicates), report, indent=4)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(files),
+        "skipped": len(files) - len(pending),
+        "failed": len(failures),
+        "duplicates": len(duplicates),
+        "workers": workers,
+        "seconds": elapsed,
+        "files_per_second": len(pending) / elapsed if elapsed else 0.0,
+        "mb_per_second": converted_bytes / elapsed / 1e6 if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Convert invoice xml/zip files to json")
+    argparser.add_argument("input_dir", nargs="?", default="xmls")
+    argparser.add_argument("output_dir", nargs="?", default="jsons")
+    argparser.add_argument(
+        "-w", "--workers", type=int, default=None, help="worker processes (default: one per CPU)"
+    )
+    argparser.add_argument(
+        "-f", "--format", choices=sorted(CONVERTERS), default="json",
+        help="json: the xmltodict dict; mrb: binary parsed models (api.serialize)"
+    )
+    argparser.add_argument(
+        "--dedup", action="store_true", help="skip documents already converted from another file"
+    )
+    argparser.add_argument(
+        "-r", "--recursive", action="store_true", help="also convert the files in subfolders, mirrored in output_dir"
+    )
+    argparser.add_argument(
+        "-g", "--glob", action="append", default=None, metavar="PATTERN",
+        help="only the file names matching PATTERN; repeatable (default: *.xml and *.zip)"
+    )
+    argparser.add_argument(
+        "--resume", action="store_true", help="skip the files an interrupted run into output_dir got done with"
+    )
+    args = argparser.parse_args(argv)
+
+    files = list_files(args.input_dir, args.glob or PATTERNS, args.recursive)
+    stats = convert_all(
+        files, args.output_dir, args.workers, output_format=args.format,
+        deduplicate=args.dedup, input_dir=args.input_dir, resume=args.resume,
+    )
+    print(
+        "%(files)d files (%(skipped)d already done, %(failed)d failed, %(duplicates)d duplicates) in %(seconds).1fs "
+        "with %(workers)d workers: %(files_per_second).1f files/s, %(mb_per_second).2f MB/s" % stats
+    )
+    if stats["failed"]:
+        print("Failures written to " + os.path.join(args.output_dir, FAILURES_REPORT))
+    if stats["duplicates"]:
+        print("Duplicates written to " + os.path.join(args.output_dir, DUPLICATES_REPORT))
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
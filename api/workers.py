@@ -0,0 +1,10 @@
+"""Process pool sizing shared by the server and the bulk tools."""
+import os
+
+
+def default_workers() -> int:
+    """One worker per CPU this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        return os.cpu_count() or 1
@@ -0,0 +1,46 @@
+"""Columnar export benchmark.
+
+Parses a few synthetic invoices, repeats them up to the requested number of
+lines and times building the column tables and writing them as Parquet.
+Run from the repository root::
+
+    python -m benchmarks.bench_export --lines 1000000
+"""
+import argparse
+import tempfile
+import time
+
+import api.export as export
+import api.parser as parser
+from benchmarks import fixtures
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, default=1_000_000)
+    argparser.add_argument("--lines-per-invoice", type=int, default=200)
+    args = argparser.parse_args()
+
+    samples = [
+        parser.parse(fixtures.document_xml(args.lines_per_invoice, seed=seed).encode())
+        for seed in range(5)
+    ]
+    invoices = max(1, args.lines // args.lines_per_invoice)
+    roots = [samples[index % len(samples)] for index in range(invoices)]
+
+    start = time.perf_counter()
+    tables = export.to_tables(roots)
+    built = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        export.write_parquet(tables, tmp)
+    written = time.perf_counter()
+
+    lines = len(tables.lines["cufe"])
+    print("%d invoices, %d lines, %d tax rows" % (len(tables), lines, len(tables.taxes["cufe"])))
+    print("build  %.2fs (%.0f lines/s)" % (built - start, lines / (built - start)))
+    print("write  %.2fs" % (written - built))
+    print("total  %.2fs" % (written - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Memory benchmark: bytes per invoice line for the model layer.
+
+"dict" rebuilds the parsed tree with plain (``__dict__`` backed) dataclasses,
+the layout the models used to have; "slots" rebuilds it with the current
+classes. Both copies share the same strings, so the difference is the
+per-object overhead alone. "retained" is everything a parsed Root keeps alive,
+strings included. Run from the repository root::
+
+    python -m benchmarks.bench_memory --lines 10 200 2000
+"""
+import argparse
+import dataclasses
+import gc
+import tracemalloc
+
+import api.models as models
+import api.parser as parser
+from benchmarks import fixtures
+
+_plain_classes = {}
+
+
+def plain_class(cls: type) -> type:
+    if cls not in _plain_classes:
+        _plain_classes[cls] = dataclasses.make_dataclass(
+            cls.__name__, [field.name for field in dataclasses.fields(cls)]
+        )
+    return _plain_classes[cls]
+
+
+def clone(obj, factory):
+    if type(obj) is models.ExtExtensionContent:
+        return obj  # lazily decoded, and not part of the lines anyway
+    if dataclasses.is_dataclass(obj):
+        return factory(type(obj))(
+            **{field.name: clone(getattr(obj, field.name), factory) for field in dataclasses.fields(obj)}
+        )
+    if type(obj) is list:
+        return [clone(item, factory) for item in obj]
+    return obj
+
+
+def traced(func, copies: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    kept = [func() for _ in range(copies)]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del kept
+    return size / copies
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[10, 200, 2000])
+    argparser.add_argument("--copies", type=int, default=3)
+    args = argparser.parse_args()
+
+    print("%8s %14s %14s %16s" % ("lines", "dict B/line", "slots B/line", "retained B/line"))
+    for lines in args.lines:
+        data = fixtures.document_xml(lines).encode()
+        root = parser.parse(data)
+        clone(root, plain_class)  # create the plain classes outside the trace
+        before = traced(lambda: clone(root, plain_class), args.copies)
+        after = traced(lambda: clone(root, lambda cls: cls), args.copies)
+        retained = traced(lambda: parser.parse(data), args.copies)
+        print("%8d %14.0f %14.0f %16.0f" % (lines, before / lines, after / lines, retained / lines))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Model build benchmark: asdict round-trip vs building the header once.
+
+Times ``Invoice.from_dict`` over an already parsed document and reports the
+bytes allocated per invoice. Run from the repository root::
+
+    python -m benchmarks.bench_models --lines 1 10 200
+"""
+import argparse
+import dataclasses
+import time
+import tracemalloc
+
+import xmltodict
+
+import api.models as models
+from benchmarks import fixtures
+
+
+def legacy_from_dict(obj: dict) -> models.Invoice:
+    # What Invoice.from_dict used to do: build a Document, deep-copy it into
+    # dicts with asdict and pass those back in as kwargs.
+    _invoice_line = (
+        [models.InvoiceLine.from_dict(y) for y in obj.get("cac:InvoiceLine", {})]
+        if type(obj.get("cac:InvoiceLine")) is list
+        else [models.InvoiceLine.from_dict(obj.get("cac:InvoiceLine"))]
+    )
+    return models.Invoice(
+        invoice_line=_invoice_line, **dataclasses.asdict(models.Document.from_dict(obj))
+    )
+
+
+def per_call(func, obj, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func(obj)
+    return (time.perf_counter() - start) / number
+
+
+def allocated(func, obj) -> int:
+    tracemalloc.start()
+    func(obj)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 200])
+    argparser.add_argument("--number", type=int, default=200)
+    args = argparser.parse_args()
+
+    print("%6s %12s %12s %14s %14s" % ("lines", "asdict us", "once us", "asdict KB", "once KB"))
+    for lines in args.lines:
+        obj = xmltodict.parse(fixtures.document_xml(lines))["Invoice"]
+        number = max(1, args.number // lines)
+        before = per_call(legacy_from_dict, obj, number)
+        after = per_call(models.Invoice.from_dict, obj, number)
+        print(
+            "%6d %12.1f %12.1f %14.1f %14.1f"
+            % (
+                lines,
+                before * 1e6,
+                after * 1e6,
+                allocated(legacy_from_dict, obj) / 1024,
+                allocated(models.Invoice.from_dict, obj) / 1024,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Parse benchmark: BeautifulSoup + xmltodict path vs the lxml engine.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_parse --lines 10 200 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+import zipfile
+
+import xmltodict
+from bs4 import BeautifulSoup
+
+import api.models as models
+import api.service as service
+from benchmarks import fixtures
+
+
+def legacy_parse(file_path: str) -> models.Root:
+    # The pre-lxml pipeline: soup the zip member, pull the embedded text out,
+    # hand it to xmltodict and walk the resulting dict.
+    with zipfile.ZipFile(file_path, "r") as zip_ref:
+        name = [x for x in zip_ref.namelist() if x.endswith(".xml")][0]
+        soup = BeautifulSoup(zip_ref.read(name), "xml")
+    text = soup.find("cac:Attachment").find("cbc:Description").text
+    return models.Root.from_dict(xmltodict.parse(text))
+
+
+def timeit(func, *args, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[10, 200, 2000])
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    print("%8s %10s %12s %12s %8s" % ("lines", "zip KB", "legacy ms", "lxml ms", "speedup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in args.lines:
+            path = os.path.join(tmp, "ad%d.zip" % lines)
+            with open(path, "wb") as zip_file:
+                zip_file.write(fixtures.attached_document_zip(fixtures.document_xml(lines)))
+            legacy = timeit(legacy_parse, path, repeat=args.repeat)
+            engine = timeit(service.parse_file, path, repeat=args.repeat)
+            print(
+                "%8d %10.1f %12.2f %12.2f %7.1fx"
+                % (lines, os.path.getsize(path) / 1024, legacy * 1000, engine * 1000, legacy / engine)
+            )
+
+
+if __name__ == "__main__":
+    main()
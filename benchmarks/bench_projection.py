@@ -0,0 +1,45 @@
+"""Projection benchmark: building the full model vs a projection vs the
+model-free summary.
+
+Times ``parser.build_root`` over an already parsed document for each
+projection, and ``parser.summary``. Run from the repository root::
+
+    python -m benchmarks.bench_projection --lines 10 200 2000
+"""
+import argparse
+import time
+
+import api.parser as parser
+from benchmarks import fixtures
+
+PROJECTIONS = ("full", "lines", "summary")
+
+
+def per_call(func, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[10, 200, 2000])
+    argparser.add_argument("--number", type=int, default=2000)
+    args = argparser.parse_args()
+
+    print(("%6s" + " %12s" * (len(PROJECTIONS) + 1)) % (
+        ("lines",) + tuple(name + " us" for name in PROJECTIONS) + ("no model us",)
+    ))
+    for lines in args.lines:
+        document = parser.find_document(parser.parse_xml(fixtures.document_xml(lines).encode()))
+        number = max(1, args.number // lines)
+        timings = [
+            per_call(lambda: parser.build_root(document, name), number) for name in PROJECTIONS
+        ]
+        timings.append(per_call(lambda: parser.summary(document), number))
+        print(("%6d" + " %12.1f" * len(timings)) % ((lines,) + tuple(t * 1e6 for t in timings)))
+
+
+if __name__ == "__main__":
+    main()
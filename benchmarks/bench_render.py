@@ -0,0 +1,51 @@
+"""Render benchmark: ``invoice.html`` through Flask's ``render_template``
+(partials included at render time) vs ``api.render.invoice_html``.
+
+Times both over the same built invoice and checks they give the same HTML.
+Run from the repository root::
+
+    python -m benchmarks.bench_render --lines 10 1000 20000
+"""
+import argparse
+import time
+
+from flask import render_template
+
+import api.index as index
+import api.parser as parser
+import api.render as render
+from benchmarks import fixtures
+
+
+def best_of(func, repeat: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[10, 1000, 20000])
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    print("%6s %14s %14s %8s" % ("lines", "flask ms", "compiled ms", "speedup"))
+    with index.app.app_context():
+        for lines in args.lines:
+            invoice = parser.parse(fixtures.document_xml(lines).encode()).invoice
+            flask = lambda: render_template("invoice.html", invoice=invoice)
+            compiled = lambda: render.invoice_html(invoice)
+            if flask() != compiled():
+                raise SystemExit("%d lines: the two renders differ" % lines)
+            number = max(1, 2000 // lines)
+            before = best_of(flask, args.repeat, number)
+            after = best_of(compiled, args.repeat, number)
+            print("%6d %14.3f %14.3f %7.1fx" % (lines, before * 1e3, after * 1e3, before / after))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Reload benchmark: binary models vs parsing the XML vs the json output.
+
+"json" is what ``api.util`` writes by default (the xmltodict dict), loaded
+with ``json.loads`` and ``Root.from_dict``. Run from the repository root::
+
+    python -m benchmarks.bench_serialize --lines 10 200 2000
+"""
+import argparse
+import json
+import time
+
+import xmltodict
+
+import api.models as models
+import api.parser as parser
+import api.serialize as serialize
+from benchmarks import fixtures
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[10, 200, 2000])
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    print(
+        "%6s %9s %9s %9s %9s %9s %9s"
+        % ("lines", "xml KB", "json KB", "mrb KB", "xml ms", "json ms", "mrb ms")
+    )
+    for lines in args.lines:
+        xml = fixtures.document_xml(lines).encode()
+        text = json.dumps(xmltodict.parse(xml), indent=4)
+        binary = serialize.dumps(parser.parse(xml))
+        times = [
+            best_of(lambda: parser.parse(xml), args.repeat),
+            best_of(lambda: models.Root.from_dict(json.loads(text)), args.repeat),
+            best_of(lambda: serialize.loads(binary), args.repeat),
+        ]
+        print(
+            "%6d %9.1f %9.1f %9.1f %9.2f %9.2f %9.2f"
+            % (lines, len(xml) / 1024, len(text) / 1024, len(binary) / 1024, *(t * 1000 for t in times))
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Invoice store benchmark: bulk insert and indexed range queries.
+
+Parses a few synthetic invoices and stores them over and over as distinct
+documents (own CUFE, one of ``--suppliers`` NITs, a date spread over a
+year), then times a month of one supplier, looked up by header only and
+with the documents loaded. Run from the repository root::
+
+    python -m benchmarks.bench_store --documents 20000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import api.parser as parser
+from api.store import InvoiceStore
+from benchmarks import fixtures
+
+
+def documents(samples: list, count: int, suppliers: int):
+    start = datetime.date(2024, 1, 1)
+    for index in range(count):
+        root = samples[index % len(samples)]
+        document = root.invoice
+        document.UUID.text = "%096x" % index
+        document.accounting_supplier_party.party.party_tax_scheme.company_id.text = str(900000000 + index % suppliers)
+        document.issue_date = (start + datetime.timedelta(days=index % 365)).isoformat()
+        yield root
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--documents", type=int, default=20000)
+    argparser.add_argument("--lines", type=int, default=20)
+    argparser.add_argument("--suppliers", type=int, default=50)
+    args = argparser.parse_args()
+
+    samples = [
+        parser.parse(fixtures.document_xml(args.lines, seed=seed).encode())
+        for seed in range(5)
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "store.db")
+        with InvoiceStore(path) as store:
+            start = time.perf_counter()
+            store.add_many(documents(samples, args.documents, args.suppliers))
+            elapsed = time.perf_counter() - start
+            print("insert  %.2fs (%.0f documents/s), %.1f MB" % (
+                elapsed, args.documents / elapsed, os.path.getsize(path) / 1e6
+            ))
+
+            march = {"supplier_nit": "900000007", "date_from": "2024-03-01", "date_to": "2024-03-31"}
+            start = time.perf_counter()
+            headers = store.headers(**march)
+            print("headers %.2f ms (%d documents)" % ((time.perf_counter() - start) * 1e3, len(headers)))
+            start = time.perf_counter()
+            roots = list(store.find(**march))
+            print("find    %.2f ms (%d documents)" % ((time.perf_counter() - start) * 1e3, len(roots)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Streaming benchmark: peak RSS of a full parse vs the iterparse mode.
+
+Every measurement runs in a fresh interpreter that parses a generated
+AttachedDocument zip from disk, so the peak resident set size reported by
+the OS belongs to that parse alone (the interpreter and imports included,
+see the "idle" column). Run from the repository root::
+
+    python -m benchmarks.bench_stream --lines 1000 10000 50000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fixtures
+
+MODES = ("idle", "full", "stream")
+
+
+def write(lines: str, file_path: str):
+    # Also a child: generating big fixtures would otherwise raise the parent's
+    # RSS, which Linux carries over into the peak of every child it starts
+    with open(file_path, "wb") as output:
+        output.write(fixtures.attached_document_zip(fixtures.document_xml(int(lines))))
+
+
+def measure(mode: str, file_path: str):
+    # Child side: parse, then print "<peak RSS KB> <seconds> <lines>"
+    import api.service as service
+
+    start = time.perf_counter()
+    if mode == "full":
+        root = service.parse_file(file_path)
+        count = len(root.invoice.invoice_line)
+    elif mode == "stream":
+        root, lines = service.stream_file(file_path)
+        count = sum(1 for _ in lines)
+    else:
+        count = 0
+    elapsed = time.perf_counter() - start
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, elapsed, count)
+
+
+def run(mode: str, file_path: str) -> tuple[float, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_stream", "--child", mode, file_path],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return int(output[0]) / 1024, float(output[1])
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[1000, 10000, 50000])
+    argparser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    argparser.add_argument("--write", nargs=2, help=argparse.SUPPRESS)
+    args = argparser.parse_args()
+    if args.child:
+        return measure(*args.child)
+    if args.write:
+        return write(*args.write)
+
+    print("%7s %9s %9s %9s %9s %9s" % ("lines", "zip MB", "idle MB", "full MB", "stream MB", "stream s"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in args.lines:
+            file_path = os.path.join(tmp, "invoice-%d.zip" % lines)
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_stream", "--write", str(lines), file_path],
+                check=True,
+            )
+            results = {mode: run(mode, file_path) for mode in MODES}
+            print(
+                "%7d %9.1f %9.1f %9.1f %9.1f %9.2f"
+                % (
+                    lines,
+                    os.path.getsize(file_path) / 1e6,
+                    results["idle"][0],
+                    results["full"][0],
+                    results["stream"][0],
+                    results["stream"][1],
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
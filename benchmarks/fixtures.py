@@ -0,0 +1,322 @@
+"""Synthetic DIAN documents for the benchmarks.
+
+The generated XML follows the layout of the UBL 2.1 documents DIAN issues:
+an Invoice (or CreditNote) with its ``ext:UBLExtensions`` signature block,
+optionally wrapped in an ``AttachedDocument`` as CDATA and zipped.
+
+A folder of them, for ``api.util`` or ``api.export``, can be written with::
+
+    python -m benchmarks.fixtures xmls --count 500
+"""
+import argparse
+import io
+import os
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+NAMESPACES = (
+    'xmlns:cac="urn:oasis:names:specification:ubl:schema:xsd:CommonAggregateComponents-2" '
+    'xmlns:cbc="urn:oasis:names:specification:ubl:schema:xsd:CommonBasicComponents-2" '
+    'xmlns:ext="urn:oasis:names:specification:ubl:schema:xsd:CommonExtensionComponents-2" '
+    'xmlns:sts="dian:gov:co:facturaelectronica:Structures-2-1" '
+    'xmlns:ds="http://www.w3.org/2000/09/xmldsig#" '
+    'xmlns:xades="http://uri.etsi.org/01903/v1.3.2#"'
+)
+
+PRODUCTS = (
+    "ARROZ DIANA 500G", "LECHE ALQUERIA 1L", "HUEVOS AA X30", "PAN TAJADO BIMBO",
+    "CAFE SELLO ROJO 250G", "ACEITE PREMIER 1L", "AZUCAR MANUELITA 1KG",
+    "PAPEL HIGIENICO FAMILIA X4", "JABON REY X3", "GASEOSA POSTOBON 1.5L",
+)
+
+
+def _amount(tag: str, value: float) -> str:
+    return '<cbc:%s currencyID="COP">%.2f</cbc:%s>' % (tag, value, tag)
+
+
+def _tax_total(tax: float, base: float, percent: str = "19.00") -> str:
+    return (
+        "<cac:TaxTotal>"
+        + _amount("TaxAmount", tax)
+        + "<cac:TaxSubtotal>"
+        + _amount("TaxableAmount", base)
+        + _amount("TaxAmount", tax)
+        + "<cac:TaxCategory><cbc:Percent>%s</cbc:Percent>" % percent
+        + "<cac:TaxScheme><cbc:ID>01</cbc:ID><cbc:Name>IVA</cbc:Name></cac:TaxScheme>"
+        + "</cac:TaxCategory></cac:TaxSubtotal></cac:TaxTotal>"
+    )
+
+
+def _party(role: str, name: str, nit: str, city: str) -> str:
+    address = (
+        "<cbc:ID>11001</cbc:ID><cbc:CityName>%s</cbc:CityName>"
+        "<cbc:PostalZone>110111</cbc:PostalZone>"
+        "<cbc:CountrySubentity>Bogotá</cbc:CountrySubentity>"
+        "<cbc:CountrySubentityCode>11</cbc:CountrySubentityCode>"
+        "<cac:AddressLine><cbc:Line>CL 100 # 10-20</cbc:Line></cac:AddressLine>"
+        "<cac:Country><cbc:IdentificationCode>CO</cbc:IdentificationCode>"
+        '<cbc:Name languageID="es">Colombia</cbc:Name></cac:Country>'
+    ) % city
+    company_id = (
+        '<cbc:CompanyID schemeAgencyID="195" schemeAgencyName="CO, DIAN" '
+        'schemeID="9" schemeName="31">%s</cbc:CompanyID>' % nit
+    )
+    return (
+        "<cac:%s><cbc:AdditionalAccountID>1</cbc:AdditionalAccountID><cac:Party>" % role
+        + "<cbc:IndustryClassificationCode>4711</cbc:IndustryClassificationCode>"
+        + "<cac:PartyName><cbc:Name>%s</cbc:Name></cac:PartyName>" % escape(name)
+        + "<cac:PhysicalLocation><cac:Address>%s</cac:Address></cac:PhysicalLocation>" % address
+        + "<cac:PartyTaxScheme><cbc:RegistrationName>%s</cbc:RegistrationName>" % escape(name)
+        + company_id
+        + '<cbc:TaxLevelCode listName="48">O-13</cbc:TaxLevelCode>'
+        + "<cac:RegistrationAddress>%s</cac:RegistrationAddress>" % address
+        + "<cac:TaxScheme><cbc:ID>01</cbc:ID><cbc:Name>IVA</cbc:Name></cac:TaxScheme>"
+        + "</cac:PartyTaxScheme>"
+        + "<cac:PartyLegalEntity><cbc:RegistrationName>%s</cbc:RegistrationName>" % escape(name)
+        + company_id
+        + "<cac:CorporateRegistrationScheme><cbc:ID>SETT</cbc:ID><cbc:Name>12345</cbc:Name>"
+        + "</cac:CorporateRegistrationScheme></cac:PartyLegalEntity>"
+        + "<cac:Contact><cbc:Telephone>6011234567</cbc:Telephone>"
+        + "<cbc:ElectronicMail>facturacion@example.com</cbc:ElectronicMail></cac:Contact>"
+        + "</cac:Party></cac:%s>" % role
+    )
+
+
+def _signature() -> str:
+    digest = "dGhpcyBpcyBub3QgYSByZWFsIGRpZ2VzdCB2YWx1ZQ=="
+    certificate = "MIIH" + "QUJDREVGR0hJSktMTU5PUFFSU1RVVldYWVo" * 60
+    reference = (
+        '<ds:Reference Id="ref-%d" URI="%s"><ds:Transforms>'
+        '<ds:Transform Algorithm="http://www.w3.org/2000/09/xmldsig#enveloped-signature"/>'
+        '</ds:Transforms><ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        "<ds:DigestValue>%s</ds:DigestValue></ds:Reference>"
+    )
+    return (
+        '<ds:Signature Id="xmldsig-1">'
+        '<ds:SignedInfo><ds:CanonicalizationMethod Algorithm="http://www.w3.org/TR/2001/REC-xml-c14n-20010315"/>'
+        '<ds:SignatureMethod Algorithm="http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"/>'
+        + "".join(reference % (i, "#ref%d" % i, digest) for i in range(3))
+        + "</ds:SignedInfo>"
+        + "<ds:SignatureValue>%s</ds:SignatureValue>" % (digest * 8)
+        + '<ds:KeyInfo Id="keyinfo-1"><ds:X509Data><ds:X509Certificate>%s</ds:X509Certificate>' % certificate
+        + "</ds:X509Data></ds:KeyInfo>"
+        + '<ds:Object><xades:QualifyingProperties Target="#xmldsig-1" Id="qp-1">'
+        + '<xades:SignedProperties Id="signedprops-1"><xades:SignedSignatureProperties>'
+        + "<xades:SigningTime>2024-03-15T10:00:00-05:00</xades:SigningTime>"
+        + "<xades:SigningCertificate><xades:Cert><xades:CertDigest>"
+        + '<ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        + "<ds:DigestValue>%s</ds:DigestValue></xades:CertDigest>" % digest
+        + "<xades:IssuerSerial><ds:X509IssuerName>CN=Synthetic CA</ds:X509IssuerName>"
+        + "<ds:X509SerialNumber>1234567890</ds:X509SerialNumber></xades:IssuerSerial>"
+        + "</xades:Cert></xades:SigningCertificate>"
+        + "<xades:SignaturePolicyIdentifier><xades:SignaturePolicyId><xades:SigPolicyId>"
+        + "<xades:Identifier>https://facturaelectronica.dian.gov.co/politicadefirma/v2/"
+        + "politicadefirmav2.pdf</xades:Identifier></xades:SigPolicyId><xades:SigPolicyHash>"
+        + '<ds:DigestMethod Algorithm="http://www.w3.org/2001/04/xmlenc#sha256"/>'
+        + "<ds:DigestValue>%s</ds:DigestValue></xades:SigPolicyHash>" % digest
+        + "</xades:SignaturePolicyId></xades:SignaturePolicyIdentifier>"
+        + "<xades:SignerRole><xades:ClaimedRoles><xades:ClaimedRole>supplier</xades:ClaimedRole>"
+        + "</xades:ClaimedRoles></xades:SignerRole>"
+        + "</xades:SignedSignatureProperties></xades:SignedProperties>"
+        + "</xades:QualifyingProperties></ds:Object></ds:Signature>"
+    )
+
+
+def _extensions(signature: bool) -> str:
+    dian = (
+        "<sts:DianExtensions><sts:InvoiceControl>"
+        "<sts:InvoiceAuthorization>18760000001</sts:InvoiceAuthorization>"
+        "<sts:AuthorizationPeriod><cbc:StartDate>2024-01-01</cbc:StartDate>"
+        "<cbc:EndDate>2025-01-01</cbc:EndDate></sts:AuthorizationPeriod>"
+        "<sts:AuthorizedInvoices><sts:Prefix>SETP</sts:Prefix><sts:From>990000000</sts:From>"
+        "<sts:To>995000000</sts:To></sts:AuthorizedInvoices></sts:InvoiceControl>"
+        "<sts:InvoiceSource>"
+        '<cbc:IdentificationCode listAgencyID="6" listAgencyName="United Nations Economic '
+        'Commission for Europe" listSchemeURI="urn:oasis:names:specification:ubl:codelist:gc:'
+        'CountryIdentificationCode-2.1">CO</cbc:IdentificationCode></sts:InvoiceSource>'
+        "<sts:SoftwareProvider>"
+        '<sts:ProviderID schemeAgencyID="195" schemeAgencyName="CO, DIAN" schemeID="4" '
+        'schemeName="31">800197268</sts:ProviderID>'
+        '<sts:SoftwareID schemeAgencyID="195" schemeAgencyName="CO, DIAN">'
+        "56f2ae4e-9812-4fad-9255-08fcfcd5ccb0</sts:SoftwareID></sts:SoftwareProvider>"
+        '<sts:SoftwareSecurityCode schemeAgencyID="195" schemeAgencyName="CO, DIAN">'
+        "a8d18e4e5aa00b44a0b1f9ef413ad8215116bd3ce91730d580eaed795c83b5a32fe6f0823abc71400b3d59eb542b7de8"
+        "</sts:SoftwareSecurityCode>"
+        "<sts:AuthorizationProvider>"
+        '<sts:AuthorizationProviderID schemeAgencyID="195" schemeAgencyName="CO, DIAN" '
+        'schemeID="4" schemeName="31">800197268</sts:AuthorizationProviderID>'
+        "</sts:AuthorizationProvider>"
+        "<sts:QRCode>https://catalogo-vpfe.dian.gov.co/document/searchqr?documentkey=0</sts:QRCode>"
+        "</sts:DianExtensions>"
+    )
+    extensions = "<ext:UBLExtension><ext:ExtensionContent>%s</ext:ExtensionContent></ext:UBLExtension>" % dian
+    if signature:
+        extensions += (
+            "<ext:UBLExtension><ext:ExtensionContent>%s</ext:ExtensionContent></ext:UBLExtension>"
+            % _signature()
+        )
+    return "<ext:UBLExtensions>%s</ext:UBLExtensions>" % extensions
+
+
+def _line(tag: str, index: int, rng: random.Random, quantity_tag: str) -> tuple[str, float, float]:
+    quantity = rng.randint(1, 12)
+    price = round(rng.uniform(900, 250000), 2)
+    subtotal = round(quantity * price, 2)
+    tax = round(subtotal * 0.19, 2)
+    description = "%s %d" % (PRODUCTS[index % len(PRODUCTS)], index)
+    xml = (
+        "<cac:%s><cbc:ID>%d</cbc:ID>" % (tag, index)
+        + '<cbc:%s unitCode="94">%d.00</cbc:%s>' % (quantity_tag, quantity, quantity_tag)
+        + _amount("LineExtensionAmount", subtotal)
+        + _tax_total(tax, subtotal)
+        + "<cac:Item><cbc:Description>%s</cbc:Description>" % escape(description)
+        + "<cbc:BrandName>GENERICA</cbc:BrandName>"
+        + '<cac:SellersItemIdentification><cbc:ID>%07d</cbc:ID></cac:SellersItemIdentification>' % index
+        + '<cac:StandardItemIdentification><cbc:ID schemeID="010" schemeName="EAN13">'
+        + "77%011d</cbc:ID></cac:StandardItemIdentification></cac:Item>" % index
+        + "<cac:Price>" + _amount("PriceAmount", price)
+        + '<cbc:BaseQuantity unitCode="94">1.00</cbc:BaseQuantity></cac:Price>'
+        + "</cac:%s>" % tag
+    )
+    return xml, subtotal, tax
+
+
+def document_xml(
+    lines: int = 10, signature: bool = True, credit_note: bool = False, notes: int = 1, seed: int = 0
+) -> str:
+    """Return the XML text of a synthetic Invoice or CreditNote."""
+    root = "CreditNote" if credit_note else "Invoice"
+    rng = random.Random("%s-%d" % (root, seed))
+    line_tag = "CreditNoteLine" if credit_note else "InvoiceLine"
+    quantity_tag = "CreditedQuantity" if credit_note else "InvoicedQuantity"
+    body = []
+    subtotal = tax = 0.0
+    for index in range(1, lines + 1):
+        xml, line_subtotal, line_tax = _line(line_tag, index, rng, quantity_tag)
+        body.append(xml)
+        subtotal += line_subtotal
+        tax += line_tax
+    number = "SETP%d" % (990000000 + seed)
+    cufe = "%096x" % rng.getrandbits(384)
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+        '<%s xmlns="urn:oasis:names:specification:ubl:schema:xsd:%s-2" %s>' % (root, root, NAMESPACES)
+        + _extensions(signature)
+        + "<cbc:UBLVersionID>UBL 2.1</cbc:UBLVersionID>"
+        + "<cbc:CustomizationID>10</cbc:CustomizationID>"
+        + "<cbc:ProfileID>DIAN 2.1: Factura Electrónica de Venta</cbc:ProfileID>"
+        + "<cbc:ProfileExecutionID>1</cbc:ProfileExecutionID>"
+        + "<cbc:ID>%s</cbc:ID>" % number
+        + '<cbc:UUID schemeID="1" schemeName="CUFE-SHA384">%s</cbc:UUID>' % cufe
+        + "<cbc:IssueDate>2024-03-15</cbc:IssueDate><cbc:IssueTime>10:00:00-05:00</cbc:IssueTime>"
+        + ("<cbc:CreditNoteTypeCode>91</cbc:CreditNoteTypeCode>" if credit_note
+           else "<cbc:InvoiceTypeCode>01</cbc:InvoiceTypeCode>")
+        + "".join("<cbc:Note>Nota %d de la factura</cbc:Note>" % i for i in range(notes))
+        + "<cbc:DocumentCurrencyCode>COP</cbc:DocumentCurrencyCode>"
+        + "<cbc:LineCountNumeric>%d</cbc:LineCountNumeric>" % lines
+        + _party("AccountingSupplierParty", "ALMACENES SINTETICOS S.A.S.", "900123456", "Bogotá")
+        + _party("AccountingCustomerParty", "CLIENTE DE PRUEBA", "1020304050", "Medellín")
+        + "<cac:PaymentMeans><cbc:ID>1</cbc:ID><cbc:PaymentMeansCode>10</cbc:PaymentMeansCode>"
+        + "<cbc:PaymentDueDate>2024-03-15</cbc:PaymentDueDate></cac:PaymentMeans>"
+        + _tax_total(tax, subtotal)
+        + "<cac:LegalMonetaryTotal>"
+        + _amount("LineExtensionAmount", subtotal)
+        + _amount("TaxExclusiveAmount", subtotal)
+        + _amount("TaxInclusiveAmount", subtotal + tax)
+        + _amount("AllowanceTotalAmount", 0)
+        + _amount("ChargeTotalAmount", 0)
+        + _amount("PayableRoundingAmount", 0)
+        + _amount("PayableAmount", subtotal + tax)
+        + "</cac:LegalMonetaryTotal>"
+        + "".join(body)
+        + "</%s>" % root
+    )
+
+
+def attached_document_xml(document: str, signature: bool = True) -> str:
+    """Wrap a document in a DIAN AttachedDocument, embedded as CDATA."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>'
+        '<AttachedDocument xmlns="urn:oasis:names:specification:ubl:schema:xsd:AttachedDocument-2" %s>'
+        % NAMESPACES
+        + ("<ext:UBLExtensions><ext:UBLExtension><ext:ExtensionContent>%s"
+           "</ext:ExtensionContent></ext:UBLExtension></ext:UBLExtensions>" % _signature() if signature else "")
+        + "<cbc:UBLVersionID>UBL 2.1</cbc:UBLVersionID>"
+        + "<cbc:CustomizationID>Documentos adjuntos</cbc:CustomizationID>"
+        + "<cbc:ProfileID>Factura Electrónica de Venta</cbc:ProfileID>"
+        + "<cbc:ID>90000001</cbc:ID><cbc:IssueDate>2024-03-15</cbc:IssueDate>"
+        + "<cbc:DocumentType>Contenedor de Factura Electrónica</cbc:DocumentType>"
+        + "<cac:Attachment><cac:ExternalReference><cbc:MimeCode>text/xml</cbc:MimeCode>"
+        + "<cbc:EncodingCode>UTF-8</cbc:EncodingCode>"
+        + "<cbc:Description><![CDATA[%s]]></cbc:Description>" % document
+        + "</cac:ExternalReference></cac:Attachment>"
+        + "</AttachedDocument>"
+    )
+
+
+def attached_document_zip(document: str, name: str = "ad0900123456.xml", signature: bool = True) -> bytes:
+    """Return the bytes of a zip holding an AttachedDocument for ``document``."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        zip_ref.writestr(name, attached_document_xml(document, signature))
+    return buffer.getvalue()
+
+
+def write_corpus(
+    output_dir: str,
+    count: int,
+    lines: tuple[int, int] = (1, 50),
+    credit_notes: float = 0.1,
+    zipped: float = 0.8,
+    signature: bool = True,
+    seed: int = 0,
+) -> list[str]:
+    """Write ``count`` documents to ``output_dir``, returning their paths.
+
+    Line counts are drawn from ``lines`` (inclusive); ``credit_notes`` and
+    ``zipped`` are the shares of CreditNotes and of AttachedDocument zips,
+    the rest being bare XML files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for index in range(count):
+        document = document_xml(
+            rng.randint(*lines),
+            signature=signature,
+            credit_note=rng.random() < credit_notes,
+            notes=rng.randint(0, 3),
+            seed=seed * count + index,
+        )
+        if rng.random() < zipped:
+            path = os.path.join(output_dir, "ad%010d.zip" % index)
+            data = attached_document_zip(document, "ad%010d.xml" % index, signature)
+        else:
+            path = os.path.join(output_dir, "fv%010d.xml" % index)
+            data = document.encode()
+        with open(path, "wb") as output:
+            output.write(data)
+        paths.append(path)
+    return paths
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Write synthetic DIAN documents")
+    argparser.add_argument("output_dir", nargs="?", default="xmls")
+    argparser.add_argument("--count", type=int, default=100)
+    argparser.add_argument("--lines", type=int, nargs=2, default=[1, 50], metavar=("MIN", "MAX"))
+    argparser.add_argument("--credit-notes", type=float, default=0.1)
+    argparser.add_argument("--zipped", type=float, default=0.8)
+    argparser.add_argument("--no-signature", action="store_true")
+    argparser.add_argument("--seed", type=int, default=0)
+    args = argparser.parse_args()
+    paths = write_corpus(
+        args.output_dir, args.count, tuple(args.lines), args.credit_notes, args.zipped,
+        not args.no_signature, args.seed,
+    )
+    print("%d documents written to %s" % (len(paths), args.output_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark suite: time every stage of handling an uploaded document.
+
+Each case is a synthetic AttachedDocument zip (see ``benchmarks.fixtures``)
+taken through the same stages as ``/api/invoice``:
+
+    unzip   read the AttachedDocument out of the zip
+    locate  find the bytes of the embedded document in the wrapper
+    parse   parse the embedded Invoice/CreditNote from those bytes
+    build   build the models
+    render  render invoice.html
+    json    encode the JSON response
+
+Results are written as JSON (machine details, commit, milliseconds per
+stage and case). Given a previous results file with ``--baseline``, stages
+more than ``--threshold`` slower are reported and the exit status is 1.
+Run from the repository root::
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --lines 200 --baseline results.json
+"""
+import argparse
+import datetime
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+import zipfile
+
+import api.encode as encode
+import api.parser as parser
+import api.render as render
+import api.stream as stream
+from benchmarks import fixtures
+
+STAGES = ("unzip", "locate", "parse", "build", "render", "json")
+
+
+def best_of(func, repeat: int, number: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(lines: int, credit_note: bool, signature: bool, notes: int, repeat: int) -> dict:
+    document = fixtures.document_xml(lines, signature=signature, credit_note=credit_note, notes=notes)
+    data = fixtures.attached_document_zip(document, "ad.xml", signature)
+
+    # Every stage is timed on the output of the previous one
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    wrapper = archive.read("ad.xml")
+    found = stream.embedded_range(wrapper)
+    element = parser.find_document(stream.parse_embedded(wrapper, found))
+    root = parser.build_root(element)
+    stages = {
+        "unzip": lambda: zipfile.ZipFile(io.BytesIO(data)).read("ad.xml"),
+        "locate": lambda: stream.embedded_range(wrapper),
+        "parse": lambda: parser.find_document(stream.parse_embedded(wrapper, found)),
+        "build": lambda: parser.build_root(element),
+        "render": lambda: render.invoice_html(root.invoice),
+        "json": lambda: encode.dumps(root),
+    }
+    number = max(1, 200 // lines)
+    timings = {name: best_of(stages[name], repeat, number) * 1e3 for name in STAGES}
+    return {
+        "name": "%s-%d%s-notes%d" % (
+            "creditnote" if credit_note else "invoice", lines, "-signed" if signature else "", notes
+        ),
+        "document_type": "CreditNote" if credit_note else "Invoice",
+        "lines": lines,
+        "signature": signature,
+        "notes": notes,
+        "zip_bytes": len(data),
+        "xml_bytes": len(wrapper),
+        "stages_ms": timings,
+        "total_ms": sum(timings.values()),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Stages slower than the baseline by more than ``threshold``."""
+    previous = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case["name"])
+        if old is None:
+            continue
+        for stage, value in case["stages_ms"].items():
+            before = old["stages_ms"].get(stage)
+            if before and value > before * (1 + threshold):
+                regressions.append(
+                    "%s %s: %.3f ms -> %.3f ms (%+.0f%%)"
+                    % (case["name"], stage, before, value, (value / before - 1) * 100)
+                )
+    return regressions
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argparser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 200, 2000])
+    argparser.add_argument("--notes", type=int, default=1)
+    argparser.add_argument("--no-credit-notes", action="store_true", help="only time Invoices")
+    argparser.add_argument("--unsigned", action="store_true", help="leave the signature blocks out")
+    argparser.add_argument("--repeat", type=int, default=5)
+    argparser.add_argument("--output", help="write the results to this JSON file")
+    argparser.add_argument("--baseline", help="results file to compare against")
+    argparser.add_argument("--threshold", type=float, default=0.10)
+    args = argparser.parse_args()
+
+    results = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "repeat": args.repeat,
+        "cases": [],
+    }
+    print("%-30s" % "case" + "".join("%10s" % stage for stage in STAGES) + "%10s" % "total")
+    for credit_note in (False,) if args.no_credit_notes else (False, True):
+        for lines in args.lines:
+            case = run_case(lines, credit_note, not args.unsigned, args.notes, args.repeat)
+            results["cases"].append(case)
+            print(
+                "%-30s" % case["name"]
+                + "".join("%10.3f" % case["stages_ms"][stage] for stage in STAGES)
+                + "%10.3f" % case["total_ms"]
+            )
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as source:
+            regressions = compare(results, json.load(source), args.threshold)
+        for regression in regressions:
+            print("slower: " + regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
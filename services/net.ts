@@ -10,4 +10,18 @@ export async function postFile (file: File): Promise<Response> {
     body: formData,
   });
   return res;
-}
\ No newline at end of file
+}
+export async function postFiles (files: File[]): Promise<Response> {
+  // One NDJSON line per invoice file, in the order they finish parsing
+  const formData = new FormData();
+  files.forEach((file) => formData.append("file", file));
+
+  const res = await fetch("/api/invoices", {
+    method: "POST",
+    headers: {
+      "Accept": "application/x-ndjson",
+    },
+    body: formData,
+  });
+  return res;
+}
@@ -0,0 +1,70 @@
+"""The async server's process pool and batch stream."""
+import asyncio
+import io
+import json
+import time
+import zipfile
+
+import api.asgi as asgi
+import api.batch as batch
+from benchmarks import fixtures
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_batches_keep_a_slot_for_single_uploads():
+    async def main():
+        pool = asgi.Pool(workers=1, queue=2)
+        pool.start()
+        try:
+            peak = 0
+
+            async def watch():
+                nonlocal peak
+                while True:
+                    peak = max(peak, pool.pending)
+                    await asyncio.sleep(0.005)
+
+            watcher = asyncio.ensure_future(watch())
+            jobs = [asyncio.ensure_future(pool.run_batched(time.sleep, 0.05)) for _ in range(4)]
+            await asyncio.sleep(0.02)
+            # The batch holds one worker's slot; a single upload still fits
+            assert not pool.full()
+            await pool.run(time.sleep, 0)
+            await asyncio.gather(*jobs)
+            watcher.cancel()
+            return peak
+        finally:
+            pool.shutdown()
+
+    assert run(main()) <= 2
+
+
+def test_stream_reports_corrupt_members(monkeypatch):
+    invoice = io.BytesIO()
+    with zipfile.ZipFile(invoice, "w") as archive:
+        archive.writestr("fe.xml", fixtures.document_xml(2))
+    upload = io.BytesIO()
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.writestr("a.zip", invoice.getvalue())
+        archive.writestr("b.zip", invoice.getvalue())
+    data = upload.getvalue()
+    # Breaks b.zip's local header signature
+    start = data.index(b"PK\x03\x04", data.index(b"b.zip"))
+    data = data[:start] + b"XX" + data[start + 2:]
+
+    async def main():
+        pool = asgi.Pool(workers=1, queue=2)
+        pool.start()
+        monkeypatch.setattr(asgi, "pool", pool)
+        try:
+            files = batch.expand_all([("lote.zip", data)])
+            return [json.loads(line) async for line in asgi._stream_results(files, True)]
+        finally:
+            pool.shutdown()
+
+    lines = {line["file"]: line for line in run(main())}
+    assert lines["lote.zip/a.zip"]["document_type"] == "Invoice"
+    assert lines["lote.zip/b.zip"]["errorMessage"].startswith("Not a valid zip file")
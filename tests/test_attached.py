@@ -0,0 +1,53 @@
+"""AttachedDocument unwrapping: the invoice in the Attachment's Description."""
+import io
+
+from lxml import etree
+
+import api.parser as parser
+import api.serialize as serialize
+import api.service as service
+import api.stream
+from benchmarks import fixtures
+
+DOCUMENT = fixtures.document_xml(3, seed=1)
+
+
+def wrapped(*sections: str, between: str = "") -> bytes:
+    """The document wrapped with its Description split in CDATA ``sections``,
+    with the text ``between`` them."""
+    cdata = ("]]>%s<![CDATA[" % between).join(sections)
+    return fixtures.attached_document_xml(DOCUMENT).replace(DOCUMENT, cdata).encode()
+
+
+def expected() -> str:
+    return etree.tostring(parser.find_document(parser.parse_xml(DOCUMENT.encode())), encoding="unicode")
+
+
+def parsed(data: bytes) -> str:
+    return service.open_file("ad.xml", io.BytesIO(data), "F")
+
+
+def test_single_cdata():
+    assert parsed(wrapped(DOCUMENT)) == expected()
+
+
+def test_split_cdata():
+    middle = len(DOCUMENT) // 2
+    assert parsed(wrapped(DOCUMENT[:middle], DOCUMENT[middle:])) == expected()
+
+
+def streamed(data: bytes, chunk_size: int) -> list:
+    items = list(api.stream.iter_document(io.BytesIO(data), chunk_size))
+    return [serialize.dumps(items[0])] + [serialize.dumps(line) for line in items[1:]]
+
+
+def test_split_cdata_streamed():
+    # Between two elements, so the text in between is only whitespace to the invoice
+    middle = DOCUMENT.index("><", len(DOCUMENT) // 2) + 1
+    single = streamed(wrapped(DOCUMENT), api.stream.CHUNK_SIZE)
+    assert len(single) == 4
+    for chunk_size in (api.stream.CHUNK_SIZE, 5):
+        half = len(DOCUMENT) // 2
+        assert streamed(wrapped(DOCUMENT[:half], DOCUMENT[half:]), chunk_size) == single
+        split = wrapped(DOCUMENT[:middle], DOCUMENT[middle:], between="\n&#32;")
+        assert streamed(split, chunk_size) == single
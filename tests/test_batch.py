@@ -0,0 +1,56 @@
+"""Batch uploads: expanding zips of zips into files."""
+import io
+import json
+import zipfile
+
+import api.batch as batch
+from benchmarks import fixtures
+
+
+def zipped(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def corrupt(data: bytes, name: str) -> bytes:
+    # Flips bytes in the middle of a member's compressed data
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        info = archive.getinfo(name)
+    start = info.header_offset + 30 + len(info.filename) + info.compress_size // 2
+    return data[:start] + bytes(b ^ 0xFF for b in data[start:start + 8]) + data[start + 8:]
+
+
+def results(uploads) -> dict:
+    lines = [json.loads(batch.result_line(index, name, data)) for index, (name, data) in enumerate(
+        batch.expand_all(uploads)
+    )]
+    return {line["file"]: line for line in lines}
+
+
+def test_corrupt_member():
+    invoice = zipped({"fe.xml": fixtures.document_xml(2)})
+    inner = zipped({"fe.xml": fixtures.document_xml(200)})
+    upload = corrupt(zipped({"a.zip": invoice, "b.zip": inner}), "b.zip")
+    lines = results([("lote.zip", upload)])
+    assert lines["lote.zip/a.zip"]["document_type"] == "Invoice"
+    assert lines["lote.zip/b.zip"]["errorMessage"].startswith("Not a valid zip file")
+
+
+def test_nesting_depth():
+    upload = zipped({"fe.xml": fixtures.document_xml(1)})
+    for _ in range(batch.MAX_DEPTH + 1):
+        upload = zipped({"z.zip": upload})
+    [(name, error)] = batch.expand_all([("lote.zip", upload)])
+    assert isinstance(error, ValueError) and "deep" in str(error)
+
+
+def test_inflated_size(monkeypatch):
+    monkeypatch.setattr(batch, "MAX_BATCH_BYTES", 1024 * 1024)
+    member = b"<a/>" * (200 * 1024)
+    upload = zipped({"1.zip": zipped({"fe.xml": member}), "2.xml": member, "3.xml": member})
+    files = dict(batch.expand_all([("lote.zip", upload)]))
+    assert isinstance(files["lote.zip/2.xml"], bytes)
+    assert isinstance(files["lote.zip/3.xml"], ValueError) and "too large" in str(files["lote.zip/3.xml"])
@@ -0,0 +1,51 @@
+"""The parse cache: memory accounting and CUFE aliases."""
+import io
+import zipfile
+
+import api.cache as cache
+import api.service as service
+from benchmarks import fixtures
+
+DOCUMENT = fixtures.document_xml(20, seed=2)
+
+
+def zipped(xml: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("fe.xml", xml)
+    return buffer.getvalue()
+
+
+def test_same_cufe_counted_once():
+    parse_cache = cache.ParseCache()
+    root = service.parse_file_cached("fe.xml", io.BytesIO(DOCUMENT.encode()), "F", parse_cache)
+    stats = parse_cache.stats()
+    assert stats["bytes"] == cache.estimated_size(root)
+    assert cache.estimated_size(root) == cache.DOCUMENT_BYTES + 20 * cache.LINE_BYTES
+    # The same invoice in a zip: found by its CUFE, kept once under both hashes
+    wrapped = zipped(DOCUMENT)
+    assert service.parse_file_cached("fe.zip", io.BytesIO(wrapped), "F", parse_cache) is root
+    assert parse_cache.stats() == {**stats, "hits": 1}
+    assert parse_cache.get(cache.content_hash(wrapped)) is root
+    assert parse_cache.stats()["misses"] == 1
+
+
+def test_eviction_drops_aliases():
+    parse_cache = cache.ParseCache(max_bytes=cache.DOCUMENT_BYTES + 20 * cache.LINE_BYTES)
+    root = service.parse_file_cached("fe.xml", io.BytesIO(DOCUMENT.encode()), "F", parse_cache)
+    wrapped = zipped(DOCUMENT)
+    service.parse_file_cached("fe.zip", io.BytesIO(wrapped), "F", parse_cache)
+    other = fixtures.document_xml(20, seed=3).encode()
+    service.parse_file_cached("fe.xml", io.BytesIO(other), "F", parse_cache)
+    assert parse_cache.stats()["entries"] == 1
+    assert parse_cache.get(cache.content_hash(wrapped)) is None
+    assert parse_cache.get(cache.content_hash(DOCUMENT.encode())) is None
+    assert parse_cache.get_by_cufe(root.invoice.UUID.text) is None
+
+
+def test_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    service.parse_file_cached("fe.xml", io.BytesIO(DOCUMENT.encode()), "F", cache.ParseCache(path=path))
+    parse_cache = cache.ParseCache(path=path)
+    root = parse_cache.get(cache.content_hash(DOCUMENT.encode()))
+    assert root is not None and parse_cache.stats()["disk_hits"] == 1
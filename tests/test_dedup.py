@@ -0,0 +1,45 @@
+"""Duplicate detection: document keys and the ``--dedup`` bulk run."""
+import json
+import os
+import re
+
+import api.dedup as dedup
+import api.parser as parser
+import api.util as util
+from benchmarks import fixtures
+
+
+def keyless(seed: int) -> str:
+    # No CUFE, supplier NIT, number, issue date or payable amount
+    xml = fixtures.document_xml(2, seed=seed)
+    for tag in ("UUID", "ID", "IssueDate", "PayableAmount", "CompanyID"):
+        xml = re.sub(r"<cbc:%s\b[^>]*>[^<]*</cbc:%s>" % (tag, tag), "", xml)
+    return xml
+
+
+def test_keyless_document_has_no_key():
+    document = parser.find_document(parser.parse_xml(keyless(1).encode()))
+    assert dedup.document_key(document) is None
+    assert dedup.fingerprint(document) is None
+    document = parser.find_document(parser.parse_xml(fixtures.document_xml(2, seed=1).encode()))
+    assert dedup.document_key(document).startswith("cufe:")
+
+
+def test_keyless_documents_never_deduplicated(tmp_path):
+    input_dir = tmp_path / "xmls"
+    input_dir.mkdir()
+    for seed in range(3):
+        (input_dir / ("keyless%d.xml" % seed)).write_text(keyless(seed))
+    (input_dir / "fe.xml").write_text(fixtures.document_xml(2, seed=7))
+    (input_dir / "copy.xml").write_text(fixtures.document_xml(2, seed=7))
+    files = sorted(str(path) for path in input_dir.iterdir())
+    output_dir = str(tmp_path / "jsons")
+    stats = util.convert_all(files, output_dir, workers=2, progress=None, deduplicate=True)
+    assert stats["failed"] == 0
+    with open(os.path.join(output_dir, util.DUPLICATES_REPORT)) as report:
+        duplicates = json.load(report)
+    assert [os.path.basename(path) for path in duplicates] in (["copy.xml"], ["fe.xml"])
+    outputs = sorted(name for name in os.listdir(output_dir) if name.endswith(".json"))
+    assert [name for name in outputs if name.startswith("keyless")] == [
+        "keyless0.json", "keyless1.json", "keyless2.json"
+    ]
@@ -0,0 +1,95 @@
+"""Columnar export and spend analytics."""
+import io
+
+import pytest
+
+import api.analytics as analytics
+import api.export as export
+import api.parser as parser
+import api.render as render
+import api.serialize as serialize
+import api.service as service
+from benchmarks import fixtures
+
+
+def inc_total(tax: str, base: str) -> str:
+    # An INC (impuesto nacional al consumo) TaxTotal at 8 %
+    return (
+        '<cac:TaxTotal><cbc:TaxAmount currencyID="COP">%s</cbc:TaxAmount>'
+        '<cac:TaxSubtotal><cbc:TaxableAmount currencyID="COP">%s</cbc:TaxableAmount>'
+        '<cbc:TaxAmount currencyID="COP">%s</cbc:TaxAmount>'
+        "<cac:TaxCategory><cbc:Percent>8.00</cbc:Percent>"
+        "<cac:TaxScheme><cbc:ID>04</cbc:ID><cbc:Name>INC</cbc:Name></cac:TaxScheme>"
+        "</cac:TaxCategory></cac:TaxSubtotal></cac:TaxTotal>"
+    ) % (tax, base, tax)
+
+
+def iva_inc_xml(currency: str = "COP") -> bytes:
+    """A 2-line invoice with IVA and INC, on the document and on its first line."""
+    xml = fixtures.document_xml(2, seed=3)
+    line_tax = xml.index("<cac:Item>", xml.index("<cac:InvoiceLine>"))
+    xml = xml[:line_tax] + inc_total("1.00", "12.50") + xml[line_tax:]
+    document_tax = xml.index("<cac:LegalMonetaryTotal>")
+    xml = xml[:document_tax] + inc_total("8.00", "100.00") + xml[document_tax:]
+    xml = xml.replace('currencyID="COP"', 'currencyID="%s"' % currency)
+    xml = xml.replace(">COP</cbc:DocumentCurrencyCode>", ">%s</cbc:DocumentCurrencyCode>" % currency)
+    return xml.encode()
+
+
+def parsed(data: bytes):
+    return service.parse_file("fe.xml", io.BytesIO(data), "F")
+
+
+def test_iva_and_inc():
+    document = parsed(iva_inc_xml()).invoice
+    assert [total.tax_subtotal[0].tax_category.tax_scheme.name for total in document.tax_total] == ["IVA", "INC"]
+    assert len(document.invoice_line[0].tax_total) == 2
+    assert len(document.invoice_line[1].tax_total) == 1
+
+    taxes = export.to_tables([parsed(iva_inc_xml())]).taxes
+    document_rows = [index for index, line_id in enumerate(taxes["line_id"]) if line_id is None]
+    assert [taxes["tax_scheme_name"][index] for index in document_rows] == ["IVA", "INC"]
+    assert len(taxes["line_id"]) == 2 + 3
+
+    summary = parser.parse_summary(iva_inc_xml())
+    iva = document.tax_total[0].tax_amount.value
+    assert summary["tax_amount"] == iva + 8
+
+    html = render.invoice_html(document)
+    line_iva = document.invoice_line[0].tax_total[0].tax_amount.value
+    assert render.money(line_iva + 1) in html
+
+
+def test_iva_and_inc_by_tax_scheme():
+    pytest.importorskip("pyarrow")
+    spend = analytics.Spend.from_roots([parsed(iva_inc_xml())])
+    schemes = {row["tax_scheme_id"]: row for row in spend.by_tax_scheme().to_pylist()}
+    assert set(schemes) == {"01", "04"}
+    assert schemes["04"]["tax_amount"] == 8.0
+    assert schemes["04"]["taxable_amount"] == 100.0
+
+
+def test_by_supplier_per_currency():
+    pytest.importorskip("pyarrow")
+    roots = [parsed(iva_inc_xml("COP")), parsed(iva_inc_xml("USD"))]
+    spend = analytics.Spend.from_roots(roots)
+    for table in (spend.by_supplier(), spend.by_customer()):
+        assert sorted(row["currency"] for row in table.to_pylist()) == ["COP", "USD"]
+        assert [row["count"] for row in table.to_pylist()] == [1, 1]
+    assert spend.by_supplier(currency=False).num_rows == 1
+
+
+def test_older_serialized_tax_totals():
+    root = parsed(iva_inc_xml())
+    document = root.invoice
+    # As written before tax totals were lists
+    document.tax_total = document.tax_total[0]
+    document.tax_total.tax_subtotal = document.tax_total.tax_subtotal[0]
+    for line in document.invoice_line:
+        line.tax_total = line.tax_total[0]
+        line.tax_total.tax_subtotal = line.tax_total.tax_subtotal[0]
+    data = b"MRB1" + serialize.dumps(root)[4:]
+    loaded = serialize.loads(data).invoice
+    assert [total.tax_subtotal[0].tax_category.tax_scheme.name for total in loaded.tax_total] == ["IVA"]
+    assert all(len(line.tax_total) == 1 for line in loaded.invoice_line)
+    assert len(export.to_tables([serialize.loads(data)]).taxes["line_id"]) == 3
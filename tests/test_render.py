@@ -0,0 +1,26 @@
+"""HTML rendering of parsed documents."""
+import io
+
+import jinja2
+
+import api.render as render
+import api.service as service
+from benchmarks import fixtures
+
+
+def rendered(xml: str) -> str:
+    root = service.parse_file("fe.xml", io.BytesIO(xml.encode()), "F")
+    return render.invoice_html(root.invoice)
+
+
+def test_missing_allowance_total():
+    xml = fixtures.document_xml(2)
+    allowance = '<cbc:AllowanceTotalAmount currencyID="COP">0.00</cbc:AllowanceTotalAmount>'
+    assert allowance in xml
+    assert rendered(xml.replace(allowance, "")) == rendered(xml)
+    assert "Descuento: $0.00" in rendered(xml.replace(allowance, ""))
+
+
+def test_money():
+    assert render.money(None) == render.money(0) == "$0.00"
+    assert render.money(jinja2.Undefined()) == "$0.00"
@@ -0,0 +1,33 @@
+"""Reading uploads: which members of a file are documents."""
+import io
+import zipfile
+
+from lxml import etree
+
+import api.parser as parser
+import api.service as service
+import api.sniff as sniff
+from benchmarks import fixtures
+
+DOCUMENT = fixtures.document_xml(3, seed=1)
+
+
+def expected() -> str:
+    return etree.tostring(parser.find_document(parser.parse_xml(DOCUMENT.encode())), encoding="unicode")
+
+
+def commented() -> bytes:
+    # The root element only starts past the sniffed head
+    comment = "<!-- %s -->" % ("x" * (sniff.SNIFF_SIZE + 1024))
+    return DOCUMENT.replace("?>", "?>" + comment, 1).encode()
+
+
+def test_root_past_sniffed_head():
+    assert service.open_file("fe.xml", io.BytesIO(commented()), "F") == expected()
+
+
+def test_root_past_sniffed_head_in_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("fe.xml", commented())
+    assert service.open_file("fe.zip", io.BytesIO(buffer.getvalue()), "F") == expected()
@@ -0,0 +1,27 @@
+"""The SQLite invoice store."""
+import io
+
+import api.serialize as serialize
+import api.service as service
+import api.store as store
+from benchmarks import fixtures
+
+
+def parsed(**kwargs):
+    xml = fixtures.document_xml(**kwargs).encode()
+    return service.parse_file("fe.xml", io.BytesIO(xml), "F")
+
+
+def test_round_trip(tmp_path):
+    invoice = parsed(lines=3, seed=1)
+    credit_note = parsed(lines=2, seed=2, credit_note=True)
+    with store.InvoiceStore(str(tmp_path / "invoices.db")) as invoices:
+        assert invoices.add_many([invoice, credit_note]) == 2
+        cufe = invoice.invoice.UUID.text
+        assert cufe in invoices
+        assert serialize.dumps(invoices.get(cufe)) == serialize.dumps(invoice)
+        assert invoices.count(document_type="CreditNote") == 1
+        [header] = invoices.headers(document_type="Invoice")
+        assert header["line_count"] == 3
+        assert [root.document_type for root in invoices.find()] == ["Invoice", "CreditNote"]
+        assert invoices.delete(cufe) and len(invoices) == 1
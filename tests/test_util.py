@@ -0,0 +1,37 @@
+"""Bulk conversion: reading files through an mmap."""
+import io
+import zipfile
+
+import pytest
+
+import api.util as util
+from benchmarks import fixtures
+
+
+def zipped(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("data", [
+    b"PK",
+    zipped({"fe.xml": fixtures.document_xml(20)})[:-10],
+    zipped({"fe.xml": fixtures.document_xml(20)})[:300],
+])
+def test_corrupt_zip(tmp_path, data):
+    path = tmp_path / "fe.zip"
+    path.write_bytes(data)
+    with pytest.raises(ValueError, match="^Not a valid zip file"):
+        util.read_document(str(path))
+
+
+def test_zip_without_xml(tmp_path):
+    path = tmp_path / "fe.zip"
+    path.write_bytes(zipped({"fe.pdf": b"%PDF"}))
+    with pytest.raises(ValueError, match="^No XML file found"):
+        util.read_document(str(path))
+    path.write_bytes(zipped({"fe.xml": fixtures.document_xml(2)}))
+    assert util.read_document(str(path)) is not None
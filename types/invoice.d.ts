@@ -9,6 +9,7 @@ interface ID {
 
 interface PartyIdentification {
     id: UNKNOWN;
+    id_scheme_name: string | null;
 }
 
 interface CompanyID {
@@ -17,6 +18,7 @@ interface CompanyID {
     scheme_agency_id: string | null;
     scheme_agency_name: string | null;
     text: string;
+    id_scheme_name: string | null;
 }
 
 interface CorporateRegistrationScheme {
@@ -37,11 +39,13 @@ interface PartyName {
 interface TaxScheme {
     id: string;
     name: string;
+    description: string | null;
 }
 
 interface TaxLevelCode {
     list_name: string | null;
     text: string;
+    name: string | null;
 }
 
 interface Name {
@@ -116,11 +120,13 @@ interface Party {
 interface AccountingCustomerParty {
     additional_account_id: string;
     party: Party;
+    additional_account_name: string | null;
 }
 
 interface AccountingSupplierParty {
     additional_account_id: string;
     party: Party;
+    additional_account_name: string | null;
 }
 
 interface Amount {
@@ -178,7 +184,7 @@ interface TaxSubtotal {
 
 interface TaxTotal {
     tax_amount: TaxAmount;
-    tax_subtotal: TaxSubtotal;
+    tax_subtotal: Array<TaxSubtotal>;
     tax_rounding_amount: TaxAmount;
 }
 
@@ -213,9 +219,10 @@ interface InvoiceLine {
     id: string;
     note: Array<Note>;
     invoiced_quantity: InvoicedQuantity;
+    credited_quantity: InvoicedQuantity | null;
     line_extension_amount: LineExtensionAmount;
     allowance_charge: AllowanceCharge;
-    tax_total: TaxTotal;
+    tax_total: Array<TaxTotal>;
     item: Item;
     price: Price;
 }
@@ -225,6 +232,8 @@ interface PaymentMeans {
     payment_means_code: string;
     payment_due_date: string;
     payment_id: string;
+    id_name: string | null;
+    payment_means_name: string | null;
 }
 
 interface AllowanceTotalAmount {
@@ -520,7 +529,7 @@ interface Invoice {
   accounting_customer_party: AccountingCustomerParty;
   order_reference: OrderReference;
   payment_means: PaymentMeans;
-  tax_total: TaxTotal;
+  tax_total: Array<TaxTotal>;
   legal_monetary_total: LegalMonetaryTotal;
   invoice_line: Array<InvoiceLine>;
   credit_note_line: Array<InvoiceLine>;